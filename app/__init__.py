@@ -6,8 +6,6 @@ from flask_migrate import Migrate
 from datetime import timedelta
 import os
 import secrets
-import threading
-import time
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -47,6 +45,68 @@ def create_app():
     # Security: CSRF protection for cookies (if using cookies)
     app.config['JWT_COOKIE_CSRF_PROTECT'] = True
 
+    # Seconds an in-process active-session index may go without re-syncing
+    # (only used when Postgres LISTEN/NOTIFY is not available)
+    app.config['SESSION_INDEX_TTL'] = float(os.environ.get('SESSION_INDEX_TTL', 2.0))
+
+    # Attendance ingestion: 'direct' commits every mark on its own, 'batched' hands
+    # validated marks to a write-behind queue flushed as multi-row inserts
+    app.config['ATTENDANCE_INGEST_MODE'] = os.environ.get('ATTENDANCE_INGEST_MODE', 'direct')
+    app.config['ATTENDANCE_INGEST_BATCH_SIZE'] = int(os.environ.get('ATTENDANCE_INGEST_BATCH_SIZE', 200))
+    app.config['ATTENDANCE_INGEST_FLUSH_MS'] = int(os.environ.get('ATTENDANCE_INGEST_FLUSH_MS', 20))
+    app.config['ATTENDANCE_INGEST_QUEUE_SIZE'] = int(os.environ.get('ATTENDANCE_INGEST_QUEUE_SIZE', 2000))
+
+    # Window length for rotating (time-based) session OTPs
+    app.config['OTP_ROTATION_SECONDS'] = int(os.environ.get('OTP_ROTATION_SECONDS', 30))
+
+    # Faculty location trail: ring size per session, pings dropped when they moved less
+    # than MIN_MOVE_M within MIN_INTERVAL seconds, and how often fixes are written out
+    app.config['LOCATION_TRAIL_SIZE'] = int(os.environ.get('LOCATION_TRAIL_SIZE', 120))
+    app.config['LOCATION_TRAIL_MIN_MOVE_M'] = float(os.environ.get('LOCATION_TRAIL_MIN_MOVE_M', 10.0))
+    app.config['LOCATION_TRAIL_MIN_INTERVAL'] = float(os.environ.get('LOCATION_TRAIL_MIN_INTERVAL', 30.0))
+    app.config['LOCATION_TRAIL_FLUSH_SECONDS'] = float(os.environ.get('LOCATION_TRAIL_FLUSH_SECONDS', 10.0))
+
+    # Background report exports: where files go, how many run at once, how long an
+    # identical request reuses a finished file, and when old files are evicted
+    app.config['EXPORT_DIR'] = os.environ.get('EXPORT_DIR')  # defaults to <instance>/exports
+    app.config['EXPORT_WORKERS'] = int(os.environ.get('EXPORT_WORKERS', 2))
+    app.config['EXPORT_REUSE_SECONDS'] = float(os.environ.get('EXPORT_REUSE_SECONDS', 600))
+    app.config['EXPORT_MAX_AGE_SECONDS'] = float(os.environ.get('EXPORT_MAX_AGE_SECONDS', 24 * 3600))
+    app.config['EXPORT_MAX_BYTES'] = int(os.environ.get('EXPORT_MAX_BYTES', 2 * 1024 ** 3))
+
+    # Session maintenance, run by one elected process: how often each task runs (0 turns it
+    # off), how many days finished sessions are kept, and how often followers try to take over.
+    # Sessions expire at their deadline (session_expiry); the expire sweep only catches stragglers
+    app.config['MAINTENANCE_EXPIRE_SECONDS'] = float(os.environ.get('MAINTENANCE_EXPIRE_SECONDS', 300))
+    app.config['MAINTENANCE_PURGE_SECONDS'] = float(os.environ.get('MAINTENANCE_PURGE_SECONDS', 3600))
+    # New marks reach the daily rollup (summaries) within two of these intervals
+    app.config['MAINTENANCE_ROLLUP_SECONDS'] = float(os.environ.get('MAINTENANCE_ROLLUP_SECONDS', 60))
+    app.config['SESSION_RETENTION_DAYS'] = int(os.environ.get('SESSION_RETENTION_DAYS', 7))
+    # Move sessions past retention into the compressed archive (exports still include them)
+    # rather than deleting them for good
+    app.config['SESSION_ARCHIVE'] = os.environ.get('SESSION_ARCHIVE', 'true').lower() in ('1', 'true', 'yes')
+    app.config['MAINTENANCE_ELECTION_SECONDS'] = float(os.environ.get('MAINTENANCE_ELECTION_SECONDS', 15))
+    # Sessions per transaction in the expire and purge sweeps, and seconds a sweep may run
+    # before leaving the rest for its next interval (0: no limit)
+    app.config['MAINTENANCE_CHUNK_SIZE'] = int(os.environ.get('MAINTENANCE_CHUNK_SIZE', 200))
+    app.config['MAINTENANCE_TIME_BUDGET_SECONDS'] = float(os.environ.get('MAINTENANCE_TIME_BUDGET_SECONDS', 30))
+    # Leader lock when not on Postgres, and where the leader writes its counters
+    app.config['MAINTENANCE_LOCK_FILE'] = os.environ.get('MAINTENANCE_LOCK_FILE')  # defaults to <instance>/maintenance.lock
+    app.config['MAINTENANCE_STATUS_FILE'] = os.environ.get('MAINTENANCE_STATUS_FILE')  # defaults to <instance>/maintenance.json
+
+    # Faculty statistics cache: how long another worker's writes may go unseen, and entries kept
+    app.config['STATS_CACHE_SECONDS'] = float(os.environ.get('STATS_CACHE_SECONDS', 60))
+    app.config['STATS_CACHE_SIZE'] = int(os.environ.get('STATS_CACHE_SIZE', 1024))
+
+    # Live attendance feed (SSE): streams per worker, seconds of silence before a heartbeat,
+    # and how often a stream picks up marks that other workers wrote
+    app.config['LIVE_FEED_MAX_CONNECTIONS'] = int(os.environ.get('LIVE_FEED_MAX_CONNECTIONS', 50))
+    app.config['LIVE_FEED_HEARTBEAT_SECONDS'] = float(os.environ.get('LIVE_FEED_HEARTBEAT_SECONDS', 15))
+    app.config['LIVE_FEED_RESYNC_SECONDS'] = float(os.environ.get('LIVE_FEED_RESYNC_SECONDS', 5))
+
+    # Expose per-request SQL statement counts (X-Query-Count) for load testing
+    app.config['SQL_QUERY_COUNT_HEADER'] = os.environ.get('SQL_QUERY_COUNT_HEADER', '').lower() in ('1', 'true', 'yes')
+
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
@@ -76,6 +136,38 @@ def create_app():
     app.register_blueprint(faculty_bp, url_prefix="/faculty")
     app.register_blueprint(student_bp, url_prefix="/student")
 
+    # Warm the active-session index so the first OTP lookups are served from memory
+    from app.utils.session_index import session_index
+    from sqlalchemy.exc import SQLAlchemyError
+    session_index.init_app(app)
+    from app.utils.attendance_ingest import attendance_ingest
+    attendance_ingest.init_app(app)
+    from app.utils.location_trail import location_trail
+    location_trail.init_app(app)
+    from app.utils.export_jobs import export_jobs
+    export_jobs.init_app(app)
+    from app.utils.faculty_stats import faculty_stats
+    faculty_stats.init_app(app)
+    from app.utils.live_feed import live_feed
+    live_feed.init_app(app)
+    # Started by the server entry point (run.py) only, not by CLI commands or scripts
+    from app.utils.maintenance import maintenance
+    from app.utils.session_expiry import session_expiry
+    maintenance.init_app(app)
+    session_expiry.init_app(app)
+    from app.utils import query_stats, rotating_otp
+    query_stats.init_app(app)
+    rotating_otp.init_app(app)
+
+    from app.commands import register_commands
+    register_commands(app)
+    with app.app_context():
+        try:
+            session_index.warm()
+        except SQLAlchemyError:
+            # Tables not created yet or database unavailable; the index syncs lazily
+            pass
+
     # -------------------------------
     # Frontend page routes
     # -------------------------------
@@ -127,41 +219,4 @@ def create_app():
     def faculty_profile_page():
         return render_template("faculty/profile.html")
 
-    # -------------------------------
-    # Background task for session cleanup
-    # -------------------------------
-    def run_session_cleanup():
-        """Background task to periodically clean up expired sessions"""
-        from app.utils.session_manager import SessionManager
-        from sqlalchemy.exc import OperationalError
-        
-        # Wait a bit for database to be initialized
-        time.sleep(5)
-        session_manager = SessionManager()
-        
-        while True:
-            try:
-                with app.app_context():
-                    # Check if tables exist before trying to clean up
-                    try:
-                        # Expire old sessions
-                        expired_count = session_manager.expire_old_sessions()
-                        # Delete old closed/expired sessions (older than 7 days)
-                        deleted_count = session_manager.delete_old_sessions(older_than_days=7)
-                        if expired_count > 0 or deleted_count > 0:
-                            print(f"Session cleanup: Expired {expired_count} sessions, Deleted {deleted_count} old sessions")
-                    except OperationalError as e:
-                        # Table doesn't exist yet or database not ready, skip this cycle
-                        pass
-            except Exception as e:
-                # Log other errors but don't crash
-                print(f"Error in session cleanup: {str(e)}")
-            
-            # Run cleanup every 5 minutes
-            time.sleep(300)
-
-    # Start session cleanup thread
-    session_cleanup_thread = threading.Thread(target=run_session_cleanup, daemon=True)
-    session_cleanup_thread.start()
-
     return app
@@ -0,0 +1,314 @@
+from datetime import date, datetime, time, timezone
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import distinct, func, update
+
+from app import db
+from app.models import Attendance, AttendanceSession, Student
+from app.utils import geofence, proxy_detector, query_plans, rollup
+from app.utils.location_trail import location_trail
+from app.utils.session_index import as_utc
+from app.utils.session_manager import SWEEP_CHUNK_SIZE, SessionManager, faculty_position, insert_absences
+
+# Rows evaluated (and optionally rewritten) per geofence batch
+AUDIT_CHUNK_SIZE = 50000
+
+# Sessions given absence rows per transaction by backfill-absences
+BACKFILL_CHUNK_SIZE = 200
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise click.BadParameter(f'{value!r} is not a YYYY-MM-DD date')
+
+
+@click.command('audit-geofence')
+@click.option('--from', 'date_from', help='First attendance date (YYYY-MM-DD)')
+@click.option('--to', 'date_to', help='Last attendance date (YYYY-MM-DD)')
+@click.option('--faculty-id', type=int, help='Only this faculty member')
+@click.option('--tolerance', type=float, default=1.0, show_default=True,
+              help='Meters a stored distance may differ from the recomputed one')
+@click.option('--fix', is_flag=True, help='Rewrite stored distances that drifted')
+@click.option('--show', type=int, default=20, show_default=True, help='Marks outside the radius to list')
+@with_appcontext
+def audit_geofence(date_from, date_to, faculty_id, tolerance, fix, show):
+    """Recompute distance_from_faculty for session marks and report geofence violations.
+
+    Each mark is checked against the faculty fix nearest to its marked_at in
+    the session's location trail, as when it was marked, falling back to the
+    position stored on the session.
+    """
+    date_from, date_to = _parse_date(date_from), _parse_date(date_to)
+    query = db.session.query(
+        Attendance.id, Attendance.session_id, Attendance.date, Attendance.marked_at,
+        Attendance.student_latitude, Attendance.student_longitude,
+        Attendance.student_location_accuracy, Attendance.distance_from_faculty,
+        AttendanceSession.faculty_latitude, AttendanceSession.faculty_longitude,
+        AttendanceSession.faculty_location_accuracy, AttendanceSession.expected_location_radius,
+    ).join(AttendanceSession, Attendance.session_id == AttendanceSession.id).filter(Attendance.status == 'Present')
+    if date_from:
+        query = query.filter(Attendance.date >= date_from)
+    if date_to:
+        query = query.filter(Attendance.date <= date_to)
+    if faculty_id:
+        query = query.filter(Attendance.faculty_id == faculty_id)
+
+    # Keyset over attendance ids: each chunk is read by its own query, so its
+    # fixes can be written and committed before the next one is fetched
+    checked = unlocated = outside = drifted = last_id = 0
+    outside_rows = []
+    while True:
+        chunk = query.filter(Attendance.id > last_id).order_by(Attendance.id).limit(AUDIT_CHUNK_SIZE).all()
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        trails = location_trail.stored({row.session_id for row in chunk})
+        faculty = [faculty_position(row.session_id, as_utc(row.marked_at),
+                                    (row.faculty_latitude, row.faculty_longitude, row.faculty_location_accuracy),
+                                    trails.get(row.session_id)) for row in chunk]
+        columns = list(zip(*chunk))
+        result = geofence.evaluate(columns[4], columns[5], columns[6], *zip(*faculty), columns[11])
+        fixes = []
+        for row, (distance, within) in zip(chunk, result.rows()):
+            checked += 1
+            if distance is None:
+                unlocated += 1
+                continue
+            if not within:
+                outside += 1
+                if len(outside_rows) < show:
+                    outside_rows.append((row.id, row.session_id, row.date, distance))
+            stored = row.distance_from_faculty
+            if stored is None or abs(stored - distance) > tolerance:
+                fixes.append({'id': row.id, 'distance_from_faculty': distance})
+        drifted += len(fixes)
+        if fix and fixes:
+            db.session.execute(update(Attendance), fixes)
+            db.session.commit()
+
+    click.echo(f'Checked {checked} marks ({"numpy" if geofence.np is not None else "pure Python"} engine)')
+    click.echo(f'  without a position: {unlocated}')
+    click.echo(f'  outside the radius: {outside}')
+    click.echo(f'  stored distance off by more than {tolerance} m: {drifted}{" (rewritten)" if fix else ""}')
+    for attendance_id, session_id, day, distance in outside_rows:
+        click.echo(f'    attendance {attendance_id}  session {session_id}  {day}  {distance:.1f} m')
+
+
+@click.command('detect-proxies')
+@click.option('--from', 'date_from', help='First attendance date (YYYY-MM-DD)')
+@click.option('--to', 'date_to', help='Last attendance date (YYYY-MM-DD)')
+@click.option('--faculty-id', type=int, help='Only this faculty member')
+@click.option('--subject', help='Only this subject')
+@click.option('--radius', type=float, default=proxy_detector.DEFAULT_RADIUS_M, show_default=True,
+              help='Meters between marks of different students')
+@click.option('--window', type=float, default=proxy_detector.DEFAULT_WINDOW_SECONDS, show_default=True,
+              help='Seconds between marks of different students')
+@click.option('--limit', type=int, default=50, show_default=True, help='Largest clusters to list')
+@with_appcontext
+def detect_proxies(date_from, date_to, faculty_id, subject, radius, window, limit):
+    """Report clusters of different students who marked from the same spot at the same time."""
+    date_from, date_to = _parse_date(date_from), _parse_date(date_to)
+    query = proxy_detector.located_marks_query()
+    if date_from:
+        query = query.filter(Attendance.date >= date_from)
+    if date_to:
+        query = query.filter(Attendance.date <= date_to)
+    if faculty_id:
+        query = query.filter(Attendance.faculty_id == faculty_id)
+    if subject:
+        query = query.filter(Attendance.subject == subject)
+
+    clusters, total = proxy_detector.detect(proxy_detector.stream_marks(query), radius, window, limit)
+    proxy_detector.attach_roll_numbers(clusters)
+    click.echo(f'{total} clusters of marks within {radius} m and {window:g} s')
+    for cluster in clusters:
+        click.echo(f"  {cluster['first_marked_at']}  {len(cluster['student_ids'])} students  "
+                   f"sessions {', '.join(map(str, cluster['session_ids']))}  "
+                   f"spread {cluster['spread_m']} m  ({cluster['latitude']}, {cluster['longitude']})")
+        click.echo(f"    {', '.join(str(roll) for roll in cluster['roll_numbers'])}")
+
+
+@click.command('check-query-plans')
+@click.option('--verbose', is_flag=True, help='Print every plan, not just the failing ones')
+@with_appcontext
+def check_query_plans(verbose):
+    """EXPLAIN the route queries and fail if any reads attendance, student or faculty in full."""
+    failures = 0
+    for label, query in query_plans.route_queries():
+        plan = query_plans.explain(query)
+        scans = query_plans.full_scans(plan, query)
+        if scans:
+            failures += 1
+        click.echo(f"{'FULL SCAN' if scans else 'ok':>9}  {label}{'  (' + ', '.join(scans) + ')' if scans else ''}")
+        if scans or verbose:
+            for line in plan:
+                click.echo(f'           {line}')
+    if failures:
+        raise click.ClickException(f'{failures} queries fall back to a full table scan')
+    click.echo('All route queries use an index')
+
+
+@click.command('rebuild-rollup')
+@click.option('--check', is_flag=True, help='Only report rollup rows that disagree with attendance')
+@with_appcontext
+def rebuild_rollup(check):
+    """Recompute the daily attendance rollup from the attendance table."""
+    if check:
+        mismatches = rollup.drift()
+        for (day, faculty_id, subject, division, status), stored, actual in mismatches[:50]:
+            click.echo(f'{day}  faculty {faculty_id}  {subject}  {division}  {status}: '
+                       f'stored {stored}, actual {actual}')
+        if mismatches:
+            raise click.ClickException(f'{len(mismatches)} rollup rows are out of date')
+        click.echo('Rollup matches attendance')
+        return
+    rows = rollup.rebuild()
+    db.session.commit()
+    click.echo(f'Rebuilt rollup: {rows} rows')
+
+
+@click.command('backfill-absences')
+@click.option('--since', help='First session start date (YYYY-MM-DD)  [default: today]')
+@click.option('--all', 'all_sessions', is_flag=True, help='Backfill every session, however old')
+@click.option('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE, show_default=True,
+              help='Sessions per transaction')
+@click.option('--infer-division', is_flag=True,
+              help='Give sessions without a division the one all their present marks share')
+@with_appcontext
+def backfill_absences(since, all_sessions, chunk_size, infer_division):
+    """Record Absent rows for closed and expired sessions that have a division.
+
+    The roster is the division's students as they are now: there is no
+    history of who was in a division when. Students who joined or moved
+    since a session get false absences and students who left get none, so
+    only today's sessions are backfilled unless --since or --all reaches back.
+    """
+    if since and all_sessions:
+        raise click.UsageError('--since and --all are mutually exclusive')
+    query = AttendanceSession.query.filter(AttendanceSession.status.in_(['closed', 'expired']))
+    if not all_sessions:
+        first_day = _parse_date(since) or datetime.now(timezone.utc).date()
+        query = query.filter(AttendanceSession.created_at >= datetime.combine(first_day, time(), timezone.utc))
+    if not infer_division:
+        query = query.filter(AttendanceSession.expected_division.isnot(None))
+
+    # Keyset over session ids with a commit per chunk, so locks and memory stay bounded
+    last_id = sessions = written = inferred = 0
+    while True:
+        chunk = query.filter(AttendanceSession.id > last_id).order_by(AttendanceSession.id).limit(chunk_size).all()
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        if infer_division:
+            inferred += _infer_divisions([session for session in chunk if not session.expected_division])
+        for session in chunk:
+            written += insert_absences(session, session.closed_at or session.expires_at)
+        db.session.commit()
+        sessions += len(chunk)
+        click.echo(f'  {sessions} sessions (up to id {last_id}): {written} absences written')
+
+    click.echo(f'Backfilled {written} absences over {sessions} sessions'
+               + (f', {inferred} divisions inferred' if infer_division else ''))
+
+
+def _infer_divisions(sessions) -> int:
+    """Set expected_division where every present mark of a session comes from one division"""
+    if not sessions:
+        return 0
+    by_id = {session.id: session for session in sessions}
+    rows = db.session.query(
+        Attendance.session_id, func.min(Student.division), func.count(distinct(Student.division)),
+    ).join(Student, Student.id == Attendance.student_id).filter(
+        Attendance.session_id.in_(by_id), Attendance.status == 'Present',
+    ).group_by(Attendance.session_id)
+    inferred = 0
+    for session_id, division, divisions in rows:
+        if divisions == 1:
+            by_id[session_id].expected_division = division
+            inferred += 1
+    return inferred
+
+
+def _report_sweep(result, noun):
+    if result.dry_run:
+        click.echo(f'Would {noun} {result.sessions} sessions, {result.attendance} attendance rows, '
+                   f'{result.locations} location rows')
+        return
+    click.echo(f'{noun.capitalize()}d {result.sessions} sessions, {result.attendance} attendance rows, '
+               f'{result.locations} location rows in {result.chunks} chunks, {result.seconds:.2f} s')
+    if not result.complete:
+        click.echo('Time budget reached; run again to continue')
+
+
+def _echo_chunk(result):
+    click.echo(f'  chunk {result.chunks}: {result.sessions} sessions, {result.attendance} attendance rows, '
+               f'{result.locations} location rows ({result.seconds:.2f} s)')
+
+
+@click.command('expire-sessions')
+@click.option('--dry-run', is_flag=True, help='Only count the overdue sessions and the absences they would get')
+@click.option('--chunk-size', type=int, default=SWEEP_CHUNK_SIZE, show_default=True, help='Sessions per transaction')
+@click.option('--time-budget', type=float, help='Stop after this many seconds')
+@with_appcontext
+def expire_sessions(dry_run, chunk_size, time_budget):
+    """Expire active sessions past their deadline and record their absences."""
+    result = SessionManager().expire_old_sessions(chunk_size=chunk_size, time_budget=time_budget,
+                                                  dry_run=dry_run, progress=_echo_chunk)
+    _report_sweep(result, 'expire')
+
+
+@click.command('purge-sessions')
+@click.option('--older-than-days', type=int, default=7, show_default=True,
+              help='Retire closed and expired sessions that ended before this many days ago')
+@click.option('--no-archive', is_flag=True, help='Delete the sessions for good instead of archiving them')
+@click.option('--dry-run', is_flag=True, help='Only count the sessions and rows that would be moved')
+@click.option('--chunk-size', type=int, default=SWEEP_CHUNK_SIZE, show_default=True, help='Sessions per transaction')
+@click.option('--time-budget', type=float, help='Stop after this many seconds')
+@with_appcontext
+def purge_sessions(older_than_days, no_archive, dry_run, chunk_size, time_budget):
+    """Move old sessions with their attendance and location trail into the archive."""
+    result = SessionManager().delete_old_sessions(older_than_days=older_than_days, chunk_size=chunk_size,
+                                                  time_budget=time_budget, dry_run=dry_run, progress=_echo_chunk,
+                                                  archive_first=not no_archive)
+    _report_sweep(result, 'delete' if no_archive else 'archive')
+
+
+@click.command('maintenance')
+@click.option('--run', 'task', help='Run this task now in this process (leader or not)')
+@with_appcontext
+def maintenance_command(task):
+    """Show the maintenance leader and per-task counters, or run one task now."""
+    from app.utils.maintenance import maintenance
+
+    if task:
+        try:
+            stats = maintenance.run_now(task)
+        except KeyError:
+            raise click.BadParameter(f'unknown task {task!r}', param_hint='--run')
+        if stats.last_error:
+            raise click.ClickException(stats.last_error)
+        click.echo(f'{task}: {stats.last_rows} rows in {stats.last_duration_ms} ms')
+        return
+    status = maintenance.status()
+    if not status['updated_at']:
+        click.echo('No maintenance has run yet')
+        return
+    click.echo(f"Leader pid {status['leader_pid']}, updated {datetime.fromtimestamp(status['updated_at']):%Y-%m-%d %H:%M:%S}")
+    for stats in status['tasks']:
+        click.echo(f"  {stats['name']:<22} every {stats['interval']:>6.0f} s  runs {stats['runs']:>5}  "
+                   f"failures {stats['failures']:>3}  last {stats['last_duration_ms']} ms / {stats['last_rows']} rows  "
+                   f"total {stats['total_rows']} rows{'  error: ' + stats['last_error'] if stats['last_error'] else ''}")
+
+
+def register_commands(app):
+    app.cli.add_command(audit_geofence)
+    app.cli.add_command(detect_proxies)
+    app.cli.add_command(check_query_plans)
+    app.cli.add_command(rebuild_rollup)
+    app.cli.add_command(backfill_absences)
+    app.cli.add_command(expire_sessions)
+    app.cli.add_command(purge_sessions)
+    app.cli.add_command(maintenance_command)
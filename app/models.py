@@ -17,6 +17,13 @@ class Student(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
 
+    __table_args__ = (
+        # Login, registration and bulk marking look students up by roll number
+        db.Index('ix_student_roll_number', 'roll_number'),
+        # Division report filters and absence rosters
+        db.Index('ix_student_division', 'division'),
+    )
+
 
 class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -34,18 +41,62 @@ class Attendance(db.Model):
     distance_from_faculty = db.Column(db.Float, nullable=True)  # Distance in meters
     
     # Timestamps
-    marked_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.now(timezone.utc))
+    marked_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
     
     student = db.relationship('Student', backref='attendances', lazy=True)
     faculty = db.relationship('Faculty', backref='attendances', lazy=True)
 
+    __table_args__ = (
+        # One mark per student per session; lets the mark path rely on ON CONFLICT
+        db.UniqueConstraint('session_id', 'student_id', name='uq_attendance_session_student'),
+        # Report date filters are half-open ranges on this column
+        db.Index('ix_attendance_date', 'date'),
+        # Report, proxy and audit filters: one faculty/subject/student over a date range
+        db.Index('ix_attendance_faculty_date', 'faculty_id', 'date'),
+        db.Index('ix_attendance_subject_date', 'subject', 'date'),
+        db.Index('ix_attendance_student_date', 'student_id', 'date'),
+        # Proxy detection streams marks in marked_at order
+        db.Index('ix_attendance_marked_at', 'marked_at'),
+    )
+
+
+class AttendanceDaily(db.Model):
+    """Attendance counts per day, faculty, subject, division and status.
+
+    New attendance is counted in behind RollupWatermark by the maintenance leader;
+    deletes take their rows out in the deleting transaction (app/utils/rollup.py).
+    faculty_id 0 stands for marks without a faculty.
+    """
+    date = db.Column(db.Date, primary_key=True)
+    faculty_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    subject = db.Column(db.String(100), primary_key=True)
+    division = db.Column(db.String(50), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_attendance_daily_faculty_date', 'faculty_id', 'date'),
+    )
+
+
+class RollupWatermark(db.Model):
+    """How far attendance has been counted into attendance_daily; a single row with id 1.
+
+    Attendance ids up to last_id are counted. seen_id is the highest id that
+    existed at the previous catch-up, which the next one counts up to.
+    """
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    seen_id = db.Column(db.Integer, nullable=False, default=0)
+
 
 class AttendanceSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     
     # Session Identification
     session_code = db.Column(db.String(20), unique=True, nullable=False)  # Unique session ID
-    otp = db.Column(db.String(10), unique=True, nullable=False)
+    otp = db.Column(db.String(10), nullable=False)  # unique among active sessions only
+    otp_secret = db.Column(db.String(64), nullable=True)  # set for rotating-OTP sessions
     
     # Faculty Information
     faculty_id = db.Column(db.Integer, db.ForeignKey('faculty.id'), nullable=False)
@@ -59,7 +110,7 @@ class AttendanceSession(db.Model):
     
     # Session Status & Timing
     status = db.Column(db.String(20), nullable=False, default='active')  # active, expired, closed, cancelled
-    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
     expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
     closed_at = db.Column(db.DateTime(timezone=True), nullable=True)
     
@@ -78,4 +129,58 @@ class AttendanceSession(db.Model):
         db.Index('idx_otp', 'otp'),
         db.Index('idx_faculty_status', 'faculty_id', 'status'),
         db.Index('idx_expires_at', 'expires_at'),
+        # OTPs are reused once a session ends, so uniqueness only covers live rows
+        db.Index('uq_session_active_otp', 'otp', unique=True,
+                 postgresql_where=db.text("status = 'active'"),
+                 sqlite_where=db.text("status = 'active'")),
+    )
+
+
+class SessionLocation(db.Model):
+    """One faculty position fix in a session's location trail"""
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('attendance_session.id'), nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    accuracy = db.Column(db.Float, nullable=True)
+    recorded_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_session_location_session_recorded', 'session_id', 'recorded_at'),
+    )
+
+
+class AttendanceArchive(db.Model):
+    """One finished session moved out of the hot tables by the retention sweep.
+
+    `payload` holds the session's attendance (with the student's name, roll
+    number and division at archive time) and location trail as gzip-compressed
+    JSON, one list per column (app/utils/archive.py). The other columns index
+    it: report filters pick archived sessions by faculty, subject and the
+    first/last attendance date, and `counts` gives per-day totals without
+    decompressing anything. Rows are only ever inserted.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, nullable=False)  # the AttendanceSession id it had
+    session_code = db.Column(db.String(20), nullable=False)
+    faculty_id = db.Column(db.Integer, nullable=True)
+    faculty_name = db.Column(db.String(100), nullable=True)
+    subject = db.Column(db.String(100), nullable=False)
+    expected_division = db.Column(db.String(50), nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    closed_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    first_date = db.Column(db.Date, nullable=False)
+    last_date = db.Column(db.Date, nullable=False)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    counts = db.Column(db.Text, nullable=False)  # JSON [[date, subject, division, status, count], ...]
+    payload = db.Column(db.LargeBinary, nullable=False)
+    archived_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Exports pick archived sessions by faculty and/or date range
+        db.Index('ix_attendance_archive_faculty_first_date', 'faculty_id', 'first_date'),
+        db.Index('ix_attendance_archive_first_date', 'first_date'),
+        db.Index('ix_attendance_archive_session_id', 'session_id'),
     )
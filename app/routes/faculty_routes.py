@@ -1,15 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context, url_for
 from app import db
-from app.models import Attendance, Faculty, Student
+from app.models import Attendance, AttendanceSession, Faculty
 from app.utils import verify_password, generate_tokens
 from app.utils.session_manager import SessionManager
+from app.utils.session_index import as_utc
+from app.utils import rotating_otp
+from app.utils import archive, proxy_detector, reports, rollup, xlsx
+from app.utils.export_jobs import FORMATS, export_jobs
+from app.utils.faculty_stats import faculty_stats
+from app.utils.live_feed import live_feed
+from app.utils.maintenance import maintenance
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, get_jwt
-from datetime import datetime, timezone, timedelta, time, date as date_cls
-import io
-import csv
+from datetime import datetime, timezone, date as date_cls
+from collections import Counter
 
 faculty_bp = Blueprint("faculty_bp", __name__)
 
+# Upper bound on rows accepted by one bulk_mark upload
+BULK_MARK_MAX_ROWS = 2000
+
 # Initialize SessionManager
 session_manager = SessionManager()
 
@@ -119,6 +128,8 @@ def start_session():
     subject = data.get("subject", "").strip()
     location_data = data.get("location", {})
     expires_in_minutes = data.get("expires_in_minutes", 5)  # Default to 5 minutes
+    rotating = bool(data.get("rotating_otp", False))  # Time-based code that changes every window
+    division = str(data.get("division") or "").strip() or None  # Unmarked students of it become absent at close
     
     if not subject:
         return jsonify({"status": "error", "message": "Subject is required to start session"}), 400
@@ -132,32 +143,31 @@ def start_session():
         return jsonify({
             'status': 'error',
             'message': f'An active session already exists for {existing_session.subject}. Please end it first.',
-            'otp': existing_session.otp,
+            **rotating_otp.display_fields(existing_session),
             'subject': existing_session.subject,
             'expires_at': existing_session.expires_at.isoformat()
         }), 409  # Conflict
 
     # Create a new session using the SessionManager
     try:
-        session = session_manager.create_session(faculty_id, subject, location_data, expires_in_minutes)
+        session = session_manager.create_session(faculty_id, subject, location_data, expires_in_minutes,
+                                                 rotating=rotating, division=division)
     except Exception as e:
         db.session.rollback()
         return jsonify({"status": "error", "message": f"Failed to create session: {str(e)}"}), 500
 
     # Ensure timezone-aware datetime for response
-    expires_at = session.expires_at
-    if expires_at.tzinfo is None:
-        from datetime import timezone as tz
-        expires_at = expires_at.replace(tzinfo=tz.utc)
+    expires_at = as_utc(session.expires_at)
     
-    print(f"Session created - OTP: {session.otp}, Expires: {expires_at.isoformat()}")
+    print(f"Session created - OTP: {'rotating' if session.otp_secret else session.otp}, Expires: {expires_at.isoformat()}")
     
     return jsonify({
         'status': 'success',
         'message': 'Session started successfully',
-        'otp': session.otp,
+        **rotating_otp.display_fields(session),
         'session_code': session.session_code,
         'subject': session.subject,
+        'division': session.expected_division,
         'expires_at': expires_at.isoformat()
     })
 
@@ -193,7 +203,7 @@ def generate_otp():
         return jsonify({
             'status': 'error',
             'message': 'An active session already exists for this faculty.',
-            'otp': existing_session.otp,
+            **rotating_otp.display_fields(existing_session),
             'subject': existing_session.subject,
             'expires_at': existing_session.expires_at.isoformat()
         }), 409  # Conflict
@@ -236,19 +246,40 @@ def get_active_session():
     if not active_session:
         return jsonify({"status": "success", "session": None})
     
-    # Ensure timezone-aware datetime for response
-    expires_at = active_session.expires_at
-    if expires_at.tzinfo is None:
-        from datetime import timezone as tz
-        expires_at = expires_at.replace(tzinfo=tz.utc)
-    
     return jsonify({
         "status": "success",
         "session": {
-            "otp": active_session.otp,
+            **rotating_otp.display_fields(active_session),
             "subject": active_session.subject,
             "session_code": active_session.session_code,
-            "expires_at": expires_at.isoformat()
+            "expires_at": active_session.expires_at.isoformat()
+        }
+    })
+
+# -------------------------------
+# Current OTP (served from memory; lets take_attendance refresh rotating codes)
+# -------------------------------
+@faculty_bp.route('/get_active_session/code', methods=['GET'])
+@jwt_required()
+def get_active_session_code():
+    # Get faculty ID from JWT token
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+
+    # Verify it's a faculty token
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    active_session = session_manager.get_active_session(current_user_id)
+    if not active_session:
+        return jsonify({"status": "success", "session": None})
+
+    return jsonify({
+        "status": "success",
+        "session": {
+            **rotating_otp.display_fields(active_session),
+            "session_code": active_session.session_code,
+            "expires_at": active_session.expires_at.isoformat()
         }
     })
 
@@ -323,22 +354,206 @@ def update_location():
     if not active_session:
         return jsonify({"status": "error", "message": "No active session found for this faculty."}), 404
 
-    active_session.faculty_latitude = lat_val
-    active_session.faculty_longitude = lon_val
-    active_session.faculty_location_accuracy = accuracy_val
-    active_session.faculty_location_timestamp = datetime.now(timezone.utc)
-
-    db.session.commit()
+    # Pings go to the in-memory location trail; redundant ones are dropped there
+    updated_session, recorded = session_manager.update_location(active_session, lat_val, lon_val, accuracy_val)
 
-    return jsonify({
+    response = {
         'status': 'success',
-        'message': 'Location updated successfully',
+        'message': 'Location updated successfully' if recorded else 'Location unchanged',
+        'recorded': recorded,
         'latitude': lat_val,
         'longitude': lon_val,
         'accuracy': accuracy_val,
-        'timestamp': active_session.faculty_location_timestamp.isoformat()
+        'timestamp': updated_session.faculty_location_timestamp.isoformat() if updated_session.faculty_location_timestamp else None
+    }
+    # A manual correction re-checks the marks taken against the old position
+    if data.get('revalidate'):
+        response['revalidation'] = session_manager.revalidate_session(updated_session.id)
+    return jsonify(response)
+
+# -------------------------------
+# Bulk Mark (shared kiosk / offline sync uploads)
+# -------------------------------
+@faculty_bp.route('/sessions/<session_code>/bulk_mark', methods=['POST'])
+@jwt_required()
+def bulk_mark(session_code):
+    # Get faculty ID from JWT token
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+
+    # Verify it's a faculty token
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    data = request.get_json(silent=True) or {}
+    entries = data if isinstance(data, list) else data.get('marks')
+    if not isinstance(entries, list) or not entries or not all(isinstance(e, dict) for e in entries):
+        return jsonify({"status": "error", "message": "marks must be a non-empty list of objects"}), 400
+    if len(entries) > BULK_MARK_MAX_ROWS:
+        return jsonify({"status": "error", "message": f"At most {BULK_MARK_MAX_ROWS} marks per upload"}), 400
+
+    session = AttendanceSession.query.filter_by(session_code=session_code).first()
+    if not session:
+        return jsonify({"status": "error", "message": "Session not found"}), 404
+    if session.faculty_id != current_user_id:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    try:
+        results = session_manager.bulk_mark_attendance(session, entries)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "error", "message": f"Failed to upload marks: {str(e)}"}), 500
+
+    return jsonify({
+        "status": "success",
+        "session_code": session_code,
+        "subject": session.subject,
+        "summary": dict(Counter(r['result'] for r in results)),
+        "results": results
+    })
+
+# -------------------------------
+# Live Feed (Server-Sent Events: each new mark and the running present count)
+# -------------------------------
+@faculty_bp.route('/sessions/<session_code>/live', methods=['GET'])
+@jwt_required()
+def live_session_feed(session_code):
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    session = AttendanceSession.query.filter_by(session_code=session_code).first()
+    if not session:
+        return jsonify({"status": "error", "message": "Session not found"}), 404
+    if session.faculty_id != current_user_id:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+    if session.status != 'active':
+        return jsonify({"status": "error", "message": "Session is not active"}), 409
+
+    # Resume after the last event the client saw (header on reconnect, or a query parameter)
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or 0)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid Last-Event-ID"}), 400
+
+    # ?poll=1: the same marks as plain JSON, for clients turned away with a 503
+    if (request.args.get("poll") or "").strip().lower() in ("1", "true", "yes"):
+        return jsonify({"status": "success", **live_feed.snapshot(session.id, last_event_id)})
+    if not live_feed.available():
+        return jsonify({"status": "error", "message": "Too many live feeds, please poll"}), 503
+
+    session_id = session.id
+    db.session.rollback()  # the stream opens its own transactions as it reads
+    return Response(stream_with_context(live_feed.stream(session_id, current_user_id, last_event_id)), 200, {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # no proxy buffering in front of the stream
     })
 
+# -------------------------------
+# Re-validate Session (re-run the geofence over existing marks)
+# -------------------------------
+@faculty_bp.route('/sessions/<session_code>/revalidate', methods=['POST'])
+@jwt_required()
+def revalidate_session(session_code):
+    # Get faculty ID from JWT token
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+
+    # Verify it's a faculty token
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    session = AttendanceSession.query.filter_by(session_code=session_code).first()
+    if not session:
+        return jsonify({"status": "error", "message": "Session not found"}), 404
+    if session.faculty_id != current_user_id:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    try:
+        summary = session_manager.revalidate_session(session.id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "error", "message": f"Failed to re-validate session: {str(e)}"}), 500
+
+    return jsonify({"status": "success", **summary})
+
+# -------------------------------
+# Proxy Detection (marks of different students from the same spot)
+# -------------------------------
+def _proxy_params():
+    """radius (m), window (s) and limit query params, clamped; raises ValueError"""
+    radius = float(request.args.get('radius', proxy_detector.DEFAULT_RADIUS_M))
+    window = float(request.args.get('window', proxy_detector.DEFAULT_WINDOW_SECONDS))
+    limit = int(request.args.get('limit', 50))
+    return max(0.5, min(radius, 50.0)), max(1.0, min(window, 3600.0)), max(1, min(limit, 500))
+
+
+@faculty_bp.route('/sessions/<session_code>/proxy_clusters', methods=['GET'])
+@jwt_required()
+def session_proxy_clusters(session_code):
+    # Get faculty ID from JWT token
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+
+    # Verify it's a faculty token
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    try:
+        radius, window, limit = _proxy_params()
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "radius, window and limit must be numbers"}), 400
+
+    session = AttendanceSession.query.filter_by(session_code=session_code).first()
+    if not session:
+        return jsonify({"status": "error", "message": "Session not found"}), 404
+    if session.faculty_id != current_user_id:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    query = proxy_detector.located_marks_query().filter(Attendance.session_id == session.id)
+    clusters, total = proxy_detector.detect(proxy_detector.stream_marks(query), radius, window, limit)
+    proxy_detector.attach_roll_numbers(clusters)
+    return jsonify({"status": "success", "session_code": session_code, "radius_m": radius,
+                    "window_seconds": window, "total_clusters": total, "clusters": clusters})
+
+
+@faculty_bp.route('/proxy_clusters', methods=['GET'])
+@jwt_required()
+def term_proxy_clusters():
+    # Get faculty ID from JWT token
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+
+    # Verify it's a faculty token
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    try:
+        radius, window, limit = _proxy_params()
+        start_date = request.args.get("start_date")
+        end_date = request.args.get("end_date")
+        sd = date_cls.fromisoformat(start_date) if start_date else None
+        ed = date_cls.fromisoformat(end_date) if end_date else None
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "Invalid radius, window, limit or date (YYYY-MM-DD)"}), 400
+
+    # The faculty's own marks over the requested range (e.g. a whole term)
+    query = proxy_detector.located_marks_query().filter(Attendance.faculty_id == current_user_id)
+    if sd:
+        query = query.filter(Attendance.date >= sd)
+    if ed:
+        query = query.filter(Attendance.date <= ed)
+    subject = request.args.get("subject")
+    if subject:
+        query = query.filter(Attendance.subject == subject)
+
+    clusters, total = proxy_detector.detect(proxy_detector.stream_marks(query), radius, window, limit)
+    proxy_detector.attach_roll_numbers(clusters)
+    return jsonify({"status": "success", "radius_m": radius, "window_seconds": window,
+                    "total_clusters": total, "clusters": clusters})
+
 # -----------------------------------------
 # 📋 Route: List Faculty (for dropdowns)
 # -----------------------------------------
@@ -351,13 +566,9 @@ def list_faculty():
 
     # Optional name filter for typeahead clients
     name_q = (request.args.get('q') or '').strip()
-    query = Faculty.query
-    if name_q:
-        query = query.filter(Faculty.full_name.ilike(f"%{name_q}%"))
-
     faculty_list = [
         {"id": f.id, "full_name": f.full_name}
-        for f in query.order_by(Faculty.full_name.asc()).all()
+        for f in reports.faculty_query(name_q).all()
     ]
     return jsonify({"status": "success", "count": len(faculty_list), "faculty": faculty_list})
 
@@ -376,21 +587,10 @@ def view_reports():
         return jsonify({"status": "error", "message": "Unauthorized"}), 403
     
     # Allow viewing all faculty by default; optionally filter by faculty_id or faculty_name
-    faculty_id = None
-    faculty_id_param = request.args.get("faculty_id")
-    if faculty_id_param:
-        try:
-            faculty_id = int(faculty_id_param)
-        except (ValueError, TypeError):
-            faculty_id = None
-
-    subject = request.args.get("subject")
-    date = request.args.get("date")  # legacy single date filter
-    start_date = request.args.get("start_date")
-    end_date = request.args.get("end_date")
-    division = request.args.get("division")
-    faculty_name = request.args.get("faculty_name")
-    status = request.args.get("status")
+    try:
+        filters = reports.report_filters(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
     # Pagination & sorting
     try:
@@ -403,77 +603,35 @@ def view_reports():
         size = 15
     size = max(1, min(size, 100))  # guardrails
     sort = (request.args.get("sort") or "date").strip().lower()
-    order = (request.args.get("order") or "desc").strip().lower()
+    if sort not in reports.SORT_COLUMNS:
+        sort = "date"
+    order = "asc" if (request.args.get("order") or "desc").strip().lower() == "asc" else "desc"
+    cursor = request.args.get("cursor")
+    with_total = (request.args.get("with_total") or "").strip().lower()
 
-    query = Attendance.query
+    query = reports.report_query(filters, sort, order)
 
-    # Optional filters
-    if faculty_id is not None:
-        query = query.filter_by(faculty_id=faculty_id)
-    if subject:
-        query = query.filter_by(subject=subject)
-    if start_date and end_date:
+    if cursor:
+        # Keyset pagination: seeks past the cursor row instead of OFFSET, no COUNT unless asked
         try:
-            # Attendance.date is a DATE column; compare using date objects inclusively
-            sd = date_cls.fromisoformat(start_date)
-            ed = date_cls.fromisoformat(end_date)
-            query = query.filter(Attendance.date >= sd, Attendance.date <= ed)
+            rows, next_cursor, prev_cursor = reports.keyset_page(query, sort, order, size, cursor)
         except ValueError:
-            # fallback to legacy date filtering when invalid
-            if date:
-                query = query.filter(Attendance.date.like(f"%{date}%"))
-    elif date:
-        query = query.filter(Attendance.date.like(f"%{date}%"))
-    if division:
-        query = query.join(Student).filter(Student.division == division)
-    if faculty_name:
-        # Ensure join to Faculty for name-based filtering
-        query = query.join(Faculty, Attendance.faculty).filter(Faculty.full_name.ilike(f"%{faculty_name}%"))
-    if status:
-        query = query.filter(Attendance.status == status)
-
-    # Sorting
-    if sort == "student":
-        query = query.join(Student, Attendance.student_id == Student.id)
-        sort_col = Student.full_name
-    elif sort == "subject":
-        sort_col = Attendance.subject
-    elif sort == "division":
-        query = query.join(Student, Attendance.student_id == Student.id)
-        sort_col = Student.division
-    elif sort == "roll":
-        query = query.join(Student, Attendance.student_id == Student.id)
-        sort_col = Student.roll_number
-    elif sort == "status":
-        sort_col = Attendance.status
-    else:  # default: date
-        sort_col = Attendance.date
-
-    if order == "asc":
-        query = query.order_by(sort_col.asc())
+            return jsonify({"status": "error", "message": "Invalid cursor"}), 400
+        page = None
+        want_total = with_total in ("1", "true", "yes")
     else:
-        query = query.order_by(sort_col.desc())
-
-    # Total before pagination
-    total = query.count()
-
-    # Pagination
-    items = query.offset((page - 1) * size).limit(size).all()
-
-    report_data = []
-    for record in items:
-        student = Student.query.get(record.student_id)
-        faculty_name = record.faculty.full_name if record.faculty else "N/A"
-        report_data.append({
-            "id": record.id,
-            "student_name": student.full_name,
-            "roll_number": student.roll_number,
-            "division": student.division,
-            "faculty_name": faculty_name,
-            "subject": record.subject,
-            "date": record.date.isoformat() if record.date else None,
-            "status": record.status
-        })
+        # Page/size (offset) pagination, kept for existing clients; also hands out cursors
+        page = max(1, page)
+        rows = query.offset((page - 1) * size).limit(size + 1).all()
+        more = len(rows) > size
+        rows = rows[:size]
+        next_cursor = reports.encode_cursor(sort, order, rows[-1], "next") if rows and more else None
+        prev_cursor = reports.encode_cursor(sort, order, rows[0], "prev") if rows and page > 1 else None
+        want_total = with_total not in ("0", "false", "no")
+
+    # Counted over the same joins and filters as the rows, so it always agrees with them
+    total = reports.count_query(filters).scalar() if want_total else None
+    report_data = [reports.report_record(row) for row in rows]
 
     return jsonify({
         "status": "success",
@@ -481,9 +639,74 @@ def view_reports():
         "total": total,
         "page": page,
         "size": size,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
         "records": report_data
     })
 
+# -----------------------------------------
+# 📈 Route: Faculty Statistics (sessions and attendance in a date window)
+# -----------------------------------------
+@faculty_bp.route("/stats", methods=["GET"])
+@jwt_required()
+def stats():
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    # Same date parameters as the reports (date, start_date, end_date); last 30 days by default
+    try:
+        date_from, date_to = reports.date_bounds(request.args.get("date"), request.args.get("start_date"),
+                                                 request.args.get("end_date"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    date_from, date_to = faculty_stats.window(date_from, date_to)
+
+    return jsonify({"status": "success", **faculty_stats.get(current_user_id, date_from, date_to)})
+
+# -----------------------------------------
+# 🛠️ Route: Maintenance Status (leader and per-task counters)
+# -----------------------------------------
+@faculty_bp.route("/maintenance", methods=["GET"])
+@jwt_required()
+def maintenance_status():
+    claims = get_jwt()
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+    return jsonify({"status": "success", **maintenance.status()})
+
+# -----------------------------------------
+# 📊 Route: Attendance Summary (from the daily rollup)
+# -----------------------------------------
+@faculty_bp.route("/attendance_summary", methods=["GET"])
+@jwt_required()
+def attendance_summary():
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    # Same filters as view_reports, plus group_by: comma-separated date, faculty, subject, division
+    try:
+        filters = reports.report_filters(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    group_by = [name.strip().lower() for name in (request.args.get("group_by") or "date").split(",") if name.strip()]
+    unknown = [name for name in group_by if name not in rollup.GROUP_COLUMNS]
+    if unknown:
+        return jsonify({"status": "error", "message": f"Cannot group by: {', '.join(unknown)}"}), 400
+    group_by = list(dict.fromkeys(group_by))
+
+    groups = rollup.summary(filters, group_by)
+    return jsonify({
+        "status": "success",
+        "group_by": group_by,
+        "total": sum(group["total"] for group in groups),
+        "count": len(groups),
+        "groups": groups,
+    })
+
 # -----------------------------------------
 # 📤 Route: Export Attendance Reports (All Filtered Rows)
 # -----------------------------------------
@@ -496,114 +719,142 @@ def export_reports():
         return jsonify({"status": "error", "message": "Unauthorized"}), 403
 
     # Filters (same as view_reports)
-    faculty_id = None
-    faculty_id_param = request.args.get("faculty_id")
-    if faculty_id_param:
-        try:
-            faculty_id = int(faculty_id_param)
-        except (ValueError, TypeError):
-            faculty_id = None
-
-    subject = request.args.get("subject")
-    date = request.args.get("date")
-    start_date = request.args.get("start_date")
-    end_date = request.args.get("end_date")
-    division = request.args.get("division")
-    faculty_name = request.args.get("faculty_name")
-    status = request.args.get("status")
+    try:
+        filters = reports.report_filters(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     fmt = (request.args.get("format") or "csv").strip().lower()
+    sort = (request.args.get("sort") or "date").strip().lower()
+    order = (request.args.get("order") or "desc").strip().lower()
 
-    query = Attendance.query
-    if faculty_id is not None:
-        query = query.filter_by(faculty_id=faculty_id)
-    if subject:
-        query = query.filter_by(subject=subject)
-    if start_date and end_date:
-        try:
-            sd = date_cls.fromisoformat(start_date)
-            ed = date_cls.fromisoformat(end_date)
-            query = query.filter(Attendance.date >= sd, Attendance.date <= ed)
-        except ValueError:
-            if date:
-                query = query.filter(Attendance.date.like(f"%{date}%"))
-    elif date:
-        query = query.filter(Attendance.date.like(f"%{date}%"))
-    if division:
-        query = query.join(Student).filter(Student.division == division)
-    if faculty_name:
-        query = query.join(Faculty, Attendance.faculty).filter(Faculty.full_name.ilike(f"%{faculty_name}%"))
-    if status:
-        query = query.filter(Attendance.status == status)
-
-    # Always join student to avoid N+1 when exporting
-    query = query.join(Student, Attendance.student_id == Student.id)
-    query = query.order_by(Attendance.date.desc())
-    items = query.all()
-
-    headers = ["Student", "Roll", "Division", "Faculty", "Subject", "Date", "Status"]
+    # Archived sessions are included, so old ranges export like recent ones; they are merged
+    # in by date, and follow the other rows (by date) when sorting on anything else
+    rows = reports.export_rows(filters, sort, order)
 
-    if fmt == "excel":
-        # Simple HTML table (Excel-compatible)
-        rows_html = []
-        for record in items:
-            student = record.student or Student.query.get(record.student_id)
-            rows_html.append(
-                "<tr>" +
-                f"<td>{(student.full_name if student else '')}</td>" +
-                f"<td>{(student.roll_number if student else '')}</td>" +
-                f"<td>{(student.division if student else '')}</td>" +
-                f"<td>{(record.faculty.full_name if record.faculty else 'N/A')}</td>" +
-                f"<td>{(record.subject or '')}</td>" +
-                f"<td>{(record.date.isoformat() if record.date else '')}</td>" +
-                f"<td>{(record.status or '')}</td>" +
-                "</tr>"
-            )
-        table_html = (
-            "<table>" +
-            "<tr>" + ''.join([f"<th>{h}</th>" for h in headers]) + "</tr>" +
-            ''.join(rows_html) +
-            "</table>"
-        )
-        html_doc = (
-            "<!DOCTYPE html><html><head><meta charset=\"utf-8\"></head>" +
-            f"<body>{table_html}</body></html>"
-        )
+    if fmt in ("excel", "xlsx"):
+        # Office Open XML workbook, streamed row chunk by row chunk
         ts = datetime.now().strftime("%Y-%m-%d")
-        return (
-            html_doc,
-            200,
-            {
-                "Content-Type": "application/vnd.ms-excel;charset=utf-8;",
-                "Content-Disposition": f"attachment; filename=attendance-{ts}.xls",
-            },
-        )
-
-    # Default CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(headers)
-    for record in items:
-        student = record.student or Student.query.get(record.student_id)
-        writer.writerow([
-            (student.full_name if student else ''),
-            (student.roll_number if student else ''),
-            (student.division if student else ''),
-            (record.faculty.full_name if record.faculty else 'N/A'),
-            (record.subject or ''),
-            (record.date.isoformat() if record.date else ''),
-            (record.status or ''),
-        ])
-    csv_content = output.getvalue()
-    output.close()
+        return Response(stream_with_context(reports.iter_xlsx(rows)), 200, {
+            "Content-Type": xlsx.MIME_TYPE,
+            "Content-Disposition": f"attachment; filename=attendance-{ts}.xlsx",
+        })
+
+    # Default CSV, streamed in chunks as rows come off the cursor
     ts = datetime.now().strftime("%Y-%m-%d")
-    return (
-        csv_content,
-        200,
-        {
-            "Content-Type": "text/csv;charset=utf-8;",
-            "Content-Disposition": f"attachment; filename=attendance-{ts}.csv",
-        },
-    )
+    response_headers = {
+        "Content-Type": "text/csv;charset=utf-8;",
+        "Content-Disposition": f"attachment; filename=attendance-{ts}.csv",
+        "Vary": "Accept-Encoding",
+    }
+    body = reports.iter_csv(rows)
+    if "gzip" in request.headers.get("Accept-Encoding", "") and request.args.get("gzip") != "0":
+        body = reports.gzip_chunks(body)
+        response_headers["Content-Encoding"] = "gzip"
+    return Response(stream_with_context(body), 200, response_headers)
+
+# -----------------------------------------
+# ⏳ Route: Background Export Jobs
+# -----------------------------------------
+def _export_job_json(job):
+    total = job['total']
+    if job['state'] == 'done':
+        progress = 1.0
+    else:
+        progress = round(min(job['rows'] / total, 1.0), 4) if total else None
+    return {
+        "id": job['id'],
+        "state": job['state'],
+        "format": job['format'],
+        "rows_written": job['rows'],
+        "total_rows": total,
+        "progress": progress,
+        "bytes": job['bytes'],
+        "error": job['error'],
+        "created_at": datetime.fromtimestamp(job['created_at'], timezone.utc).isoformat(),
+        "finished_at": datetime.fromtimestamp(job['finished_at'], timezone.utc).isoformat() if job['finished_at'] else None,
+        "filename": export_jobs.filename(job),
+        "download_url": url_for("faculty_bp.download_export_job", job_id=job['id']) if job['state'] == 'done' else None,
+    }
+
+
+@faculty_bp.route("/export_jobs", methods=["POST"])
+@jwt_required()
+def create_export_job():
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    # Same filters as export_reports, from a JSON body or the query string
+    params = request.get_json(silent=True) or request.args
+    fmt = (params.get("format") or "csv").strip().lower()
+    if fmt == "excel":
+        fmt = "xlsx"
+    if fmt not in FORMATS:
+        return jsonify({"status": "error", "message": "format must be csv or xlsx"}), 400
+    sort = (params.get("sort") or "date").strip().lower()
+    if sort not in reports.SORT_COLUMNS:
+        sort = "date"
+    order = "asc" if (params.get("order") or "desc").strip().lower() == "asc" else "desc"
+
+    try:
+        filters = reports.report_filters(params)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    job, reused = export_jobs.submit(filters, fmt, sort, order, requested_by=current_user_id)
+    return jsonify({"status": "success", "reused": reused, "job": _export_job_json(job)}), 200 if reused else 202
+
+
+@faculty_bp.route("/export_jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def get_export_job(job_id):
+    claims = get_jwt()
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    job = export_jobs.get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Export not found"}), 404
+    return jsonify({"status": "success", "job": _export_job_json(job)})
+
+
+@faculty_bp.route("/export_jobs/<job_id>/download", methods=["GET"])
+@jwt_required()
+def download_export_job(job_id):
+    claims = get_jwt()
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    job = export_jobs.get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Export not found"}), 404
+    if job['state'] != 'done':
+        return jsonify({"status": "error", "message": "Export is not ready"}), 409
+    try:
+        # conditional=True answers Range and If-Modified-Since requests
+        return send_file(export_jobs.artifact(job), mimetype=FORMATS[job['format']][1], as_attachment=True,
+                         download_name=export_jobs.filename(job), conditional=True)
+    except FileNotFoundError:
+        return jsonify({"status": "error", "message": "Export has expired"}), 410
+
+# -----------------------------------------
+# 🗄️ Route: Archived Session (marks and location trail of a retired session)
+# -----------------------------------------
+@faculty_bp.route("/archive/sessions/<int:session_id>", methods=["GET"])
+@jwt_required()
+def archived_session(session_id: int):
+    current_user_id = int(get_jwt_identity())
+    claims = get_jwt()
+    if claims.get("type") != "faculty":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+
+    record = archive.session(session_id)
+    if record is None:
+        return jsonify({"status": "error", "message": "Archived session not found"}), 404
+    if record["faculty_id"] != current_user_id:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+    return jsonify({"status": "success", "session": record})
 
 # -----------------------------------------
 # 🧹 Route: Delete Attendance (Mark Absent)
@@ -624,6 +875,8 @@ def delete_attendance(attendance_id: int):
     # if record.faculty_id and record.faculty_id != current_user_id:
     #     return jsonify({"status": "error", "message": "Forbidden"}), 403
 
+    rollup.remove(Attendance.id == record.id)
+    faculty_stats.touch(record.faculty_id)
     db.session.delete(record)
     db.session.commit()
     return jsonify({"status": "success", "message": "Attendance marked absent (deleted)."})
\ No newline at end of file
@@ -1,10 +1,10 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import Attendance, Student
+from app.models import Student
 from app.utils import hash_password, verify_password, generate_tokens
-from app.utils.session_manager import SessionManager
+from app.utils.session_manager import SessionManager, MARK_PRESENT, MARK_DUPLICATE, MARK_INVALID_SESSION
+from app.utils.attendance_ingest import IngestQueueFull
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, get_jwt
-from datetime import datetime, timezone
 
 student_bp = Blueprint("student", __name__)
 session_manager = SessionManager()
@@ -111,29 +111,27 @@ def mark_attendance():
     if latitude is None or longitude is None:
         return jsonify({"status": "error", "message": "Location data is required"}), 400
     student_location = {"latitude": latitude, "longitude": longitude, "accuracy": data.get("accuracy")}
-    session = session_manager.get_session_by_otp(otp)
+    session = session_manager.get_session_by_otp(otp, subject)
     if not session:
         return jsonify({"status": "error", "message": "Invalid OTP"}), 400
-    expires_at = session.expires_at
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
-        return jsonify({"status": "error", "message": "OTP has expired"}), 400
     if session.subject != subject:
         return jsonify({"status": "error", "message": f"Subject mismatch. This OTP is for {session.subject}"}), 400
-    existing = Attendance.query.filter_by(session_id=session.id, student_id=current_user_id).first()
-    if existing:
-        return jsonify({"status": "error", "message": "Attendance already marked"}), 400
     try:
-        attendance = session_manager.validate_and_mark_attendance(otp, current_user_id, student_location)
-        if not attendance:
-            return jsonify({"status": "error", "message": "Location validation failed"}), 403
-        return jsonify({
-            "status": "success",
-            "message": f"Attendance marked successfully for {attendance.subject}!",
-            "subject": attendance.subject,
-            "distance": round(attendance.distance_from_faculty, 2) if attendance.distance_from_faculty else None
-        })
+        result = session_manager.validate_and_mark_attendance(otp, current_user_id, student_location, session=session)
+    except IngestQueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({"status": "error", "message": f"Failed: {str(e)}"}), 500
+    if result.status == MARK_DUPLICATE:
+        return jsonify({"status": "error", "message": "Attendance already marked"}), 400
+    if result.status == MARK_INVALID_SESSION:
+        return jsonify({"status": "error", "message": "Session has ended"}), 400
+    if result.status != MARK_PRESENT:
+        return jsonify({"status": "error", "message": "Location validation failed"}), 403
+    return jsonify({
+        "status": "success",
+        "message": f"Attendance marked successfully for {session.subject}!",
+        "subject": session.subject,
+        "distance": round(result.distance, 2) if result.distance is not None else None
+    })
@@ -5,13 +5,36 @@ document.getElementById('faculty-logout')?.addEventListener('click', ()=> SAAuth
 let lastReportRecords = [];
 let currentReportPage = 1;
 let currentReportSize = 15;
+// Cursor paging: prev/next follow the server's cursors; page numbers are only used for the first load
+let reportCursor = null;
+let reportStep = 0;
+let reportNextCursor = null;
+let reportPrevCursor = null;
+let reportOffset = 0;
+let reportTotal = 0;
 let lastReportQuery = '';
 
+// Quick stats: one cached aggregate instead of paging through reports
+(async ()=>{
+	const sessionsEl = document.getElementById('stat-sessions');
+	if(!sessionsEl) return;
+	try{
+		const res = await SA.apiFetch('faculty', '/faculty/stats', { method: 'GET', auth: true });
+		const data = await res.json();
+		if(!res.ok) return;
+		const totals = data.totals || {};
+		sessionsEl.textContent = String(totals.sessions ?? 0);
+		document.getElementById('stat-average').textContent = String(totals.average_present_per_session ?? 0);
+		document.getElementById('stat-rate').textContent = totals.attendance_rate == null ? '–' : `${Math.round(totals.attendance_rate * 100)}%`;
+	}catch(err){ /* leave the placeholders */ }
+})();
+
 document.getElementById('faculty-update-location')?.addEventListener('click', async ()=>{
 	const msg = document.getElementById('faculty-location-msg');
 	try{
 		const coords = await SA.getCurrentPosition();
-		const res = await SA.apiFetch('faculty', '/faculty/update_location', { method: 'POST', body: coords, auth: true });
+		// Manual correction: also re-check marks taken against the previous position
+		const res = await SA.apiFetch('faculty', '/faculty/update_location', { method: 'POST', body: { ...coords, revalidate: true }, auth: true });
 		const data = await res.json();
 		SA.showMsg(msg, data.message || (res.ok ? 'Location updated' : 'Failed'), res.ok);
 	}catch(err){ SA.showMsg(msg, 'Location permission denied or error', false); }
@@ -45,7 +68,18 @@ document.getElementById('report-filters')?.addEventListener('submit', async (e)=
     currentReportSize = parseInt(sizeSelect?.value || formData.get('size') || '15', 10) || 15;
     currentReportPage = parseInt(pageInput?.value || formData.get('page') || '1', 10) || 1;
     formData.set('size', String(currentReportSize));
-    formData.set('page', String(currentReportPage));
+    const cursorRequest = reportCursor;
+    const step = reportStep;
+    reportCursor = null;
+    reportStep = 0;
+    if(cursorRequest){
+        // Keyset page: no OFFSET and no COUNT; the total from the first page is kept
+        formData.delete('page');
+        formData.set('cursor', cursorRequest);
+        formData.set('with_total', '0');
+    }else{
+        formData.set('page', String(currentReportPage));
+    }
     const params = new URLSearchParams(Object.fromEntries(formData.entries()));
     lastReportQuery = params.toString();
     // UI loading state
@@ -57,12 +91,21 @@ document.getElementById('report-filters')?.addEventListener('submit', async (e)=
     if(loadBtn){ loadBtn.disabled = false; loadBtn.textContent = 'Load'; }
 	tableBody.innerHTML = '';
     if(res.ok && Array.isArray(data.records)){
+        const previousCount = lastReportRecords.length;
         lastReportRecords = data.records || [];
-		const total = Number(data.total || 0);
-		const page = Number(data.page || currentReportPage);
-		const size = Number(data.size || currentReportSize);
-		const startIdx = total ? (page - 1) * size + 1 : 0;
-		const endIdx = Math.min(page * size, total);
+        const size = Number(data.size || currentReportSize);
+        if(cursorRequest){
+            reportOffset = step > 0 ? reportOffset + previousCount : Math.max(0, reportOffset - lastReportRecords.length);
+        }else{
+            reportOffset = (Number(data.page || currentReportPage) - 1) * size;
+            reportTotal = Number(data.total || 0);
+        }
+        reportNextCursor = data.next_cursor || null;
+        reportPrevCursor = data.prev_cursor || null;
+        const total = reportTotal;
+        const page = Math.floor(reportOffset / size) + 1;
+        const startIdx = lastReportRecords.length ? reportOffset + 1 : 0;
+        const endIdx = reportOffset + lastReportRecords.length;
 		if(countEl){ 
             countEl.textContent = String(total);
             // Add animation class to parent for visual feedback
@@ -73,8 +116,8 @@ document.getElementById('report-filters')?.addEventListener('submit', async (e)=
             }
         }
 		if(pageInfo){ pageInfo.textContent = total ? `Showing ${startIdx}–${endIdx} of ${total}` : ''; }
-		if(prevBtn){ prevBtn.disabled = page <= 1; }
-		if(nextBtn){ nextBtn.disabled = endIdx >= total; }
+		if(prevBtn){ prevBtn.disabled = !reportPrevCursor; }
+		if(nextBtn){ nextBtn.disabled = !reportNextCursor; }
 		if(pageInput){ pageInput.value = String(page); }
 		for(const r of data.records){
 			const tr = document.createElement('tr');
@@ -111,6 +154,12 @@ document.getElementById('report-filters')?.addEventListener('submit', async (e)=
 
 // Pagination controls
 document.getElementById('report-page-prev')?.addEventListener('click', ()=>{
+    if(reportPrevCursor){
+        reportCursor = reportPrevCursor;
+        reportStep = -1;
+        document.getElementById('report-filters')?.dispatchEvent(new Event('submit', { cancelable: true }));
+        return;
+    }
     const pageInput = document.getElementById('report-page');
     const form = document.getElementById('report-filters');
     const sizeSelect = document.getElementById('report-page-size');
@@ -121,6 +170,12 @@ document.getElementById('report-page-prev')?.addEventListener('click', ()=>{
 });
 
 document.getElementById('report-page-next')?.addEventListener('click', ()=>{
+    if(reportNextCursor){
+        reportCursor = reportNextCursor;
+        reportStep = 1;
+        document.getElementById('report-filters')?.dispatchEvent(new Event('submit', { cancelable: true }));
+        return;
+    }
     const pageInput = document.getElementById('report-page');
     const form = document.getElementById('report-filters');
     const sizeSelect = document.getElementById('report-page-size');
@@ -134,6 +189,9 @@ document.getElementById('report-page-next')?.addEventListener('click', ()=>{
 document.getElementById('report-filters')?.addEventListener('change', (e)=>{
     const target = e.target;
     if(!(target instanceof HTMLElement)) return;
+    // Cursors belong to the old filters/sort; the next load starts from a page number again
+    reportNextCursor = null;
+    reportPrevCursor = null;
     // if user changed any filter control except the hidden page input, reset page to 1
     if(target.id !== 'report-page'){
         const pageInput = document.getElementById('report-page');
@@ -214,7 +272,7 @@ document.getElementById('report-download-csv')?.addEventListener('click', async
 });
 
 document.getElementById('report-download-excel')?.addEventListener('click', async ()=>{
-    // Download ALL filtered data as Excel-compatible HTML via export endpoint
+    // Download ALL filtered data as an .xlsx workbook via export endpoint
     const form = document.getElementById('report-filters');
     if(!form) return;
     const formData = new FormData(form);
@@ -226,7 +284,7 @@ document.getElementById('report-download-excel')?.addEventListener('click', asyn
         const blob = await res.blob();
         if(!res.ok){ alert('Failed to export Excel'); return; }
         const ts = new Date().toISOString().slice(0,10);
-        downloadBlob(blob, 'application/vnd.ms-excel;charset=utf-8;', `attendance-${ts}.xls`);
+        downloadBlob(blob, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', `attendance-${ts}.xlsx`);
     }catch(err){ alert('Network error'); }
 });
 
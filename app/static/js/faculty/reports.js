@@ -5,6 +5,13 @@ document.getElementById('faculty-logout')?.addEventListener('click', ()=> SAAuth
 let lastReportRecords = [];
 let currentReportPage = 1;
 let currentReportSize = 15;
+// Cursor paging: prev/next follow the server's cursors; page numbers are only used for the first load
+let reportCursor = null;
+let reportStep = 0;
+let reportNextCursor = null;
+let reportPrevCursor = null;
+let reportOffset = 0;
+let reportTotal = 0;
 
 function formatLocalDate(date){
     const y = date.getFullYear();
@@ -89,7 +96,18 @@ document.getElementById('report-filters')?.addEventListener('submit', async (e)=
     currentReportSize = parseInt(sizeSelect?.value || formData.get('size') || '15', 10) || 15;
     currentReportPage = parseInt(pageInput?.value || formData.get('page') || '1', 10) || 1;
     formData.set('size', String(currentReportSize));
-    formData.set('page', String(currentReportPage));
+    const cursorRequest = reportCursor;
+    const step = reportStep;
+    reportCursor = null;
+    reportStep = 0;
+    if(cursorRequest){
+        // Keyset page: no OFFSET and no COUNT; the total from the first page is kept
+        formData.delete('page');
+        formData.set('cursor', cursorRequest);
+        formData.set('with_total', '0');
+    }else{
+        formData.set('page', String(currentReportPage));
+    }
     // If start/end provided, drop single date param if present on form
     formData.delete('date');
     const params = new URLSearchParams(Object.fromEntries(formData.entries()));
@@ -101,12 +119,21 @@ document.getElementById('report-filters')?.addEventListener('submit', async (e)=
     if(loadBtn){ loadBtn.disabled = false; loadBtn.textContent = 'Load'; }
     tableBody.innerHTML = '';
     if(res.ok && Array.isArray(data.records)){
+        const previousCount = lastReportRecords.length;
         lastReportRecords = data.records || [];
-        const total = Number(data.total || 0);
-        const page = Number(data.page || currentReportPage);
         const size = Number(data.size || currentReportSize);
-        const startIdx = total ? (page - 1) * size + 1 : 0;
-        const endIdx = Math.min(page * size, total);
+        if(cursorRequest){
+            reportOffset = step > 0 ? reportOffset + previousCount : Math.max(0, reportOffset - lastReportRecords.length);
+        }else{
+            reportOffset = (Number(data.page || currentReportPage) - 1) * size;
+            reportTotal = Number(data.total || 0);
+        }
+        reportNextCursor = data.next_cursor || null;
+        reportPrevCursor = data.prev_cursor || null;
+        const total = reportTotal;
+        const page = Math.floor(reportOffset / size) + 1;
+        const startIdx = lastReportRecords.length ? reportOffset + 1 : 0;
+        const endIdx = reportOffset + lastReportRecords.length;
         if(countEl){
             countEl.textContent = String(total);
             // Add animation class to parent for visual feedback
@@ -117,8 +144,8 @@ document.getElementById('report-filters')?.addEventListener('submit', async (e)=
             }
         }
         if(pageInfo){ pageInfo.textContent = total ? `Showing ${startIdx}–${endIdx} of ${total}` : ''; }
-        if(prevBtn){ prevBtn.disabled = page <= 1; }
-        if(nextBtn){ nextBtn.disabled = endIdx >= total; }
+        if(prevBtn){ prevBtn.disabled = !reportPrevCursor; }
+        if(nextBtn){ nextBtn.disabled = !reportNextCursor; }
         if(pageInput){ pageInput.value = String(page); }
         for(const r of data.records){
             const tr = document.createElement('tr');
@@ -146,6 +173,12 @@ document.getElementById('report-filters')?.addEventListener('submit', async (e)=
 });
 
 document.getElementById('report-page-prev')?.addEventListener('click', ()=>{
+    if(reportPrevCursor){
+        reportCursor = reportPrevCursor;
+        reportStep = -1;
+        document.getElementById('report-filters')?.dispatchEvent(new Event('submit', { cancelable: true }));
+        return;
+    }
     const pageInput = document.getElementById('report-page');
     const form = document.getElementById('report-filters');
     const sizeSelect = document.getElementById('report-page-size');
@@ -156,6 +189,12 @@ document.getElementById('report-page-prev')?.addEventListener('click', ()=>{
 });
 
 document.getElementById('report-page-next')?.addEventListener('click', ()=>{
+    if(reportNextCursor){
+        reportCursor = reportNextCursor;
+        reportStep = 1;
+        document.getElementById('report-filters')?.dispatchEvent(new Event('submit', { cancelable: true }));
+        return;
+    }
     const pageInput = document.getElementById('report-page');
     const form = document.getElementById('report-filters');
     const sizeSelect = document.getElementById('report-page-size');
@@ -168,6 +207,9 @@ document.getElementById('report-page-next')?.addEventListener('click', ()=>{
 document.getElementById('report-filters')?.addEventListener('change', (e)=>{
     const target = e.target;
     if(!(target instanceof HTMLElement)) return;
+    // Cursors belong to the old filters/sort; the next load starts from a page number again
+    reportNextCursor = null;
+    reportPrevCursor = null;
     if(target.id !== 'report-page'){
         const pageInput = document.getElementById('report-page');
         if(pageInput) pageInput.value = '1';
@@ -178,45 +220,52 @@ document.getElementById('report-filters')?.addEventListener('change', (e)=>{
     }
 });
 
-// Export buttons
-document.getElementById('report-download-csv')?.addEventListener('click', async ()=>{
+// Export buttons: the server builds the file in the background; poll until it is ready
+async function runExportJob(format, button){
     const form = document.getElementById('report-filters');
     if(!form) return;
     const formData = new FormData(form);
     formData.delete('page');
-    const params = new URLSearchParams(Object.fromEntries(formData.entries()));
-    params.set('format', 'csv');
+    const body = Object.fromEntries(formData.entries());
+    body.format = format;
+    const label = button?.querySelector('span');
+    const original = label?.textContent;
+    if(button) button.disabled = true;
     try{
-        const res = await SA.apiFetch('faculty', `/faculty/export_reports?${params.toString()}`, { method: 'GET', auth: true });
+        let res = await SA.apiFetch('faculty', '/faculty/export_jobs', { method: 'POST', body, auth: true });
+        let data = await res.json();
+        if(!res.ok){ alert(data.message || 'Failed to start export'); return; }
+        let job = data.job;
+        while(job.state === 'queued' || job.state === 'running'){
+            if(label) label.textContent = job.progress != null ? `${Math.round(job.progress * 100)}%` : '...';
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            res = await SA.apiFetch('faculty', `/faculty/export_jobs/${job.id}`, { method: 'GET', auth: true });
+            data = await res.json();
+            if(!res.ok){ alert(data.message || 'Export failed'); return; }
+            job = data.job;
+        }
+        if(job.state !== 'done'){ alert(job.error || 'Export failed'); return; }
+        res = await SA.apiFetch('faculty', job.download_url, { method: 'GET', auth: true });
+        if(!res.ok){ alert('Failed to download export'); return; }
         const blob = await res.blob();
-        if(!res.ok){ alert('Failed to export CSV'); return; }
-        const ts = new Date().toISOString().slice(0,10);
         const url = URL.createObjectURL(blob);
         const a = document.createElement('a');
-        a.href = url; a.download = `attendance-${ts}.csv`;
+        a.href = url; a.download = job.filename;
         document.body.appendChild(a); a.click();
         setTimeout(()=>{ URL.revokeObjectURL(url); a.remove(); }, 0);
     }catch(err){ alert('Network error'); }
+    finally{
+        if(label) label.textContent = original;
+        if(button) button.disabled = false;
+    }
+}
+
+document.getElementById('report-download-csv')?.addEventListener('click', (e)=>{
+    runExportJob('csv', e.currentTarget);
 });
 
-document.getElementById('report-download-excel')?.addEventListener('click', async ()=>{
-    const form = document.getElementById('report-filters');
-    if(!form) return;
-    const formData = new FormData(form);
-    formData.delete('page');
-    const params = new URLSearchParams(Object.fromEntries(formData.entries()));
-    params.set('format', 'excel');
-    try{
-        const res = await SA.apiFetch('faculty', `/faculty/export_reports?${params.toString()}`, { method: 'GET', auth: true });
-        const blob = await res.blob();
-        if(!res.ok){ alert('Failed to export Excel'); return; }
-        const ts = new Date().toISOString().slice(0,10);
-        const url = URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url; a.download = `attendance-${ts}.xls`;
-        document.body.appendChild(a); a.click();
-        setTimeout(()=>{ URL.revokeObjectURL(url); a.remove(); }, 0);
-    }catch(err){ alert('Network error'); }
+document.getElementById('report-download-excel')?.addEventListener('click', (e)=>{
+    runExportJob('xlsx', e.currentTarget);
 });
 
 // Populate faculty dropdown on load
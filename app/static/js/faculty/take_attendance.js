@@ -2,6 +2,11 @@ SAAuth.ensureAuthenticated('faculty', '/faculty/login');
 
 let locationGranted = false;
 let sessionTimer = null;
+let otpRefreshTimer = null;
+let liveFeed = null;
+// Live feed fallback when the server has no stream to spare: poll interval and rounds before streaming again
+const LIVE_POLL_MS = 5000;
+const LIVE_POLL_ROUNDS = 12;
 
 // Check for existing session on page load
 window.addEventListener('DOMContentLoaded', async ()=>{
@@ -123,10 +128,12 @@ if(startBtn){
 		
 		try{
 			const coords = await SA.getCurrentPosition();
+			const rotating = !!document.getElementById('rotating-otp-input')?.checked;
+			const division = document.getElementById('division-input')?.value || null;
 			
 			const res = await SA.apiFetch('faculty', '/faculty/start_session', { 
 				method: 'POST', 
-				body: { subject: subject, location: coords },
+				body: { subject: subject, location: coords, rotating_otp: rotating, division: division },
 				auth: true 
 			});
 			const data = await res.json();
@@ -158,6 +165,8 @@ function showActiveSession(data){
 	if(subjectSpan) subjectSpan.textContent = data.subject || '';
 	if(otpSpan) otpSpan.textContent = data.otp || '';
 	if(activeDiv) activeDiv.style.display = 'block';
+	scheduleOtpRefresh(data);
+	if(data.session_code) startLiveFeed(data.session_code);
 	
 	if(data.expires_at && timerSpan){
 		const expiresAt = new Date(data.expires_at);
@@ -171,6 +180,154 @@ function showActiveSession(data){
 	}
 }
 
+// Live feed: Server-Sent Events read with fetch (EventSource cannot send the
+// Authorization header). Reconnects after the server's retry delay and resumes
+// from the last event id, so no mark is shown twice or missed.
+function startLiveFeed(sessionCode){
+	stopLiveFeed();
+	const feed = { sessionCode, lastEventId: null, retry: 3000, controller: null, stopped: false, seen: new Set() };
+	liveFeed = feed;
+	const list = document.getElementById('live-marks');
+	if(list) list.innerHTML = '';
+	readLiveFeed(feed);
+}
+
+function stopLiveFeed(){
+	if(!liveFeed) return;
+	liveFeed.stopped = true;
+	if(liveFeed.controller) liveFeed.controller.abort();
+	liveFeed = null;
+}
+
+async function readLiveFeed(feed){
+	const status = document.getElementById('live-feed-status');
+	while(!feed.stopped){
+		feed.controller = new AbortController();
+		const headers = { 'Authorization': `Bearer ${SA.getToken('faculty')}` };
+		if(feed.lastEventId) headers['Last-Event-ID'] = feed.lastEventId;
+		try{
+			const res = await fetch(`${window.location.origin}/faculty/sessions/${encodeURIComponent(feed.sessionCode)}/live`,
+				{ headers, signal: feed.controller.signal, cache: 'no-store' });
+			if(res.status === 409 || res.status === 403 || res.status === 404) return;  // session over or not ours
+			if(res.status === 503){
+				// No stream to spare on the server: poll for a while, then try streaming again
+				if(await pollLiveFeed(feed) === 'closed') return;
+				continue;
+			}
+			if(!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+			if(status) status.textContent = 'Live';
+			const reader = res.body.getReader();
+			const decoder = new TextDecoder();
+			let buffer = '';
+			while(true){
+				const { value, done } = await reader.read();
+				if(done) break;
+				buffer += decoder.decode(value, { stream: true });
+				let end;
+				while((end = buffer.indexOf('\n\n')) !== -1){
+					const frame = buffer.slice(0, end);
+					buffer = buffer.slice(end + 2);
+					if(handleLiveFrame(feed, frame) === 'closed') return;
+				}
+			}
+		}catch(err){
+			if(feed.stopped) return;
+			console.log('Live feed interrupted:', err);
+		}
+		if(status) status.textContent = 'Reconnecting...';
+		await new Promise(resolve => setTimeout(resolve, feed.retry));
+	}
+}
+
+async function pollLiveFeed(feed){
+	const status = document.getElementById('live-feed-status');
+	if(status) status.textContent = 'Live (updates every few seconds)';
+	for(let round = 0; round < LIVE_POLL_ROUNDS; round++){
+		await new Promise(resolve => setTimeout(resolve, LIVE_POLL_MS));
+		if(feed.stopped) return 'closed';
+		try{
+			const params = new URLSearchParams({ poll: '1', last_event_id: feed.lastEventId || 0 });
+			const res = await fetch(`${window.location.origin}/faculty/sessions/${encodeURIComponent(feed.sessionCode)}/live?${params}`,
+				{ headers: { 'Authorization': `Bearer ${SA.getToken('faculty')}` }, cache: 'no-store' });
+			if(res.status === 409 || res.status === 403 || res.status === 404) return 'closed';
+			if(!res.ok) continue;
+			const data = await res.json();
+			data.marks.forEach(mark => showLiveMark(feed, mark));
+			feed.lastEventId = String(data.last_event_id);
+			const count = document.getElementById('live-present-count');
+			if(count) count.textContent = data.present_count;
+		}catch(err){
+			console.log('Live feed poll failed:', err);
+		}
+	}
+	return 'retry';
+}
+
+function handleLiveFrame(feed, frame){
+	let name = 'message', data = '', id = null;
+	for(const line of frame.split('\n')){
+		if(line.startsWith(':')) continue;  // heartbeat
+		const colon = line.indexOf(':');
+		const field = colon === -1 ? line : line.slice(0, colon);
+		const value = colon === -1 ? '' : line.slice(colon + 1).replace(/^ /, '');
+		if(field === 'event') name = value;
+		else if(field === 'data') data += value;
+		else if(field === 'id') id = value;
+		else if(field === 'retry' && /^\d+$/.test(value)) feed.retry = parseInt(value, 10);
+	}
+	if(id) feed.lastEventId = id;
+	if(!data) return name;
+	const payload = JSON.parse(data);
+	const count = document.getElementById('live-present-count');
+	if(count && payload.present_count !== undefined) count.textContent = payload.present_count;
+	if(name === 'mark') showLiveMark(feed, payload);
+	if(name === 'closed'){
+		const status = document.getElementById('live-feed-status');
+		if(status) status.textContent = 'Session ended';
+	}
+	return name;
+}
+
+function showLiveMark(feed, mark){
+	const list = document.getElementById('live-marks');
+	if(!list || feed.seen.has(mark.attendance_id)) return;
+	feed.seen.add(mark.attendance_id);
+	const item = document.createElement('li');
+	item.className = 'flex justify-between';
+	const who = document.createElement('span');
+	who.textContent = `${mark.student_name || 'Student'} (${mark.roll_number || '-'})`;
+	const where = document.createElement('span');
+	where.className = 'text-slate-500';
+	where.textContent = mark.distance !== null && mark.distance !== undefined ? `${mark.distance} m` : mark.status;
+	item.append(who, where);
+	list.prepend(item);
+}
+
+// Rotating OTPs: fetch the next code when the current window ends
+function scheduleOtpRefresh(data){
+	if(otpRefreshTimer){
+		clearTimeout(otpRefreshTimer);
+		otpRefreshTimer = null;
+	}
+	if(!data.rotating || !data.seconds_remaining) return;
+	otpRefreshTimer = setTimeout(refreshOtp, data.seconds_remaining * 1000 + 250);
+}
+
+async function refreshOtp(){
+	otpRefreshTimer = null;
+	try{
+		const res = await SA.apiFetch('faculty', '/faculty/get_active_session/code', { method: 'GET', auth: true });
+		const data = await res.json();
+		if(!res.ok || !data.session) return;
+		const otpSpan = document.getElementById('active-otp');
+		if(otpSpan) otpSpan.textContent = data.session.otp || '';
+		scheduleOtpRefresh(data.session);
+	}catch(err){
+		console.log('Failed to refresh OTP:', err);
+		otpRefreshTimer = setTimeout(refreshOtp, 5000);
+	}
+}
+
 function updateTimer(expiresAt, timerSpan){
 	const now = new Date();
 	const diff = expiresAt - now;
@@ -182,6 +339,10 @@ function updateTimer(expiresAt, timerSpan){
 			clearInterval(sessionTimer);
 			sessionTimer = null;
 		}
+		if(otpRefreshTimer){
+			clearTimeout(otpRefreshTimer);
+			otpRefreshTimer = null;
+		}
 		return;
 	}
 	
@@ -207,6 +368,11 @@ if(endBtn){
 					clearInterval(sessionTimer);
 					sessionTimer = null;
 				}
+				if(otpRefreshTimer){
+					clearTimeout(otpRefreshTimer);
+					otpRefreshTimer = null;
+				}
+				stopLiveFeed();
 				
 				const activeSession = document.getElementById('active-session');
 				const sessionForm = document.getElementById('session-form');
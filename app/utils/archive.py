@@ -0,0 +1,226 @@
+import gzip
+import heapq
+import json
+from datetime import date, datetime
+from typing import NamedTuple
+
+from app import db
+from app.models import Attendance, AttendanceArchive, AttendanceSession, Faculty, SessionLocation, Student
+from app.utils.session_index import as_utc
+
+# Payload layout version, stored in every payload
+PAYLOAD_VERSION = 1
+
+# Attendance columns kept per archived mark; student_name, roll_number and division
+# are copied from the student as they were when the session was archived
+ATTENDANCE_FIELDS = ('id', 'student_id', 'student_name', 'roll_number', 'division', 'subject', 'date', 'status',
+                     'faculty_id', 'student_latitude', 'student_longitude', 'student_location_accuracy',
+                     'distance_from_faculty', 'marked_at')
+LOCATION_FIELDS = ('latitude', 'longitude', 'accuracy', 'recorded_at')
+
+# Archived sessions decompressed per round trip when reading
+READ_CHUNK_SIZE = 100
+
+
+class ArchivedRow(NamedTuple):
+    """An archived mark with the attributes of a report row (reports.report_query)"""
+    id: int
+    student_name: str | None
+    roll_number: str | None
+    division: str | None
+    faculty_name: str | None
+    subject: str
+    date: date
+    status: str
+
+
+def archive_sessions(session_ids: list[int]) -> int:
+    """Copy sessions with their attendance and location trail into attendance_archive.
+
+    Call inside the transaction that then deletes them from the hot tables,
+    so a session is either archived and gone or still hot. The caller
+    commits. Returns the number of archive rows added.
+    """
+    sessions = db.session.query(AttendanceSession, Faculty.full_name).outerjoin(
+        Faculty, Faculty.id == AttendanceSession.faculty_id,
+    ).filter(AttendanceSession.id.in_(session_ids)).order_by(AttendanceSession.id).all()
+    marks, trails = {}, {}
+    for row in db.session.query(
+        Attendance.session_id, Attendance.id, Attendance.student_id,
+        Student.full_name.label('student_name'), Student.roll_number, Student.division,
+        Attendance.subject, Attendance.date, Attendance.status, Attendance.faculty_id,
+        Attendance.student_latitude, Attendance.student_longitude, Attendance.student_location_accuracy,
+        Attendance.distance_from_faculty, Attendance.marked_at,
+    ).outerjoin(Student, Student.id == Attendance.student_id).filter(
+        Attendance.session_id.in_(session_ids),
+    ).order_by(Attendance.session_id, Attendance.id):
+        marks.setdefault(row.session_id, []).append(row)
+    for row in db.session.query(
+        SessionLocation.session_id, SessionLocation.latitude, SessionLocation.longitude,
+        SessionLocation.accuracy, SessionLocation.recorded_at,
+    ).filter(SessionLocation.session_id.in_(session_ids)).order_by(
+        SessionLocation.session_id, SessionLocation.recorded_at,
+    ):
+        trails.setdefault(row.session_id, []).append(row)
+
+    records = []
+    for session, faculty_name in sessions:
+        rows = marks.get(session.id, [])
+        dates = [row.date for row in rows] or [as_utc(session.created_at).date()]
+        counts = {}
+        for row in rows:
+            key = (row.date.isoformat(), row.subject, row.division, row.status)
+            counts[key] = counts.get(key, 0) + 1
+        records.append(AttendanceArchive(
+            session_id=session.id,
+            session_code=session.session_code,
+            faculty_id=session.faculty_id,
+            faculty_name=faculty_name,
+            subject=session.subject,
+            expected_division=session.expected_division,
+            status=session.status,
+            created_at=session.created_at,
+            expires_at=session.expires_at,
+            closed_at=session.closed_at,
+            first_date=min(dates),
+            last_date=max(dates),
+            rows=len(rows),
+            counts=json.dumps([[*key, count] for key, count in sorted(counts.items(), key=str)]),
+            payload=encode(rows, trails.get(session.id, [])),
+        ))
+    db.session.add_all(records)
+    return len(records)
+
+
+def encode(marks, trail) -> bytes:
+    """gzip-compressed JSON of a session's marks and trail, stored one list per column"""
+    document = {
+        'version': PAYLOAD_VERSION,
+        'attendance': {name: [_plain(getattr(row, name)) for row in marks] for name in ATTENDANCE_FIELDS},
+        'locations': {name: [_plain(getattr(row, name)) for row in trail] for name in LOCATION_FIELDS},
+    }
+    return gzip.compress(json.dumps(document, separators=(',', ':')).encode('utf-8'), compresslevel=9)
+
+
+def decode(payload: bytes) -> tuple[list[dict], list[dict]]:
+    """(marks, trail) of an archived session, one dict per row; dates are parsed back"""
+    document = json.loads(gzip.decompress(payload))
+    marks = [dict(zip(ATTENDANCE_FIELDS, values)) for values in zip(
+        *(document['attendance'][name] for name in ATTENDANCE_FIELDS))]
+    trail = [dict(zip(LOCATION_FIELDS, values)) for values in zip(
+        *(document['locations'][name] for name in LOCATION_FIELDS))]
+    for mark in marks:
+        mark['date'] = date.fromisoformat(mark['date'])
+        mark['marked_at'] = datetime.fromisoformat(mark['marked_at']) if mark['marked_at'] else None
+    for fix in trail:
+        fix['recorded_at'] = datetime.fromisoformat(fix['recorded_at'])
+    return marks, trail
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def matching(filters: dict):
+    """Archived sessions that may hold rows for these report filters (reports.report_filters).
+
+    Narrowed by the session columns and the first/last date; rows are then
+    filtered one by one (see rows()).
+    """
+    query = AttendanceArchive.query
+    if filters.get('faculty_id') is not None:
+        query = query.filter(AttendanceArchive.faculty_id == filters['faculty_id'])
+    if filters.get('subject'):
+        query = query.filter(AttendanceArchive.subject == filters['subject'])
+    if filters.get('date_from'):
+        query = query.filter(AttendanceArchive.last_date >= date.fromisoformat(filters['date_from']))
+    if filters.get('date_to'):
+        query = query.filter(AttendanceArchive.first_date < date.fromisoformat(filters['date_to']))
+    if filters.get('faculty_name'):
+        query = query.filter(AttendanceArchive.faculty_name.ilike(f"%{filters['faculty_name']}%"))
+    return query
+
+
+def rows(record: AttendanceArchive, filters: dict) -> list[ArchivedRow]:
+    """The report rows of one archived session that pass the filters"""
+    date_from = date.fromisoformat(filters['date_from']) if filters.get('date_from') else None
+    date_to = date.fromisoformat(filters['date_to']) if filters.get('date_to') else None
+    marks, _ = decode(record.payload)
+    return [
+        ArchivedRow(mark['id'], mark['student_name'], mark['roll_number'], mark['division'],
+                    record.faculty_name, mark['subject'], mark['date'], mark['status'])
+        for mark in marks
+        if (filters.get('faculty_id') is None or mark['faculty_id'] == filters['faculty_id'])
+        and (not filters.get('subject') or mark['subject'] == filters['subject'])
+        and (date_from is None or mark['date'] >= date_from)
+        and (date_to is None or mark['date'] < date_to)
+        and (not filters.get('division') or mark['division'] == filters['division'])
+        and (not filters.get('status') or mark['status'] == filters['status'])
+    ]
+
+
+def iter_rows(filters: dict, descending: bool = True):
+    """Archived report rows for the filters, ordered by (date, id).
+
+    Streamed: sessions are read in order of their first (or, descending,
+    last) date and rows are held back only until no later session can
+    precede them. Archived rows have no other order; sorting them by name or
+    roll number would mean decoding every matching session at once.
+    """
+    query = matching(filters)
+    sign = -1 if descending else 1
+    bound_column = AttendanceArchive.last_date if descending else AttendanceArchive.first_date
+    query = query.order_by(bound_column.desc() if descending else bound_column.asc(), AttendanceArchive.id)
+    pending = []
+    for record in query.yield_per(READ_CHUNK_SIZE):
+        bound = sign * (record.last_date if descending else record.first_date).toordinal()
+        while pending and pending[0][0] < bound:
+            yield heapq.heappop(pending)[2]
+        for row in rows(record, filters):
+            heapq.heappush(pending, (sign * row.date.toordinal(), sign * row.id, row))
+    while pending:
+        yield heapq.heappop(pending)[2]
+
+
+def total(filters: dict) -> int:
+    """Number of archived rows a report with these filters has, from the stored counts"""
+    date_from = filters.get('date_from')
+    date_to = filters.get('date_to')
+    count = 0
+    for (counts,) in matching(filters).with_entities(AttendanceArchive.counts):
+        for day, subject, division, status, rows_count in json.loads(counts):
+            # ISO dates compare correctly as strings
+            if ((not date_from or day >= date_from) and (not date_to or day < date_to)
+                    and (not filters.get('subject') or subject == filters['subject'])
+                    and (not filters.get('division') or division == filters['division'])
+                    and (not filters.get('status') or status == filters['status'])):
+                count += rows_count
+    return count
+
+
+def session(session_id: int) -> dict | None:
+    """An archived session with its marks and location trail, or None if it is not archived"""
+    record = AttendanceArchive.query.filter_by(session_id=session_id).order_by(
+        AttendanceArchive.id.desc()).first()
+    if record is None:
+        return None
+    marks, trail = decode(record.payload)
+    return {
+        'session_id': record.session_id,
+        'session_code': record.session_code,
+        'faculty_id': record.faculty_id,
+        'faculty_name': record.faculty_name,
+        'subject': record.subject,
+        'expected_division': record.expected_division,
+        'status': record.status,
+        'created_at': as_utc(record.created_at).isoformat(),
+        'expires_at': as_utc(record.expires_at).isoformat(),
+        'closed_at': as_utc(record.closed_at).isoformat() if record.closed_at else None,
+        'archived_at': as_utc(record.archived_at).isoformat(),
+        'attendance': [{**mark, 'date': mark['date'].isoformat(),
+                        'marked_at': mark['marked_at'].isoformat() if mark['marked_at'] else None}
+                       for mark in marks],
+        'locations': [{**fix, 'recorded_at': fix['recorded_at'].isoformat()} for fix in trail],
+    }
@@ -0,0 +1,126 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app import db
+
+_STOP = object()
+
+
+class IngestQueueFull(Exception):
+    """Raised when the write-behind queue cannot accept another mark in time"""
+
+
+class AttendanceIngestQueue:
+    """Write-behind queue that turns concurrent marks into multi-row inserts.
+
+    Request threads submit fully validated attendance rows and wait on the
+    returned Future. A single flusher thread per process drains the queue
+    every ATTENDANCE_INGEST_FLUSH_MS milliseconds or ATTENDANCE_INGEST_BATCH_SIZE
+    rows, writes the batch with one INSERT ... ON CONFLICT DO NOTHING and one
+    commit, then resolves each Future with the new attendance id, or None if
+    the student had already marked.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._queue: queue.Queue | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.batch_size = 200
+        self.flush_interval = 0.02
+        self.submit_timeout = 5.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        self.enabled = app.config.get('ATTENDANCE_INGEST_MODE', 'direct') == 'batched'
+        self.batch_size = int(app.config.get('ATTENDANCE_INGEST_BATCH_SIZE', self.batch_size))
+        self.flush_interval = int(app.config.get('ATTENDANCE_INGEST_FLUSH_MS', 20)) / 1000.0
+        self._queue = queue.Queue(maxsize=int(app.config.get('ATTENDANCE_INGEST_QUEUE_SIZE', 2000)))
+        app.extensions['attendance_ingest'] = self
+
+    def submit(self, row: dict) -> Future:
+        """Queue one attendance row; the Future resolves to its id or None on duplicate"""
+        self._start()
+        future = Future()
+        try:
+            self._queue.put((row, future), timeout=self.submit_timeout)
+        except queue.Full:
+            raise IngestQueueFull('Attendance queue is full, please retry')
+        return future
+
+    def shutdown(self, timeout: float = 10.0):
+        """Flush whatever is queued and stop the flusher thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # Started lazily so gunicorn workers each get their own thread after fork
+            self._thread = threading.Thread(target=self._run, name='attendance-ingest', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch):
+        from app.utils.session_manager import insert_attendance_rows
+
+        # A student double-submitting inside one batch: only the first row is inserted
+        rows, seen = [], set()
+        for row, _ in batch:
+            key = (row['session_id'], row['student_id'])
+            if key not in seen:
+                seen.add(key)
+                rows.append(row)
+
+        with self._app.app_context():
+            try:
+                inserted = insert_attendance_rows(rows, active_only=True)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+
+        for row, future in batch:
+            # pop() so a duplicate later in the same batch sees None
+            future.set_result(inserted.pop((row['session_id'], row['student_id']), None))
+
+
+attendance_ingest = AttendanceIngestQueue()
@@ -0,0 +1,256 @@
+import atexit
+import glob
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from app import db
+
+# Formats a job can produce: file extension and MIME type
+FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# A running job not updated for this long belongs to a worker that died
+STALE_SECONDS = 15 * 60
+
+# Queued jobs record the process (and host) whose thread pool will run them
+_HOST = socket.gethostname()
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ExportJobs:
+    """Report exports written in the background to EXPORT_DIR.
+
+    submit() records a job as a JSON sidecar next to its artifact and hands
+    it to a small thread pool, so the request returns at once. The sidecar
+    holds state and progress and is rewritten (atomically) after every
+    chunk, which lets any worker process answer status and download
+    requests. A submit whose normalized filters match a job that is still
+    running, or finished less than EXPORT_REUSE_SECONDS ago, gets that job
+    back instead of a new one. Artifacts older than EXPORT_MAX_AGE_SECONDS
+    are deleted, then the oldest until the directory is under
+    EXPORT_MAX_BYTES.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.directory = None
+        self.workers = 2
+        self.reuse_seconds = 600.0
+        self.max_age = 24 * 3600.0
+        self.max_bytes = 2 * 1024 ** 3
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        self.directory = app.config.get('EXPORT_DIR') or os.path.join(app.instance_path, 'exports')
+        self.workers = int(app.config.get('EXPORT_WORKERS', self.workers))
+        self.reuse_seconds = float(app.config.get('EXPORT_REUSE_SECONDS', self.reuse_seconds))
+        self.max_age = float(app.config.get('EXPORT_MAX_AGE_SECONDS', self.max_age))
+        self.max_bytes = int(app.config.get('EXPORT_MAX_BYTES', self.max_bytes))
+        app.extensions['export_jobs'] = self
+
+    def submit(self, filters: dict, fmt: str, sort: str, order: str, requested_by: int | None = None):
+        """Queue an export, or reuse a matching one; returns (job, reused)"""
+        normalized = {name: value for name, value in filters.items() if value not in (None, '')}
+        key = hashlib.sha256(json.dumps(
+            {'filters': normalized, 'format': fmt, 'sort': sort, 'order': order},
+            sort_keys=True, default=str).encode()).hexdigest()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            now = time.time()
+            for job in self._jobs():
+                if job['key'] == key and (self._alive(job, now) or (
+                        job['state'] == 'done' and now - job['finished_at'] < self.reuse_seconds
+                        and os.path.exists(self.artifact(job)))):
+                    return job, True
+            job = {
+                'id': uuid.uuid4().hex,
+                'key': key,
+                'format': fmt,
+                'filters': normalized,
+                'sort': sort,
+                'order': order,
+                'requested_by': requested_by,
+                'pid': os.getpid(),
+                'host': _HOST,
+                'state': 'queued',
+                'rows': 0,
+                'total': None,
+                'bytes': None,
+                'error': None,
+                'created_at': now,
+                'started_at': None,
+                'finished_at': None,
+                'updated_at': now,
+            }
+            self._write(job)
+        self._pool().submit(self._run, job['id'])
+        return job, False
+
+    def get(self, job_id: str) -> dict | None:
+        """A job's sidecar, or None for an unknown (or malformed) id"""
+        if not _JOB_ID.match(job_id or ''):
+            return None
+        try:
+            with open(self._sidecar(job_id)) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job['state'] in ('queued', 'running') and not self._alive(job, time.time()):
+            job['state'], job['error'] = 'failed', 'Export worker stopped'
+        return job
+
+    def artifact(self, job: dict) -> str:
+        return os.path.join(self.directory, f"{job['id']}.{FORMATS[job['format']][0]}")
+
+    def filename(self, job: dict) -> str:
+        """Download name for a job's file"""
+        day = datetime.fromtimestamp(job['created_at'], timezone.utc).strftime('%Y-%m-%d')
+        return f"attendance-{day}.{FORMATS[job['format']][0]}"
+
+    def evict(self):
+        """Delete expired artifacts, then the oldest until the directory fits EXPORT_MAX_BYTES"""
+        now = time.time()
+        with self._lock:
+            finished = []
+            for job in self._jobs():
+                if self._alive(job, now):
+                    continue
+                if job['finished_at'] is None or now - job['finished_at'] > self.max_age:
+                    # Expired, or left behind by a worker that died mid-export
+                    self._delete(job)
+                elif job['state'] == 'done':
+                    finished.append(job)
+            total = sum(job['bytes'] or 0 for job in finished)
+            for job in sorted(finished, key=lambda j: j['finished_at']):
+                if total <= self.max_bytes:
+                    break
+                self._delete(job)
+                total -= job['bytes'] or 0
+
+    def shutdown(self):
+        """Stop taking jobs; running exports are left to finish"""
+        executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Created lazily so gunicorn workers each get their own pool after fork
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export-job')
+                    atexit.register(self.shutdown)
+        return self._executor
+
+    def _run(self, job_id: str):
+        from app.utils import archive, reports
+
+        job = self.get(job_id)
+        if job is None:
+            return
+        path = self.artifact(job)
+        partial = path + '.part'
+        with self._app.app_context():
+            try:
+                job.update(state='running', started_at=time.time())
+                self._write(job)
+                rows = reports.export_rows(job['filters'], job['sort'], job['order'])
+                job['total'] = reports.count_query(job['filters']).scalar() + archive.total(job['filters'])
+                self._write(job)
+
+                def progress(rows):
+                    job['rows'] = rows
+                    self._write(job)
+
+                if job['format'] == 'xlsx':
+                    chunks = reports.iter_xlsx(rows, progress=progress)
+                else:
+                    chunks = (chunk.encode('utf-8') for chunk in reports.iter_csv(rows, progress=progress))
+                with open(partial, 'wb') as out:
+                    for chunk in chunks:
+                        out.write(chunk)
+                os.replace(partial, path)
+                job.update(state='done', bytes=os.path.getsize(path), finished_at=time.time())
+            except Exception as e:
+                db.session.rollback()
+                job.update(state='failed', error=str(e), finished_at=time.time())
+                print(f"Error running export job {job_id}: {e}")
+                if os.path.exists(partial):
+                    os.remove(partial)
+            self._write(job)
+        self.evict()
+
+    def _alive(self, job: dict, now: float) -> bool:
+        """Whether a queued or running job can still finish.
+
+        A running job rewrites its sidecar after every chunk, so one not
+        updated for STALE_SECONDS has lost its worker. A queued job may wait
+        behind long exports for any time: it is dead once the process that
+        queued it is gone, which can only be checked on the same host;
+        another host's queued jobs are given EXPORT_MAX_AGE_SECONDS.
+        """
+        if job['state'] == 'running':
+            return now - job['updated_at'] < STALE_SECONDS
+        if job['state'] == 'queued':
+            if job.get('pid') and job.get('host') == _HOST:
+                return _process_exists(job['pid'])
+            return now - job['created_at'] < self.max_age
+        return False
+
+    def _sidecar(self, job_id: str) -> str:
+        return os.path.join(self.directory, f'{job_id}.json')
+
+    def _jobs(self) -> list[dict]:
+        jobs = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return jobs
+
+    def _write(self, job: dict):
+        job['updated_at'] = time.time()
+        temporary = f"{self._sidecar(job['id'])}.{threading.get_ident()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(job, f)
+        os.replace(temporary, self._sidecar(job['id']))
+
+    def _delete(self, job: dict):
+        path = self.artifact(job)
+        for name in (path, path + '.part', self._sidecar(job['id'])):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+
+def _process_exists(pid: int) -> bool:
+    if os.name == 'nt':
+        return True  # os.kill would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by someone else
+    return True
+
+
+export_jobs = ExportJobs()
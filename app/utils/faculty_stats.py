@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+
+from sqlalchemy import case, event, func
+
+from app import db
+from app.models import Attendance, AttendanceSession, Student
+from app.utils.session_index import as_utc
+
+# Window used when a request gives no date bounds: the last 30 days, today included
+DEFAULT_WINDOW_DAYS = 30
+
+_PENDING_KEY = 'faculty_stats_touched'
+
+
+class FacultyStats:
+    """Per-faculty session and attendance statistics for a date window, cached.
+
+    compute() is one aggregate query: sessions created in the window, left
+    joined to their attendance and the marking students, grouped per session
+    and division with present/absent counted by conditional aggregation.
+    The few resulting rows are folded into totals and per-subject, per-day
+    and per-division breakdowns in Python.
+
+    Results are cached per (faculty, window). Writers call touch(faculty_id)
+    inside their transaction and the faculty's entries are dropped once it
+    commits, so a reader can never re-cache the data from before the
+    write. Other worker processes see the change within STATS_CACHE_SECONDS.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[int, float, dict]] = OrderedDict()
+        self._versions: dict[int, int] = {}
+        self.ttl = 60.0
+        self.max_entries = 1024
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = float(app.config.get('STATS_CACHE_SECONDS', self.ttl))
+        self.max_entries = int(app.config.get('STATS_CACHE_SIZE', self.max_entries))
+        if not event.contains(db.session, 'after_commit', self._after_commit):
+            event.listen(db.session, 'after_commit', self._after_commit)
+        app.extensions['faculty_stats'] = self
+
+    def get(self, faculty_id: int, date_from: date, date_to: date) -> dict:
+        """Statistics for sessions created in [date_from, date_to), from the cache when fresh"""
+        key = (faculty_id, date_from, date_to)
+        now = time.monotonic()
+        with self._lock:
+            version = self._versions.get(faculty_id, 0)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[2]
+        stats = self.compute(faculty_id, date_from, date_to)
+        with self._lock:
+            # Skip storing if the faculty was invalidated while we were computing
+            if self._versions.get(faculty_id, 0) == version:
+                self._entries[key] = (version, now + self.ttl, stats)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return stats
+
+    def window(self, date_from: date | None, date_to: date | None) -> tuple[date, date]:
+        """Close open report bounds into a [date_from, date_to) window of DEFAULT_WINDOW_DAYS"""
+        if date_to is None:
+            date_to = max(datetime.now(timezone.utc).date() + timedelta(days=1),
+                          (date_from or date.min) + timedelta(days=1))
+        if date_from is None:
+            date_from = date_to - timedelta(days=DEFAULT_WINDOW_DAYS)
+        return date_from, date_to
+
+    def touch(self, faculty_id: int | None):
+        """Mark a faculty's statistics stale once the current transaction commits"""
+        if faculty_id is not None:
+            db.session.info.setdefault(_PENDING_KEY, set()).add(faculty_id)
+
+    def invalidate(self, faculty_id: int):
+        with self._lock:
+            self._versions[faculty_id] = self._versions.get(faculty_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == faculty_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _after_commit(self, session):
+        for faculty_id in session.info.pop(_PENDING_KEY, ()):
+            self.invalidate(faculty_id)
+
+    def query(self, faculty_id: int, date_from: date, date_to: date):
+        """The aggregate behind compute(): one row per (session, marking division)"""
+        present = func.sum(case((Attendance.status == 'Present', 1), else_=0))
+        absent = func.sum(case((Attendance.status == 'Absent', 1), else_=0))
+        return db.session.query(
+            AttendanceSession.id, AttendanceSession.subject, AttendanceSession.status,
+            AttendanceSession.created_at, Student.division, present, absent,
+        ).select_from(AttendanceSession).outerjoin(
+            Attendance, Attendance.session_id == AttendanceSession.id,
+        ).outerjoin(
+            Student, Student.id == Attendance.student_id,
+        ).filter(
+            AttendanceSession.faculty_id == faculty_id,
+            AttendanceSession.created_at >= datetime.combine(date_from, dt_time(), timezone.utc),
+            AttendanceSession.created_at < datetime.combine(date_to, dt_time(), timezone.utc),
+        ).group_by(
+            AttendanceSession.id, AttendanceSession.subject, AttendanceSession.status,
+            AttendanceSession.created_at, Student.division,
+        )
+
+    def compute(self, faculty_id: int, date_from: date, date_to: date) -> dict:
+        rows = self.query(faculty_id, date_from, date_to).all()
+        sessions, active = set(), set()
+        subjects, days, divisions = {}, {}, {}
+        for session_id, subject, status, created_at, division, present_count, absent_count in rows:
+            present_count, absent_count = int(present_count or 0), int(absent_count or 0)
+            sessions.add(session_id)
+            if status == 'active':
+                active.add(session_id)
+            groups = [subjects.setdefault(subject, _group()), days.setdefault(as_utc(created_at).date(), _group())]
+            if division is not None:
+                groups.append(divisions.setdefault(division, _group()))
+            for group in groups:
+                group['sessions'].add(session_id)
+                group['present'] += present_count
+                group['absent'] += absent_count
+
+        present_total = sum(group['present'] for group in subjects.values())
+        absent_total = sum(group['absent'] for group in subjects.values())
+        return {
+            'faculty_id': faculty_id,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'totals': {
+                'sessions': len(sessions),
+                'active_sessions': len(active),
+                **_counts(len(sessions), present_total, absent_total),
+            },
+            'by_subject': [{'subject': subject, **_summary(group)} for subject, group in sorted(subjects.items())],
+            'by_day': [{'date': day.isoformat(), **_summary(group)} for day, group in sorted(days.items())],
+            'by_division': [{'division': division, **_summary(group)}
+                            for division, group in sorted(divisions.items())],
+        }
+
+
+def _group():
+    return {'sessions': set(), 'present': 0, 'absent': 0}
+
+
+def _counts(sessions: int, present: int, absent: int) -> dict:
+    marks = present + absent
+    return {
+        'present': present,
+        'absent': absent,
+        'marks': marks,
+        'average_present_per_session': round(present / sessions, 2) if sessions else 0,
+        'attendance_rate': round(present / marks, 4) if marks else None,
+    }
+
+
+def _summary(group: dict) -> dict:
+    return {'sessions': len(group['sessions']),
+            **_counts(len(group['sessions']), group['present'], group['absent'])}
+
+
+faculty_stats = FacultyStats()
@@ -0,0 +1,135 @@
+import math
+from typing import NamedTuple, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; everything below has a pure-Python path
+    np = None
+
+EARTH_RADIUS_M = 6371000
+
+# Radius used when a session has none configured
+DEFAULT_RADIUS_M = 100.0
+
+# Below this many points the numpy array setup costs more than it saves
+NUMPY_MIN_POINTS = 64
+
+
+class GeofenceResult(NamedTuple):
+    """Per-point distances (meters) and inside-radius verdicts.
+
+    Both are numpy arrays when numpy evaluated the batch (NaN distance for a
+    missing student position) and lists otherwise (None for a missing
+    position). Use rows() for plain Python values either way.
+    """
+    distances: Sequence
+    within: Sequence
+    located: Sequence
+
+    def rows(self):
+        """Yield (distance or None, within or None) per point as Python values"""
+        if np is not None and isinstance(self.distances, np.ndarray):
+            for distance, within, located in zip(self.distances.tolist(), self.within.tolist(), self.located.tolist()):
+                yield (distance, within) if located else (None, None)
+        else:
+            yield from zip(self.distances, self.within)
+
+
+def _column(values, count):
+    """Broadcast a scalar (or None) to a list of `count` values"""
+    if isinstance(values, (list, tuple)) or (np is not None and isinstance(values, np.ndarray)):
+        return values
+    return [values] * count
+
+
+def evaluate(latitudes, longitudes, accuracies, faculty_latitude, faculty_longitude,
+             faculty_accuracy=None, radius=None, use_numpy: bool | None = None) -> GeofenceResult:
+    """Distances and radius verdicts for a batch of student positions.
+
+    Student arguments are sequences of equal length (None for unknown values).
+    The faculty arguments and radius are either one value shared by every
+    point or a per-point sequence, so a whole session or a semester of
+    sessions can be evaluated in one call. The allowed radius grows to
+    faculty accuracy + student accuracy when both are known, matching the
+    single-mark check.
+    """
+    count = len(latitudes)
+    if use_numpy is None:
+        use_numpy = np is not None and count >= NUMPY_MIN_POINTS
+    if use_numpy and np is None:
+        raise RuntimeError('numpy is not installed')
+    if use_numpy:
+        return _evaluate_numpy(latitudes, longitudes, accuracies, faculty_latitude, faculty_longitude,
+                               faculty_accuracy, radius, count)
+    return _evaluate_python(latitudes, longitudes, accuracies, faculty_latitude, faculty_longitude,
+                            faculty_accuracy, radius, count)
+
+
+def _evaluate_python(latitudes, longitudes, accuracies, faculty_latitude, faculty_longitude,
+                     faculty_accuracy, radius, count):
+    accuracies = _column(accuracies, count)
+    faculty_latitudes = _column(faculty_latitude, count)
+    faculty_longitudes = _column(faculty_longitude, count)
+    faculty_accuracies = _column(faculty_accuracy, count)
+    radii = _column(radius, count)
+
+    distances, within, located = [], [], []
+    for i in range(count):
+        latitude, longitude = latitudes[i], longitudes[i]
+        faculty_lat, faculty_lon = faculty_latitudes[i], faculty_longitudes[i]
+        if latitude is None or longitude is None or faculty_lat is None or faculty_lon is None:
+            distances.append(None)
+            within.append(None)
+            located.append(False)
+            continue
+
+        phi1, phi2 = math.radians(faculty_lat), math.radians(latitude)
+        a = (math.sin((phi2 - phi1) / 2) ** 2
+             + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(longitude - faculty_lon) / 2) ** 2)
+        distance = EARTH_RADIUS_M * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+        allowed_radius = radii[i] or DEFAULT_RADIUS_M
+        if faculty_accuracies[i] and accuracies[i]:
+            allowed_radius = max(allowed_radius, float(faculty_accuracies[i]) + float(accuracies[i]))
+        distances.append(distance)
+        within.append(distance <= allowed_radius)
+        located.append(True)
+    return GeofenceResult(distances, within, located)
+
+
+def _as_array(values, count):
+    """float64 array (NaN for None) from a scalar or a sequence"""
+    if np is not None and isinstance(values, np.ndarray):
+        return values.astype(np.float64, copy=False)
+    if values is None or isinstance(values, (int, float)):
+        return np.full(count, np.nan if values is None else float(values))
+    try:
+        return np.array(values, dtype=np.float64)
+    except TypeError:
+        # Sequence contains None (unknown position or accuracy)
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _evaluate_numpy(latitudes, longitudes, accuracies, faculty_latitude, faculty_longitude,
+                    faculty_accuracy, radius, count):
+    lat = np.radians(_as_array(latitudes, count))
+    lon = _as_array(longitudes, count)
+    faculty_lat = np.radians(_as_array(faculty_latitude, count))
+    faculty_lon = _as_array(faculty_longitude, count)
+
+    a = (np.sin((lat - faculty_lat) / 2) ** 2
+         + np.cos(faculty_lat) * np.cos(lat) * np.sin(np.radians(lon - faculty_lon) / 2) ** 2)
+    distances = EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    located = ~np.isnan(distances)
+
+    radii = _as_array(radius, count)
+    # `or DEFAULT_RADIUS_M` in the scalar path: NaN and 0 both fall back
+    radii = np.where(np.isnan(radii) | (radii == 0), DEFAULT_RADIUS_M, radii)
+    student_accuracy = _as_array(accuracies, count)
+    faculty_acc = _as_array(faculty_accuracy, count)
+    # Accuracy buffer only when both sides reported a non-zero accuracy
+    buffered = (np.nan_to_num(student_accuracy) != 0) & (np.nan_to_num(faculty_acc) != 0)
+    allowed = np.where(buffered, np.fmax(radii, student_accuracy + faculty_acc), radii)
+
+    within = located & (distances <= allowed)
+    return GeofenceResult(distances, within, located)
@@ -0,0 +1,287 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import case, event, func
+
+from app import db
+from app.models import Attendance, Student
+from app.utils.session_index import as_utc, session_index
+
+_PENDING_KEY = 'live_feed_marks'
+
+# Reconnect delay suggested to clients (the SSE `retry` field)
+RETRY_MS = 3000
+
+
+class LiveFeedFull(Exception):
+    """Raised when this worker already serves LIVE_FEED_MAX_CONNECTIONS streams"""
+
+
+class LiveFeed:
+    """New marks of an active session as a Server-Sent Events stream, without a broker.
+
+    insert_attendance_rows stages the marks it inserts for sessions that
+    someone in this process is watching, and once the transaction commits
+    they are put on every subscriber's queue (a rolled-back mark is never
+    announced). Each event's id is the attendance id, so a client resuming
+    with Last-Event-ID gets the marks after it from one indexed query.
+
+    Closing or expiring a session in this process ends its streams at once.
+    Marks committed by other worker processes are not published here: every
+    LIVE_FEED_RESYNC_SECONDS a stream compares the session's mark count with
+    what it has sent and fetches the difference, which also repairs a queue
+    that overflowed. Each stream holds a worker thread, so a worker serves
+    at most LIVE_FEED_MAX_CONNECTIONS of them; clients turned away poll
+    snapshot() instead.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._subscribers: dict[int, set[queue.Queue]] = {}
+        self._connections = 0
+        self.max_connections = 50
+        self.heartbeat = 15.0
+        self.resync = 5.0
+        self.queue_size = 1000
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_connections = int(app.config.get('LIVE_FEED_MAX_CONNECTIONS', self.max_connections))
+        self.heartbeat = float(app.config.get('LIVE_FEED_HEARTBEAT_SECONDS', self.heartbeat))
+        self.resync = max(1.0, float(app.config.get('LIVE_FEED_RESYNC_SECONDS', self.resync)))
+        if not event.contains(db.session, 'after_commit', self._after_commit):
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_soft_rollback', self._after_rollback)
+        app.extensions['live_feed'] = self
+
+    # -------------------------------
+    # Publishing (mark path)
+    # -------------------------------
+    def stage(self, rows: list[dict], inserted: dict[tuple[int, int], int]):
+        """Announce the inserted rows of watched sessions once the current transaction commits"""
+        if not self._subscribers:
+            return
+        marks = [
+            {
+                'attendance_id': inserted[(row['session_id'], row['student_id'])],
+                'session_id': row['session_id'],
+                'student_id': row['student_id'],
+                'status': row['status'],
+                'distance': row['distance_from_faculty'],
+                'marked_at': row['marked_at'],
+            }
+            for row in rows
+            if row['session_id'] in self._subscribers and (row['session_id'], row['student_id']) in inserted
+        ]
+        if marks:
+            db.session.info.setdefault(_PENDING_KEY, []).extend(marks)
+
+    def publish(self, marks: list[dict]):
+        with self._lock:
+            for mark in marks:
+                for subscription in self._subscribers.get(mark['session_id'], ()):
+                    try:
+                        subscription.put_nowait(mark)
+                    except queue.Full:
+                        pass  # the stream's next resync picks the mark up from the database
+
+    def end(self, session_id: int):
+        """Tell this process's streams of a session that it has been closed or has expired"""
+        self.publish([{'session_id': session_id, 'ended': True}])
+
+    def _after_commit(self, session):
+        marks = session.info.pop(_PENDING_KEY, None)
+        if marks:
+            self.publish(marks)
+
+    def _after_rollback(self, session, previous_transaction):
+        if not previous_transaction.nested:
+            session.info.pop(_PENDING_KEY, None)
+
+    # -------------------------------
+    # Subscriptions
+    # -------------------------------
+    def available(self) -> bool:
+        return self._connections < self.max_connections
+
+    def subscribe(self, session_id: int) -> queue.Queue:
+        with self._lock:
+            if self._connections >= self.max_connections:
+                raise LiveFeedFull('Too many live feeds on this server, please retry')
+            subscription = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.setdefault(session_id, set()).add(subscription)
+            self._connections += 1
+        return subscription
+
+    def unsubscribe(self, session_id: int, subscription: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(session_id)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[session_id]
+            self._connections -= 1
+
+    # -------------------------------
+    # Stream
+    # -------------------------------
+    def stream(self, session_id: int, faculty_id: int, last_event_id: int = 0):
+        """SSE text for one session: the marks after last_event_id, then new ones as they commit.
+
+        Sends a `status` event with the present count first and whenever
+        it is recounted, a `mark` event per new mark, a comment line every
+        LIVE_FEED_HEARTBEAT_SECONDS of silence, and `closed` once the
+        session is no longer active.
+        """
+        yield f'retry: {RETRY_MS}\n\n'
+        try:
+            subscription = self.subscribe(session_id)
+        except LiveFeedFull as e:
+            yield _event('error', {'message': str(e)})
+            return
+        try:
+            # Marks sent (or older than the resume point); the stream's own view of the session
+            seen: set[int] = set()
+            names: dict[int, tuple[str, str]] = {}
+            # Present marks up to the resume point, then counted up as marks are sent
+            base = self._present(session_id, last_event_id)
+            marks = self._marks_after(session_id, last_event_id)
+            present = base + sum(mark['status'] == 'Present' for mark in marks)
+            yield _event('status', {'present_count': present})
+            running = base
+            for mark in marks:
+                seen.add(mark['attendance_id'])
+                running += mark['status'] == 'Present'
+                yield _event('mark', {**mark, 'present_count': running}, mark['attendance_id'])
+            db.session.rollback()  # hand the connection back to the pool between reads
+
+            now = time.monotonic()
+            next_resync, next_heartbeat = now + self.resync, now + self.heartbeat
+            while True:
+                batch = []
+                try:
+                    batch.append(subscription.get(timeout=max(0.0, min(next_resync, next_heartbeat) - time.monotonic())))
+                    while True:
+                        batch.append(subscription.get_nowait())
+                except queue.Empty:
+                    pass
+                ended = any(mark.get('ended') for mark in batch)
+                batch = [mark for mark in batch if not mark.get('ended') and mark['attendance_id'] not in seen]
+                if batch:
+                    self._resolve_names(names, {mark['student_id'] for mark in batch})
+                    for mark in batch:
+                        seen.add(mark['attendance_id'])
+                        present += mark['status'] == 'Present'
+                        name, roll = names.get(mark['student_id'], (None, None))
+                        yield _event('mark', {
+                            'attendance_id': mark['attendance_id'],
+                            'student_id': mark['student_id'],
+                            'student_name': name,
+                            'roll_number': roll,
+                            'status': mark['status'],
+                            'distance': _distance(mark['distance']),
+                            'marked_at': _timestamp(mark['marked_at']),
+                            'present_count': present,
+                        }, mark['attendance_id'])
+                    next_heartbeat = time.monotonic() + self.heartbeat
+                    db.session.rollback()
+
+                now = time.monotonic()
+                if ended or now >= next_resync:
+                    live = None if ended else session_index.get_by_faculty(faculty_id)
+                    if live is None or live.id != session_id:
+                        yield _event('closed', {'present_count': self._present(session_id, None)})
+                        return
+                    # Marks written by other workers, deleted marks or an overflowed queue
+                    newer = self.newer_query(session_id, last_event_id).scalar()
+                    if newer != len(seen):
+                        marks = self._marks_after(session_id, last_event_id)
+                        present = base + sum(mark['status'] == 'Present' for mark in marks)
+                        seen &= {mark['attendance_id'] for mark in marks}
+                        for mark in marks:
+                            if mark['attendance_id'] not in seen:
+                                seen.add(mark['attendance_id'])
+                                yield _event('mark', {**mark, 'present_count': present}, mark['attendance_id'])
+                        yield _event('status', {'present_count': present})
+                        next_heartbeat = time.monotonic() + self.heartbeat
+                    db.session.rollback()
+                    next_resync = time.monotonic() + self.resync
+                if time.monotonic() >= next_heartbeat:
+                    yield ': keep-alive\n\n'
+                    next_heartbeat = time.monotonic() + self.heartbeat
+        finally:
+            self.unsubscribe(session_id, subscription)
+            db.session.rollback()
+
+    def snapshot(self, session_id: int, last_event_id: int = 0) -> dict:
+        """The marks after last_event_id and the present count, for clients that poll"""
+        marks = self._marks_after(session_id, last_event_id)
+        return {
+            'present_count': self._present(session_id, None),
+            'marks': marks,
+            'last_event_id': marks[-1]['attendance_id'] if marks else last_event_id,
+        }
+
+    def _present(self, session_id: int, up_to_id: int | None) -> int:
+        return int(self.present_query(session_id, up_to_id).scalar())
+
+    def _marks_after(self, session_id: int, last_event_id: int) -> list[dict]:
+        return [{
+            'attendance_id': row.id,
+            'student_id': row.student_id,
+            'student_name': row.full_name,
+            'roll_number': row.roll_number,
+            'status': row.status,
+            'distance': _distance(row.distance_from_faculty),
+            'marked_at': _timestamp(row.marked_at),
+        } for row in self.marks_query(session_id, last_event_id)]
+
+    def present_query(self, session_id: int, up_to_id: int | None = None):
+        """Present marks of the session, only those with id <= up_to_id unless it is None"""
+        query = db.session.query(func.coalesce(func.sum(case((Attendance.status == 'Present', 1), else_=0)), 0)).filter(
+            Attendance.session_id == session_id)
+        if up_to_id is not None:
+            query = query.filter(Attendance.id <= up_to_id)
+        return query
+
+    def marks_query(self, session_id: int, last_event_id: int):
+        """The session's marks after last_event_id with their student's name, in id order"""
+        return db.session.query(
+            Attendance.id, Attendance.student_id, Student.full_name, Student.roll_number,
+            Attendance.status, Attendance.distance_from_faculty, Attendance.marked_at,
+        ).join(Student, Student.id == Attendance.student_id).filter(
+            Attendance.session_id == session_id, Attendance.id > last_event_id,
+        ).order_by(Attendance.id)
+
+    def newer_query(self, session_id: int, last_event_id: int):
+        """COUNT of the session's marks after last_event_id (the resync check)"""
+        return db.session.query(func.count(Attendance.id)).filter(
+            Attendance.session_id == session_id, Attendance.id > last_event_id)
+
+    def _resolve_names(self, names: dict, student_ids: set[int]):
+        missing = student_ids - names.keys()
+        if missing:
+            for student_id, full_name, roll_number in db.session.query(
+                    Student.id, Student.full_name, Student.roll_number).filter(Student.id.in_(missing)):
+                names[student_id] = (full_name, roll_number)
+
+
+def _event(name: str, data: dict, event_id: int | None = None) -> str:
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+def _distance(value):
+    return round(value, 2) if value is not None else None
+
+
+def _timestamp(value: datetime | None):
+    return as_utc(value).isoformat() if value is not None else None
+
+
+live_feed = LiveFeed()
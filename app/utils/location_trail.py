@@ -0,0 +1,242 @@
+import atexit
+import bisect
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from sqlalchemy import update
+
+from app import db
+
+# Trails whose newest fix is older than this are forgotten (sessions closed elsewhere)
+TRAIL_IDLE_SECONDS = 6 * 3600
+
+# Flushes a failed batch is retried in before its fixes are given up on
+FLUSH_ATTEMPTS = 3
+
+
+class Fix(NamedTuple):
+    latitude: float
+    longitude: float
+    accuracy: float | None
+    recorded_at: datetime
+
+
+class LocationTrail:
+    """Per-session ring buffer of faculty location fixes with batched persistence.
+
+    record() keeps the last LOCATION_TRAIL_SIZE fixes of a session in memory
+    and drops pings that moved less than LOCATION_TRAIL_MIN_MOVE_M within
+    LOCATION_TRAIL_MIN_INTERVAL seconds of the previous fix. A flusher thread
+    writes new fixes to session_location every LOCATION_TRAIL_FLUSH_SECONDS,
+    copies each session's newest fix onto its attendance_session row and
+    notifies other workers. Those workers validate against that row until
+    they see fixes of their own, so the trail is exact only in the process
+    that received the pings. A batch that fails to write is retried with the
+    next flushes, up to FLUSH_ATTEMPTS times.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._lock = threading.Lock()
+        self._trails: dict[int, deque[Fix]] = {}
+        self._pending: list[tuple[int, Fix]] = []
+        self._failures = 0
+        self._thread: threading.Thread | None = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self.size = 120
+        self.min_move = 10.0
+        self.min_interval = 30.0
+        self.flush_interval = 10.0
+        self.batch_size = 500
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        self.size = int(app.config.get('LOCATION_TRAIL_SIZE', self.size))
+        self.min_move = float(app.config.get('LOCATION_TRAIL_MIN_MOVE_M', self.min_move))
+        self.min_interval = float(app.config.get('LOCATION_TRAIL_MIN_INTERVAL', self.min_interval))
+        self.flush_interval = float(app.config.get('LOCATION_TRAIL_FLUSH_SECONDS', self.flush_interval))
+        app.extensions['location_trail'] = self
+
+    def record(self, session_id: int, latitude: float, longitude: float, accuracy: float | None = None,
+               recorded_at: datetime | None = None) -> Fix | None:
+        """Add a ping to a session's trail; returns the fix, or None if it was dropped as redundant"""
+        from app.utils.session_manager import calculate_distance
+
+        fix = Fix(latitude, longitude, accuracy, recorded_at or datetime.now(timezone.utc))
+        with self._lock:
+            trail = self._trails.get(session_id)
+            if trail is None:
+                trail = self._trails[session_id] = deque(maxlen=self.size)
+            if trail:
+                last = trail[-1]
+                recent = (fix.recorded_at - last.recorded_at).total_seconds() < self.min_interval
+                still = calculate_distance(last.latitude, last.longitude, latitude, longitude) < self.min_move
+                # A much sharper fix of the same spot is still worth keeping
+                sharper = accuracy is not None and (last.accuracy is None or accuracy < last.accuracy / 2)
+                if recent and still and not sharper:
+                    return None
+            trail.append(fix)
+            self._pending.append((session_id, fix))
+            full = len(self._pending) >= self.batch_size
+        self._start()
+        if full:
+            self._wake.set()
+        return fix
+
+    def nearest(self, session_id: int, at: datetime) -> Fix | None:
+        """The fix of `session_id` closest in time to `at`, if this process has any"""
+        with self._lock:
+            trail = self._trails.get(session_id)
+            if not trail:
+                return None
+            # Fixes are appended in time order: walk back from the newest until the gap grows
+            best = None
+            for fix in reversed(trail):
+                gap = abs((fix.recorded_at - at).total_seconds())
+                if best is not None and gap > best[0]:
+                    break
+                best = (gap, fix)
+            return best[1]
+
+    def stored(self, session_ids) -> dict[int, list[Fix]]:
+        """Written fixes (session_location) of the sessions, oldest first, for processes without the trail"""
+        from app.models import SessionLocation
+        from app.utils.session_index import as_utc
+
+        trails: dict[int, list[Fix]] = {}
+        for row in db.session.query(
+            SessionLocation.session_id, SessionLocation.latitude, SessionLocation.longitude,
+            SessionLocation.accuracy, SessionLocation.recorded_at,
+        ).filter(SessionLocation.session_id.in_(session_ids)).order_by(
+            SessionLocation.session_id, SessionLocation.recorded_at,
+        ):
+            trails.setdefault(row.session_id, []).append(
+                Fix(row.latitude, row.longitude, row.accuracy, as_utc(row.recorded_at)))
+        return trails
+
+    def latest(self, session_id: int) -> Fix | None:
+        with self._lock:
+            trail = self._trails.get(session_id)
+            return trail[-1] if trail else None
+
+    def drop(self, session_id: int):
+        """Forget a closed session's trail (unflushed fixes are still written)"""
+        with self._lock:
+            self._trails.pop(session_id, None)
+
+    def clear(self):
+        """Forget every trail and unflushed fix"""
+        with self._lock:
+            self._trails.clear()
+            self._pending = []
+            self._failures = 0
+
+    def flush(self):
+        """Write pending fixes now; runs in the caller's app context and commits"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        from app.models import AttendanceSession, SessionLocation
+        from app.utils.session_index import session_index
+
+        latest = {}
+        for session_id, fix in batch:
+            latest[session_id] = fix
+        try:
+            db.session.execute(SessionLocation.__table__.insert(), [{
+                'session_id': session_id,
+                'latitude': fix.latitude,
+                'longitude': fix.longitude,
+                'accuracy': fix.accuracy,
+                'recorded_at': fix.recorded_at,
+            } for session_id, fix in batch])
+            db.session.execute(update(AttendanceSession), [{
+                'id': session_id,
+                'faculty_latitude': fix.latitude,
+                'faculty_longitude': fix.longitude,
+                'faculty_location_accuracy': fix.accuracy,
+                'faculty_location_timestamp': fix.recorded_at,
+            } for session_id, fix in latest.items()])
+            for session_id in latest:
+                session_index.notify(session_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self._requeue(batch, e)
+            return 0
+        self._failures = 0
+        return len(batch)
+
+    def _requeue(self, batch, error):
+        """Put a batch that failed to write back in front of the pending fixes, or give up on it"""
+        self._failures += 1
+        if self._failures >= FLUSH_ATTEMPTS:
+            self._failures = 0
+            print(f"Error flushing location trail, {len(batch)} fixes dropped after "
+                  f"{FLUSH_ATTEMPTS} attempts: {error}")
+            return
+        with self._lock:
+            self._pending = batch + self._pending
+            # Bound the backlog while the database is unreachable; the oldest fixes go first
+            overflow = len(self._pending) - self.size * self.batch_size
+            if overflow > 0:
+                del self._pending[:overflow]
+        print(f"Error flushing location trail, {len(batch)} fixes kept for the next flush: {error}")
+        if overflow > 0:
+            print(f"Location trail backlog full, {overflow} oldest fixes dropped")
+
+    def shutdown(self, timeout: float = 10.0):
+        """Flush pending fixes and stop the flusher thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stopping = True
+        self._wake.set()
+        thread.join(timeout)
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # Started lazily so gunicorn workers each get their own thread after fork
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='location-trail', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._app.app_context():
+                self.flush()
+            self._prune()
+            if self._stopping:
+                return
+
+    def _prune(self):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for session_id in [sid for sid, trail in self._trails.items()
+                               if trail and (now - trail[-1].recorded_at).total_seconds() > TRAIL_IDLE_SECONDS]:
+                del self._trails[session_id]
+
+
+def nearest_fix(fixes: list[Fix], at: datetime) -> Fix | None:
+    """The fix closest in time to `at` in a list ordered by recorded_at"""
+    if not fixes:
+        return None
+    i = bisect.bisect_left(fixes, at, key=lambda fix: fix.recorded_at)
+    candidates = fixes[max(0, i - 1):i + 1]
+    return min(candidates, key=lambda fix: abs((fix.recorded_at - at).total_seconds()))
+
+
+location_trail = LocationTrail()
@@ -0,0 +1,305 @@
+import atexit
+import json
+import os
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app import db
+
+try:
+    import fcntl
+except ImportError:  # POSIX only; without it (Windows) every process acts as leader
+    fcntl = None
+
+# Advisory lock key shared by every process using the same database
+ADVISORY_LOCK_KEY = zlib.crc32(b'attendance-maintenance')
+
+# Wait before the first election so a starting server is not slowed down
+STARTUP_DELAY_SECONDS = 5.0
+
+
+@dataclass
+class TaskStats:
+    """Counters for one maintenance task, as seen by the leader"""
+    name: str
+    interval: float
+    runs: int = 0
+    failures: int = 0
+    last_started_at: float | None = None
+    last_duration_ms: float | None = None
+    last_rows: int | None = None
+    total_rows: int = 0
+    last_details: dict | None = None  # the task's SweepResult, for chunked sweeps
+    last_error: str | None = None
+    next_run_at: float | None = None
+
+
+class _Task:
+    def __init__(self, name: str, interval: float, func: Callable[[], object]):
+        self.func = func
+        self.stats = TaskStats(name=name, interval=interval)
+        self.due = 0.0  # monotonic; 0 runs the task as soon as this process leads
+
+
+class MaintenanceScheduler:
+    """Periodic maintenance run by exactly one process.
+
+    Every server process calls start() and gets a scheduler thread, but only
+    the elected leader runs tasks. On Postgres the leader holds a
+    session-level advisory lock on a dedicated connection. With other
+    databases the leader holds an exclusive lock on MAINTENANCE_LOCK_FILE,
+    which only elects one leader per host. Either lock is released by the
+    operating system or the server when the leader dies, and a follower
+    takes over at its next election attempt (every
+    MAINTENANCE_ELECTION_SECONDS).
+
+    Each task has its own interval and returns the number of rows it
+    affected, or a SweepResult whose counts are kept as last_details. The
+    session sweeps are chunked and given MAINTENANCE_TIME_BUDGET_SECONDS per
+    run, so a backlog is worked off over several intervals. After every run the leader writes the counters to
+    MAINTENANCE_STATUS_FILE so any process can report them.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._tasks: dict[str, _Task] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._connection = None
+        self._lock_file = None
+        self.leader = False
+        self.lock_path = None
+        self.status_path = None
+        self.election_interval = 15.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        self.lock_path = app.config.get('MAINTENANCE_LOCK_FILE') or os.path.join(app.instance_path, 'maintenance.lock')
+        self.status_path = (app.config.get('MAINTENANCE_STATUS_FILE')
+                            or os.path.join(app.instance_path, 'maintenance.json'))
+        self.election_interval = float(app.config.get('MAINTENANCE_ELECTION_SECONDS', self.election_interval))
+        retention_days = int(app.config.get('SESSION_RETENTION_DAYS', 7))
+        archive_first = bool(app.config.get('SESSION_ARCHIVE', True))
+        sweep = {
+            'chunk_size': int(app.config.get('MAINTENANCE_CHUNK_SIZE', 200)),
+            'time_budget': float(app.config.get('MAINTENANCE_TIME_BUDGET_SECONDS', 30)) or None,
+        }
+        self.add_task('expire_sessions', float(app.config.get('MAINTENANCE_EXPIRE_SECONDS', 300)),
+                      lambda: _expire_sessions(**sweep))
+        self.add_task('delete_old_sessions', float(app.config.get('MAINTENANCE_PURGE_SECONDS', 3600)),
+                      lambda: _delete_old_sessions(retention_days, archive_first, **sweep))
+        self.add_task('rollup_catch_up', float(app.config.get('MAINTENANCE_ROLLUP_SECONDS', 60)), _rollup_catch_up)
+        app.extensions['maintenance'] = self
+
+    def add_task(self, name: str, interval: float, func: Callable[[], object]):
+        """Run `func` (in an app context) every `interval` seconds on the leader; 0 disables it"""
+        with self._lock:
+            if interval > 0:
+                self._tasks[name] = _Task(name, interval, func)
+            else:
+                self._tasks.pop(name, None)
+
+    def start(self):
+        """Start this process's scheduler thread; call from server entry points only"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop the scheduler thread and give up leadership"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stopping = True
+        self._wake.set()
+        thread.join(timeout)
+
+    def run_now(self, name: str) -> TaskStats:
+        """Run one task in the calling process, leader or not, and record its counters"""
+        task = self._tasks[name]
+        self._execute(task)
+        return task.stats
+
+    def status(self) -> dict:
+        """Leader, task counters and when they were written (from the status file)"""
+        try:
+            with open(self.status_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'leader_pid': None, 'updated_at': None, 'tasks': []}
+
+    # -------------------------------
+    # Scheduler thread
+    # -------------------------------
+    def _run(self):
+        if self._wake.wait(STARTUP_DELAY_SECONDS) and self._stopping:
+            return
+        try:
+            while not self._stopping:
+                if not self._still_leader() and not self._elect():
+                    self._wake.wait(self.election_interval)
+                    continue
+                now = time.monotonic()
+                for task in list(self._tasks.values()):
+                    if task.due <= now and not self._stopping:
+                        self._execute(task)
+                        task.due = time.monotonic() + task.stats.interval
+                self._write_status()
+                next_due = min((task.due for task in self._tasks.values()), default=now + self.election_interval)
+                # Wake up at least every election interval to check the lock is still ours
+                self._wake.wait(max(0.0, min(next_due - time.monotonic(), self.election_interval)))
+                self._wake.clear()
+        finally:
+            self._resign()
+
+    def _execute(self, task: _Task):
+        stats = task.stats
+        stats.last_started_at = time.time()
+        started = time.perf_counter()
+        with self._app.app_context():
+            try:
+                result = task.func() or 0
+                rows = result if isinstance(result, int) else result.rows
+                stats.last_details = None if isinstance(result, int) else result._asdict()
+                stats.last_rows = rows
+                stats.total_rows += rows
+                stats.last_error = None
+                if rows:
+                    print(f"Maintenance {stats.name}: {rows} rows")
+            except (OperationalError, ProgrammingError) as e:
+                # Tables not created yet or database not ready; try again next interval
+                db.session.rollback()
+                stats.failures += 1
+                stats.last_error = str(e)
+            except Exception as e:
+                db.session.rollback()
+                stats.failures += 1
+                stats.last_error = str(e)
+                print(f"Error in maintenance task {stats.name}: {e}")
+        stats.runs += 1
+        stats.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        stats.next_run_at = time.time() + stats.interval
+
+    # -------------------------------
+    # Leader election
+    # -------------------------------
+    def _elect(self) -> bool:
+        try:
+            with self._app.app_context():
+                postgres = db.engine.dialect.name == 'postgresql'
+                self.leader = self._lock_postgres() if postgres else self._lock_file_exclusive()
+        except Exception as e:
+            print(f"Error electing maintenance leader: {e}")
+            self._resign()
+        if self.leader:
+            print(f"Maintenance leader: pid {os.getpid()}")
+            for task in self._tasks.values():
+                task.due = 0.0
+        return self.leader
+
+    def _lock_postgres(self) -> bool:
+        # A connection of its own, held for as long as we lead: the lock dies with it
+        connection = db.engine.connect()
+        try:
+            acquired = connection.execute(text('SELECT pg_try_advisory_lock(:key)'),
+                                          {'key': ADVISORY_LOCK_KEY}).scalar()
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    def _lock_file_exclusive(self) -> bool:
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        handle = open(self.lock_path, 'a+')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_file = handle
+        return True
+
+    def _still_leader(self) -> bool:
+        if not self.leader:
+            return False
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT 1'))
+                self._connection.commit()
+            except Exception as e:
+                # Connection lost: the server has already released the lock
+                print(f"Maintenance leader lost its lock connection: {e}")
+                self._resign()
+                return False
+        return True
+
+    def _resign(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': ADVISORY_LOCK_KEY})
+                self._connection.commit()
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.leader = False
+
+    def _write_status(self):
+        status = {
+            'leader_pid': os.getpid(),
+            'updated_at': time.time(),
+            'tasks': [asdict(task.stats) for task in self._tasks.values()],
+        }
+        try:
+            os.makedirs(os.path.dirname(self.status_path), exist_ok=True)
+            temporary = f'{self.status_path}.{os.getpid()}.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(status, f)
+            os.replace(temporary, self.status_path)
+        except OSError as e:
+            print(f"Error writing maintenance status: {e}")
+
+
+def _expire_sessions(chunk_size: int, time_budget: float | None):
+    from app.utils.session_manager import SessionManager
+    return SessionManager().expire_old_sessions(chunk_size=chunk_size, time_budget=time_budget)
+
+
+def _delete_old_sessions(older_than_days: int, archive_first: bool, chunk_size: int, time_budget: float | None):
+    from app.utils.session_manager import SessionManager
+    return SessionManager().delete_old_sessions(older_than_days=older_than_days, chunk_size=chunk_size,
+                                                time_budget=time_budget, archive_first=archive_first)
+
+
+def _rollup_catch_up():
+    from app.utils import rollup
+    return rollup.catch_up()
+
+
+maintenance = MaintenanceScheduler()
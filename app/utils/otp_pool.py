@@ -0,0 +1,51 @@
+import random
+import threading
+from collections import deque
+
+
+class OtpPool:
+    """Pre-shuffled pool of free OTP codes for this process.
+
+    acquire() pops the next code in O(1). Codes come back through release()
+    when a session closes or expires and go to the back of the queue, so a
+    just-used OTP is the last one handed out again. The pool only knows about
+    this process; another worker may hold the same code, which the partial
+    unique index on active sessions rejects and the caller simply retries.
+    """
+
+    def __init__(self, length: int = 4):
+        self.length = length
+        self._lock = threading.Lock()
+        self._free: deque[str] = deque()
+        self._free_set: set[str] = set()
+
+    def acquire(self) -> str:
+        with self._lock:
+            if not self._free:
+                self._refill()
+                if not self._free:
+                    raise RuntimeError('No free OTP codes available')
+            otp = self._free.popleft()
+            self._free_set.discard(otp)
+            return otp
+
+    def release(self, otp: str):
+        if otp is None or len(otp) != self.length or not otp.isdigit():
+            return
+        with self._lock:
+            if otp not in self._free_set:
+                self._free.append(otp)
+                self._free_set.add(otp)
+
+    def _refill(self):
+        # Skip codes held by live sessions this process knows about
+        from app.utils.session_index import session_index
+
+        in_use = {snapshot.otp for snapshot in session_index.snapshots()}
+        codes = [f'{i:0{self.length}d}' for i in range(10 ** self.length)]
+        random.SystemRandom().shuffle(codes)
+        self._free = deque(code for code in codes if code not in in_use)
+        self._free_set = set(self._free)
+
+
+otp_pool = OtpPool()
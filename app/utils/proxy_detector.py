@@ -0,0 +1,194 @@
+import heapq
+import math
+from collections import deque
+from datetime import datetime
+from typing import Iterable, NamedTuple
+
+from app import db
+from app.models import Attendance, Student
+from app.utils.session_index import as_utc
+from app.utils.session_manager import calculate_distance
+
+# Meters per degree of latitude on the haversine sphere used by calculate_distance
+METERS_PER_DEGREE = 6371000 * math.pi / 180
+
+# Marks of different students this close (meters) ...
+DEFAULT_RADIUS_M = 3.0
+# ... and this close in time (seconds) are reported together
+DEFAULT_WINDOW_SECONDS = 120
+
+# Rows fetched per round trip when streaming a term
+STREAM_CHUNK_SIZE = 5000
+
+
+class Mark(NamedTuple):
+    id: int
+    student_id: int
+    session_id: int | None
+    latitude: float
+    longitude: float
+    accuracy: float | None
+    marked_at: datetime
+
+
+class ProxyDetector:
+    """Streaming detector for marks of different students taken from (almost) the same spot.
+
+    Marks must be fed in marked_at order. A mark sits in a grid of
+    radius-sized cells only while it is inside the time window, so memory is
+    bounded by the busiest window rather than the whole term. Each new mark
+    is compared with the marks in its 3x3 neighbouring cells only, matches
+    are joined with union-find, and a cluster is emitted once its last
+    member has left the window.
+
+    Cell widths are fixed from the first mark's latitude (with a degree of
+    slack), which holds for marks from one campus.
+    """
+
+    def __init__(self, radius_m: float = DEFAULT_RADIUS_M, window_seconds: float = DEFAULT_WINDOW_SECONDS):
+        self.radius = float(radius_m)
+        self.window = float(window_seconds)
+        self._lat_step = self.radius / METERS_PER_DEGREE
+        self._lon_step = None
+        self._active: deque[tuple[Mark, tuple[int, int]]] = deque()
+        self._cells: dict[tuple[int, int], dict[int, Mark]] = {}
+        self._parent: dict[int, int] = {}
+        self._members: dict[int, list[Mark]] = {}
+        self._live: dict[int, int] = {}
+
+    def feed(self, mark: Mark) -> list[dict]:
+        """Add one mark; returns clusters that can no longer grow"""
+        closed = self._evict(mark.marked_at)
+        if self._lon_step is None:
+            # A degree of longitude shrinks towards the poles; size cells for the poleward side
+            reference = min(89.0, abs(mark.latitude) + 1.0)
+            self._lon_step = self.radius / (METERS_PER_DEGREE * math.cos(math.radians(reference)))
+        cell = (math.floor(mark.latitude / self._lat_step), math.floor(mark.longitude / self._lon_step))
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                bucket = self._cells.get((cell[0] + d_row, cell[1] + d_col))
+                if not bucket:
+                    continue
+                for other in bucket.values():
+                    if other.student_id != mark.student_id and calculate_distance(
+                            mark.latitude, mark.longitude, other.latitude, other.longitude) <= self.radius:
+                        self._union(mark, other)
+        self._active.append((mark, cell))
+        self._cells.setdefault(cell, {})[mark.id] = mark
+        return closed
+
+    def finish(self) -> list[dict]:
+        """Flush every remaining cluster"""
+        return self._evict(None)
+
+    def _evict(self, now: datetime | None) -> list[dict]:
+        closed = []
+        while self._active and (now is None or (now - self._active[0][0].marked_at).total_seconds() > self.window):
+            mark, cell = self._active.popleft()
+            bucket = self._cells[cell]
+            del bucket[mark.id]
+            if not bucket:
+                del self._cells[cell]
+            if mark.id not in self._parent:
+                continue
+            root = self._find(mark.id)
+            self._live[root] -= 1
+            if self._live[root] == 0:
+                members = self._members.pop(root)
+                del self._live[root]
+                for member in members:
+                    del self._parent[member.id]
+                closed.append(summarize(members))
+        return closed
+
+    def _find(self, node):
+        while self._parent[node] != node:
+            self._parent[node] = self._parent[self._parent[node]]
+            node = self._parent[node]
+        return node
+
+    def _add(self, mark):
+        if mark.id not in self._parent:
+            self._parent[mark.id] = mark.id
+            self._members[mark.id] = [mark]
+            self._live[mark.id] = 1
+        return self._find(mark.id)
+
+    def _union(self, a, b):
+        root_a, root_b = self._add(a), self._add(b)
+        if root_a == root_b:
+            return
+        if len(self._members[root_a]) < len(self._members[root_b]):
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._members[root_a].extend(self._members.pop(root_b))
+        self._live[root_a] += self._live.pop(root_b)
+
+
+def summarize(members: list[Mark]) -> dict:
+    """JSON-friendly description of one cluster"""
+    latitude = sum(m.latitude for m in members) / len(members)
+    longitude = sum(m.longitude for m in members) / len(members)
+    spread = max(calculate_distance(latitude, longitude, m.latitude, m.longitude) for m in members)
+    return {
+        'student_ids': sorted({m.student_id for m in members}),
+        'attendance_ids': sorted(m.id for m in members),
+        'session_ids': sorted({m.session_id for m in members if m.session_id is not None}),
+        'first_marked_at': min(m.marked_at for m in members).isoformat(),
+        'last_marked_at': max(m.marked_at for m in members).isoformat(),
+        'latitude': round(latitude, 7),
+        'longitude': round(longitude, 7),
+        'spread_m': round(spread, 2),
+    }
+
+
+def detect(marks: Iterable[Mark], radius_m: float = DEFAULT_RADIUS_M,
+           window_seconds: float = DEFAULT_WINDOW_SECONDS, limit: int | None = None) -> tuple[list[dict], int]:
+    """Run the detector over marks in marked_at order.
+
+    Returns (the `limit` clusters with the most students, total cluster count).
+    """
+    detector = ProxyDetector(radius_m, window_seconds)
+    top, total = [], 0
+
+    def keep(clusters):
+        nonlocal total
+        for cluster in clusters:
+            total += 1
+            entry = (len(cluster['student_ids']), total, cluster)
+            if limit is None or len(top) < limit:
+                heapq.heappush(top, entry)
+            elif entry[:2] > top[0][:2]:
+                heapq.heapreplace(top, entry)
+
+    for mark in marks:
+        keep(detector.feed(mark))
+    keep(detector.finish())
+    return [cluster for _, _, cluster in sorted(top, key=lambda entry: (-entry[0], entry[1]))], total
+
+
+def located_marks_query():
+    """Present marks that carry a student position, in marked_at order"""
+    return db.session.query(
+        Attendance.id, Attendance.student_id, Attendance.session_id, Attendance.student_latitude,
+        Attendance.student_longitude, Attendance.student_location_accuracy, Attendance.marked_at,
+    ).filter(
+        Attendance.status == 'Present',
+        Attendance.student_latitude.isnot(None),
+        Attendance.student_longitude.isnot(None),
+    )
+
+
+def stream_marks(query) -> Iterable[Mark]:
+    for row in query.order_by(Attendance.marked_at, Attendance.id).execution_options(yield_per=STREAM_CHUNK_SIZE):
+        yield Mark(row[0], row[1], row[2], row[3], row[4], row[5], as_utc(row[6]))
+
+
+def attach_roll_numbers(clusters: list[dict]):
+    """Add roll_numbers to each reported cluster with one query"""
+    student_ids = {sid for cluster in clusters for sid in cluster['student_ids']}
+    if not student_ids:
+        return
+    rolls = dict(db.session.query(Student.id, Student.roll_number).filter(Student.id.in_(student_ids)))
+    for cluster in clusters:
+        cluster['roll_numbers'] = [rolls.get(sid) for sid in cluster['student_ids']]
@@ -0,0 +1,110 @@
+import re
+from datetime import date, timedelta
+
+from app import db
+from app.models import Attendance, Faculty, Student
+from app.utils import archive, proxy_detector, reports, rollup
+from app.utils.faculty_stats import faculty_stats
+from app.utils.live_feed import live_feed
+
+# Tables that must never be read front to back by a filtered route query
+WATCHED_TABLES = ('attendance', 'student', 'faculty', 'attendance_daily', 'attendance_archive')
+
+_SQLITE_SCAN = re.compile(r'^SCAN (\w+)')
+_POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+# Faculty names are matched as substrings ('%name%'), which no B-tree index can
+# serve; the table holds one row per staff member, so reading it for that is accepted
+_NAME_SEARCHES = {'faculty': re.compile(r'faculty\.full_name\)? I?LIKE', re.IGNORECASE)}
+
+
+def route_queries():
+    """(label, query) for the statements the routes and commands build.
+
+    Built with the same helpers the routes use, so a change to a filter or
+    join shows up here. The literal values are placeholders; plans do not
+    depend on them.
+    """
+    day = date.today()
+    term = {'date_from': (day - timedelta(days=180)).isoformat(), 'date_to': day.isoformat()}
+    return [
+        ('student login / register: roll number', Student.query.filter_by(roll_number='R0')),
+        ('faculty login: email', Faculty.query.filter_by(email='faculty@example.com')),
+        ('bulk mark: roll numbers', db.session.query(Student.id, Student.roll_number)
+            .filter(Student.roll_number.in_(['R0', 'R1']))),
+        ('mark attendance: duplicate check', db.session.query(Attendance.id)
+            .filter(Attendance.session_id == 1, Attendance.student_id == 1)),
+        ('revalidate / proxy clusters: session marks', proxy_detector.located_marks_query()
+            .filter(Attendance.session_id == 1).order_by(Attendance.marked_at, Attendance.id)),
+        ('proxy clusters: faculty over a term', proxy_detector.located_marks_query()
+            .filter(Attendance.faculty_id == 1, Attendance.date >= day - timedelta(days=180),
+                    Attendance.date <= day).order_by(Attendance.marked_at, Attendance.id)),
+        ('reports: date range', reports.report_query(term)),
+        ('reports: one day', reports.report_query(
+            {'date_from': day.isoformat(), 'date_to': (day + timedelta(days=1)).isoformat()})),
+        ('reports: faculty', reports.report_query({'faculty_id': 1})),
+        ('reports: faculty + date range', reports.report_query({'faculty_id': 1, **term})),
+        ('reports: subject', reports.report_query({'subject': 'Maths'})),
+        ('reports: subject + date range', reports.report_query({'subject': 'Maths', **term})),
+        ('reports: division', reports.report_query({'division': 'A'})),
+        ('reports: faculty name + date range', reports.report_query({'faculty_name': 'Ada', **term})),
+        ('report totals: faculty + date range', reports.count_query({'faculty_id': 1, **term})),
+        ('faculty list: name search', reports.faculty_query('Ada')),
+        ('faculty stats: window', faculty_stats.query(1, day - timedelta(days=30), day)),
+        ('attendance summary: faculty + date range', rollup.summary_query({'faculty_id': 1, **term}, ['date'])),
+        ('attendance summary: faculty name', rollup.summary_query({'faculty_name': 'Ada'}, ['subject'])),
+        ('live feed: marks after an event id', live_feed.marks_query(1, 1)),
+        ('live feed: present count', live_feed.present_query(1)),
+        ('live feed: resync count', live_feed.newer_query(1, 1)),
+        ('rollup: catch-up source', rollup.grouped((Attendance.id > 1) & (Attendance.id <= 2))),
+        ('rollup: session delete source', rollup.grouped(Attendance.session_id == 1)),
+        ('exports: archived sessions, date range', archive.matching(term)),
+        ('exports: archived sessions, faculty + date range', archive.matching({'faculty_id': 1, **term})),
+    ]
+
+
+def sql(query) -> str:
+    """The statement of a query (or a SQL string) with its parameters inlined"""
+    if isinstance(query, str):
+        return query
+    return str(getattr(query, 'statement', query).compile(db.engine, compile_kwargs={'literal_binds': True}))
+
+
+def explain(query, parameters=None) -> list[str]:
+    """Plan lines for a query, or a SQL string with its driver parameters, on the current database"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif dialect == 'postgresql':
+        prefix = 'EXPLAIN '
+        # With sequential scans priced out, a Seq Scan in the plan means no index can serve
+        # the query at all, whatever the table sizes and statistics are
+        db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+    else:
+        raise RuntimeError(f'Query plans are not supported on {dialect}')
+    try:
+        if parameters is not None:
+            rows = db.session.connection().exec_driver_sql(prefix + query, parameters)
+        else:
+            rows = db.session.execute(db.text(prefix + sql(query)))
+        return [row[3] if dialect == 'sqlite' else row[0] for row in rows]
+    finally:
+        if dialect == 'postgresql':
+            db.session.rollback()
+
+
+def full_scans(plan: list[str], query=None) -> list[str]:
+    """Watched tables the plan reads in full (SQLite SCAN, Postgres Seq Scan).
+
+    Given the query, a table it searches by name substring is not reported.
+    """
+    pattern = _SQLITE_SCAN if db.engine.dialect.name == 'sqlite' else _POSTGRES_SCAN
+    text = sql(query) if query is not None else ''
+    tables = []
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match and match[1] in WATCHED_TABLES:
+            searched = _NAME_SEARCHES.get(match[1])
+            if searched is None or not searched.search(text):
+                tables.append(match[1])
+    return tables
@@ -0,0 +1,28 @@
+from flask import g, has_request_context
+from sqlalchemy import event
+
+from app import db
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+def _count_query(*_):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_app(app):
+    """Report the number of SQL statements each request ran in an X-Query-Count header.
+
+    Off unless SQL_QUERY_COUNT_HEADER is set; used by the load-test harness.
+    """
+    if not app.config.get('SQL_QUERY_COUNT_HEADER'):
+        return
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _count_query)
+
+    @app.after_request
+    def add_query_count(response):
+        response.headers[QUERY_COUNT_HEADER] = str(g.get('query_count', 0))
+        return response
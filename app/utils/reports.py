@@ -0,0 +1,347 @@
+import base64
+import binascii
+import csv
+import heapq
+import io
+import itertools
+import json
+import re
+import zlib
+from datetime import date as date_cls, timedelta
+
+from sqlalchemy import func, tuple_
+
+from app import db
+from app.models import Attendance, Faculty, Student
+from app.utils import archive, xlsx
+
+# Columns a report can be sorted by (the `sort` query parameter) and the
+# matching attribute on a report row; Attendance.id breaks ties
+SORT_COLUMNS = {
+    'date': (Attendance.date, 'date'),
+    'student': (Student.full_name, 'student_name'),
+    'subject': (Attendance.subject, 'subject'),
+    'division': (Student.division, 'division'),
+    'roll': (Student.roll_number, 'roll_number'),
+    'status': (Attendance.status, 'status'),
+}
+
+REPORT_HEADERS = ["Student", "Roll", "Division", "Faculty", "Subject", "Date", "Status"]
+# Spreadsheet column widths (characters), in REPORT_HEADERS order
+REPORT_WIDTHS = [28, 14, 10, 24, 20, 12, 10]
+
+# Academic terms: the odd term starts on the first of this month and runs six
+# months, the even term follows it (2025-odd and 2025-even make up 2025-26)
+TERM_START_MONTH = 7
+
+_DAY = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_MONTH = re.compile(r'^(\d{4})-(\d{2})$')
+_WEEK = re.compile(r'^(\d{4})-?W(\d{2})$', re.IGNORECASE)
+_TERM = re.compile(r'^(\d{4})-(odd|even)$', re.IGNORECASE)
+_YEAR = re.compile(r'^(\d{4})$')
+
+# Rows fetched per round trip (server-side cursor) and written per yielded chunk when exporting
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _add_months(day: date_cls, months: int) -> date_cls:
+    index = day.year * 12 + day.month - 1 + months
+    return date_cls(index // 12, index % 12 + 1, 1)
+
+
+def date_span(value: str) -> tuple[date_cls, date_cls]:
+    """Half-open [start, end) covered by a day (2025-11-03), month (2025-11),
+    ISO week (2025-W45), academic term (2025-odd) or year (2025).
+
+    Raises ValueError for anything else.
+    """
+    value = value.strip()
+    try:
+        if _DAY.match(value):
+            start = date_cls.fromisoformat(value)
+            return start, start + timedelta(days=1)
+        if match := _MONTH.match(value):
+            start = date_cls(int(match[1]), int(match[2]), 1)
+            return start, _add_months(start, 1)
+        if match := _WEEK.match(value):
+            start = date_cls.fromisocalendar(int(match[1]), int(match[2]), 1)
+            return start, start + timedelta(days=7)
+        if match := _TERM.match(value):
+            start = date_cls(int(match[1]), TERM_START_MONTH, 1)
+            if match[2].lower() == 'even':
+                start = _add_months(start, 6)
+            return start, _add_months(start, 6)
+        if _YEAR.match(value):
+            start = date_cls(int(value), 1, 1)
+            return start, date_cls(start.year + 1, 1, 1)
+    except ValueError:
+        raise ValueError(f"Invalid date {value!r}") from None
+    raise ValueError(f"Invalid date {value!r}: use YYYY-MM-DD, YYYY-MM, YYYY-Www, YYYY-odd/even or YYYY")
+
+
+def date_bounds(day: str | None = None, start: str | None = None,
+                end: str | None = None) -> tuple[date_cls | None, date_cls | None]:
+    """[date_from, date_to) for the report date filters; either bound may be open (None).
+
+    `day` selects a whole span; start_date counts from the beginning of its
+    span and end_date through the end of its own, so start_date=2025-09 with
+    end_date=2025-11 covers September to November. Raises ValueError for an
+    unparseable value or filters that leave no day at all.
+    """
+    lower = upper = None
+    if day:
+        lower, upper = date_span(day)
+    if start:
+        first = date_span(start)[0]
+        lower = max(lower, first) if lower else first
+    if end:
+        last = date_span(end)[1]
+        upper = min(upper, last) if upper else last
+    if lower and upper and lower >= upper:
+        raise ValueError("Date filters select an empty range")
+    return lower, upper
+
+
+def report_filters(args) -> dict:
+    """Report filters from request query parameters (shared by view and export).
+
+    The date, start_date and end_date parameters are folded into half-open
+    date_from/date_to bounds; raises ValueError when they are invalid.
+    """
+    faculty_id = None
+    if args.get("faculty_id"):
+        try:
+            faculty_id = int(args.get("faculty_id"))
+        except (ValueError, TypeError):
+            faculty_id = None
+    date_from, date_to = date_bounds(args.get("date"), args.get("start_date"), args.get("end_date"))
+    return {
+        'faculty_id': faculty_id,
+        'subject': args.get("subject"),
+        'date_from': date_from.isoformat() if date_from else None,
+        'date_to': date_to.isoformat() if date_to else None,
+        'division': args.get("division"),
+        'faculty_name': args.get("faculty_name"),
+        'status': args.get("status"),
+    }
+
+
+def report_query(filters: dict, sort: str = 'date', order: str = 'desc'):
+    """Attendance report rows with student and faculty names in a single query.
+
+    Student and Faculty are joined exactly once whatever the filters and sort,
+    and only the reported columns are selected, so rows are plain tuples
+    rather than ORM objects.
+    """
+    query = db.session.query(
+        Attendance.id,
+        Student.full_name.label('student_name'),
+        Student.roll_number,
+        Student.division,
+        Faculty.full_name.label('faculty_name'),
+        Attendance.subject,
+        Attendance.date,
+        Attendance.status,
+    ).join(Student, Attendance.student_id == Student.id).outerjoin(Faculty, Attendance.faculty_id == Faculty.id)
+
+    if filters.get('faculty_id') is not None:
+        query = query.filter(Attendance.faculty_id == filters['faculty_id'])
+    if filters.get('subject'):
+        query = query.filter(Attendance.subject == filters['subject'])
+    # Plain range bounds on the column (no casts or LIKE), so an index on date can seek
+    if filters.get('date_from'):
+        query = query.filter(Attendance.date >= date_cls.fromisoformat(filters['date_from']))
+    if filters.get('date_to'):
+        query = query.filter(Attendance.date < date_cls.fromisoformat(filters['date_to']))
+    if filters.get('division'):
+        query = query.filter(Student.division == filters['division'])
+    if filters.get('faculty_name'):
+        query = query.filter(Faculty.full_name.ilike(f"%{filters['faculty_name']}%"))
+    if filters.get('status'):
+        query = query.filter(Attendance.status == filters['status'])
+
+    return _ordered(query, sort, order == 'asc')
+
+
+def count_query(filters: dict):
+    """COUNT of report_query(filters): the same joins and filters, so a total matches the rows"""
+    return report_query(filters).order_by(None).with_entities(func.count(Attendance.id))
+
+
+def faculty_query(name: str = ''):
+    """Faculty (id, full_name) by name for the /faculty/list dropdown, optionally a substring match"""
+    query = db.session.query(Faculty.id, Faculty.full_name)
+    if name:
+        query = query.filter(Faculty.full_name.ilike(f"%{name}%"))
+    return query.order_by(Faculty.full_name.asc())
+
+
+def export_rows(filters: dict, sort: str = 'date', order: str = 'desc', chunk_rows: int = EXPORT_CHUNK_SIZE):
+    """Every report row for the filters, archived sessions included.
+
+    The attendance table is read in yield_per batches (a server-side cursor
+    on Postgres) and, in date order, merged on (date, id) with the rows of
+    archived sessions (archive.iter_rows), so an export covers the whole
+    history without loading either side. Archived sessions can only be read
+    in date order: with any other sort the attendance rows come first in
+    that order, followed by the archived rows by date in the same direction.
+    """
+    if sort not in SORT_COLUMNS:
+        sort = 'date'
+    descending = order != 'asc'
+    hot = report_query(filters, sort, order).execution_options(yield_per=chunk_rows)
+    archived = archive.iter_rows(filters, descending)
+    if sort != 'date':
+        return itertools.chain(hot, archived)
+    return heapq.merge(hot, archived, key=lambda row: (row.date, row.id), reverse=descending)
+
+
+def _ordered(query, sort, ascending):
+    sort_col = SORT_COLUMNS.get(sort, SORT_COLUMNS['date'])[0]
+    if ascending:
+        return query.order_by(sort_col.asc(), Attendance.id.asc())
+    return query.order_by(sort_col.desc(), Attendance.id.desc())
+
+
+def encode_cursor(sort: str, order: str, row, direction: str) -> str:
+    """Opaque cursor pointing just after (direction 'next') or before ('prev') `row`"""
+    value = getattr(row, SORT_COLUMNS[sort][1])
+    if isinstance(value, date_cls):
+        value = value.isoformat()
+    payload = json.dumps({'s': sort, 'o': order, 'd': direction, 'k': [value, row.id]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> tuple[str, object, int]:
+    """(direction, sort value, id) from a cursor; raises ValueError if it is malformed
+    or was issued for a different sort/order"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        direction, (value, row_id) = payload['d'], payload['k']
+        if payload['s'] != sort or payload['o'] != order or direction not in ('next', 'prev'):
+            raise ValueError('cursor does not match this sort order')
+        if sort == 'date':
+            value = date_cls.fromisoformat(value)
+        return direction, value, int(row_id)
+    except (TypeError, KeyError, AttributeError, binascii.Error, json.JSONDecodeError) as e:
+        raise ValueError('malformed cursor') from e
+
+
+def keyset_page(query, sort: str, order: str, size: int, cursor: str | None = None):
+    """One page of a report query by keyset (seek) pagination.
+
+    Instead of OFFSET, rows are taken after (or before) the (sort value, id)
+    of the cursor row, so deep pages cost the same as the first one.
+    Returns (rows, next_cursor, prev_cursor); a cursor is None when there is
+    nothing further in that direction. Raises ValueError for a bad cursor.
+    """
+    ascending = order == 'asc'
+    sort_col = SORT_COLUMNS[sort][0]
+    query = query.order_by(None)
+    direction = 'next'
+    if cursor:
+        direction, value, row_id = decode_cursor(cursor, sort, order)
+        # Walking backwards flips the comparison and the order; rows are reversed below
+        after = ascending == (direction == 'next')
+        key = tuple_(sort_col, Attendance.id)
+        query = query.filter(key > tuple_(value, row_id) if after else key < tuple_(value, row_id))
+        query = _ordered(query, sort, after)
+    else:
+        query = _ordered(query, sort, ascending)
+
+    rows = query.limit(size + 1).all()
+    more = len(rows) > size
+    rows = rows[:size]
+    if direction == 'prev':
+        rows.reverse()
+    has_next = more if direction == 'next' else True
+    has_prev = bool(cursor) if direction == 'next' else more
+    next_cursor = encode_cursor(sort, order, rows[-1], 'next') if rows and has_next else None
+    prev_cursor = encode_cursor(sort, order, rows[0], 'prev') if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def report_record(row) -> dict:
+    """JSON shape of one report row"""
+    return {
+        "id": row.id,
+        "student_name": row.student_name,
+        "roll_number": row.roll_number,
+        "division": row.division,
+        "faculty_name": row.faculty_name or "N/A",
+        "subject": row.subject,
+        "date": row.date.isoformat() if row.date else None,
+        "status": row.status
+    }
+
+
+def report_cells(row) -> list:
+    """One export row, in REPORT_HEADERS order"""
+    return [
+        row.student_name or '',
+        row.roll_number or '',
+        row.division or '',
+        row.faculty_name or 'N/A',
+        row.subject or '',
+        row.date.isoformat() if row.date else '',
+        row.status or '',
+    ]
+
+
+def report_values(row) -> tuple:
+    """One export row with typed values (date stays a date), in REPORT_HEADERS order"""
+    return (row.student_name, row.roll_number, row.division, row.faculty_name or 'N/A',
+            row.subject, row.date, row.status)
+
+
+def _counted(rows, chunk_rows, progress):
+    count = 0
+    for count, row in enumerate(rows, 1):
+        yield row
+        if count % chunk_rows == 0:
+            progress(count)
+    progress(count)
+
+
+def iter_csv(rows, chunk_rows: int = EXPORT_CHUNK_SIZE, progress=None):
+    """CSV text of report rows (export_rows), yielded in chunks of `chunk_rows` rows.
+
+    The header goes out before the query runs and rows are consumed as
+    they are fetched, so memory stays flat however many rows match.
+    `progress`, if given, is called with the number of rows written so far
+    after every chunk.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(REPORT_HEADERS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    if progress is not None:
+        rows = _counted(rows, chunk_rows, progress)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(report_cells(row))
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level: int = 6):
+    """gzip-compress a stream of text chunks without buffering the whole body"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_xlsx(rows, chunk_rows: int = EXPORT_CHUNK_SIZE, progress=None):
+    """.xlsx bytes of report rows (export_rows), streamed like iter_csv"""
+    if progress is not None:
+        rows = _counted(rows, chunk_rows, progress)
+    return xlsx.stream_xlsx(REPORT_HEADERS, (report_values(row) for row in rows), sheet_name='Attendance',
+                            widths=REPORT_WIDTHS, chunk_rows=chunk_rows)
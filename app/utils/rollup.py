@@ -0,0 +1,206 @@
+from datetime import date
+
+from sqlalchemy import delete, func, literal, select
+
+from app import db
+from app.models import Attendance, AttendanceDaily, Faculty, RollupWatermark, Student
+
+# Stored in place of a NULL faculty_id: NULLs never match each other in the primary key
+NO_FACULTY = 0
+
+KEY_COLUMNS = ('date', 'faculty_id', 'subject', 'division', 'status')
+
+# Columns a summary can be grouped by (the `group_by` query parameter)
+GROUP_COLUMNS = {
+    'date': AttendanceDaily.date,
+    'faculty': AttendanceDaily.faculty_id,
+    'subject': AttendanceDaily.subject,
+    'division': AttendanceDaily.division,
+}
+
+
+def grouped(condition, sign: int = 1, status: str | None = None):
+    """Rollup rows (key columns + count) for the attendance rows matching `condition`
+
+    With status, the rows are counted under that status instead of their own.
+    """
+    faculty_id = func.coalesce(Attendance.faculty_id, NO_FACULTY)
+    status_column = Attendance.status if status is None else literal(status, Attendance.status.type)
+    key = (Attendance.date, faculty_id, Attendance.subject, Student.division, status_column)
+    return (select(*key, func.count() * sign)
+            .join(Student, Student.id == Attendance.student_id)
+            .where(condition)
+            .group_by(*key))
+
+
+def apply(condition, sign: int = 1, status: str | None = None):
+    """Count the attendance rows matching `condition` into the rollup (sign=-1 takes them out).
+
+    One INSERT ... SELECT ... ON CONFLICT DO UPDATE on Postgres and SQLite.
+    Used by catch_up(), remove() and restatus(), which keep the watermark
+    right; the caller commits.
+    """
+    table = AttendanceDaily.__table__
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return _apply_one_by_one(condition, sign, status)
+
+    stmt = insert(table).from_select(KEY_COLUMNS + ('count',), grouped(condition, sign, status))
+    stmt = stmt.on_conflict_do_update(index_elements=list(KEY_COLUMNS),
+                                      set_={'count': table.c.count + stmt.excluded['count']})
+    db.session.execute(stmt)
+
+
+def watermark(lock: bool = True) -> RollupWatermark:
+    """The watermark row, created on first use; with lock, held until the transaction ends"""
+    query = db.session.query(RollupWatermark).filter_by(id=1)
+    row = (query.with_for_update() if lock else query).one_or_none()
+    if row is None:
+        row = RollupWatermark(id=1, last_id=0, seen_id=0)
+        db.session.add(row)
+        db.session.flush()
+    return row
+
+
+def catch_up() -> int:
+    """Count attendance inserted since the last catch-up into the rollup; commits.
+
+    Inserts never touch the rollup, where every mark of a busy session would
+    queue on the lock of the same rollup row; the maintenance leader counts
+    them in here instead. A run counts up to the highest id the previous run
+    saw, so a row whose id was handed out before an insert committed is not
+    stepped over. Returns the number of rows counted.
+    """
+    mark = watermark()
+    newest = db.session.query(func.max(Attendance.id)).scalar() or 0
+    counted = 0
+    if mark.seen_id > mark.last_id:
+        span = (Attendance.id > mark.last_id) & (Attendance.id <= mark.seen_id)
+        counted = db.session.query(func.count(Attendance.id)).filter(span).scalar()
+        if counted:
+            apply(span)
+        mark.last_id = mark.seen_id
+    mark.seen_id = max(newest, mark.last_id)
+    db.session.commit()
+    return counted
+
+
+def remove(condition):
+    """Take the attendance rows matching `condition` out of the rollup before deleting them.
+
+    Only rows the watermark has passed were counted; the watermark row stays
+    locked until the caller commits, so a catch-up cannot count the rows
+    while they are being deleted.
+    """
+    mark = watermark()
+    apply(condition & (Attendance.id <= mark.last_id), sign=-1)
+
+
+def restatus(condition, status: str):
+    """Move the attendance rows matching `condition` to `status` in the rollup before updating them.
+
+    Like remove(), only rows the watermark has passed are moved, and the
+    watermark row stays locked until the caller commits; rows it has not
+    passed are counted with their new status by the next catch-up.
+    """
+    mark = watermark()
+    counted = condition & (Attendance.id <= mark.last_id)
+    apply(counted, sign=-1)
+    apply(counted, status=status)
+
+
+def _apply_one_by_one(condition, sign, status=None):
+    """Fallback for databases without ON CONFLICT"""
+    for *key, delta in db.session.execute(grouped(condition, sign, status)).all():
+        row = db.session.get(AttendanceDaily, tuple(key))
+        if row is None:
+            db.session.add(AttendanceDaily(**dict(zip(KEY_COLUMNS, key)), count=delta))
+        else:
+            row.count += delta
+
+
+def rebuild() -> int:
+    """Recompute the whole rollup from attendance; returns its row count. The caller commits.
+
+    Also the fix after students change division, since rows are counted
+    under the division a student had when they were counted.
+    """
+    table = AttendanceDaily.__table__
+    mark = watermark()
+    newest = db.session.query(func.max(Attendance.id)).scalar() or 0
+    db.session.execute(delete(AttendanceDaily))
+    db.session.execute(table.insert().from_select(KEY_COLUMNS + ('count',), grouped(Attendance.id <= newest)))
+    mark.last_id = mark.seen_id = newest
+    return db.session.query(func.count()).select_from(AttendanceDaily).scalar()
+
+
+def drift() -> list[tuple[tuple, int, int]]:
+    """(key, stored count, actual count) for every rollup row that disagrees with the counted attendance"""
+    mark = watermark(lock=False)
+    actual = {tuple(key): count for *key, count in db.session.execute(grouped(Attendance.id <= mark.last_id))}
+    stored = {tuple(key): count for *key, count in db.session.execute(
+        select(*(getattr(AttendanceDaily, name) for name in KEY_COLUMNS), AttendanceDaily.count))}
+    return [(key, stored.get(key, 0), actual.get(key, 0))
+            for key in sorted(stored.keys() | actual.keys(), key=str)
+            if stored.get(key, 0) != actual.get(key, 0)]
+
+
+def _filtered(query, filters: dict):
+    """Apply report filters (reports.report_filters) to a rollup query"""
+    if filters.get('faculty_id') is not None:
+        query = query.filter(AttendanceDaily.faculty_id == filters['faculty_id'])
+    if filters.get('subject'):
+        query = query.filter(AttendanceDaily.subject == filters['subject'])
+    if filters.get('date_from'):
+        query = query.filter(AttendanceDaily.date >= date.fromisoformat(filters['date_from']))
+    if filters.get('date_to'):
+        query = query.filter(AttendanceDaily.date < date.fromisoformat(filters['date_to']))
+    if filters.get('division'):
+        query = query.filter(AttendanceDaily.division == filters['division'])
+    if filters.get('faculty_name'):
+        # Names resolve to ids first, so the rollup is still read through its faculty index
+        query = query.filter(AttendanceDaily.faculty_id.in_(
+            select(Faculty.id).where(Faculty.full_name.ilike(f"%{filters['faculty_name']}%"))))
+    if filters.get('status'):
+        query = query.filter(AttendanceDaily.status == filters['status'])
+    return query
+
+
+def summary_query(filters: dict, group_by: list[str]):
+    """(group columns..., status, count) rows behind summary()"""
+    columns = [GROUP_COLUMNS[name].label(name) for name in group_by]
+    query = db.session.query(*columns, AttendanceDaily.status, func.sum(AttendanceDaily.count))
+    # Deletes leave zero counts behind until the next rebuild
+    return (_filtered(query, filters).group_by(*columns, AttendanceDaily.status)
+            .having(func.sum(AttendanceDaily.count) > 0).order_by(*columns))
+
+
+def summary(filters: dict, group_by: list[str]) -> list[dict]:
+    """Attendance counts per status for each group, e.g. per (date, subject).
+
+    Marks are counted in by the maintenance leader's catch-up, so the newest
+    lag by up to two MAINTENANCE_ROLLUP_SECONDS.
+    """
+    groups = {}
+    for *key, status, count in summary_query(filters, group_by):
+        key = tuple(key)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {name: value for name, value in zip(group_by, key)}
+            group.update(total=0, by_status={})
+        group['by_status'][status] = int(count)
+        group['total'] += int(count)
+
+    results = list(groups.values())
+    for group in results:
+        if 'date' in group:
+            group['date'] = group['date'].isoformat()
+        if 'faculty' in group:
+            group['faculty'] = group['faculty'] or None
+        present = group['by_status'].get('Present', 0)
+        group['attendance_rate'] = round(present / group['total'], 4) if group['total'] else None
+    return results
@@ -0,0 +1,55 @@
+import hashlib
+import hmac
+import math
+import secrets
+import struct
+import time
+
+# Length of one code window in seconds (overridden from OTP_ROTATION_SECONDS)
+ROTATION_SECONDS = 30
+
+# Windows either side of the current one that are still accepted
+ALLOWED_DRIFT = 1
+
+
+def new_secret() -> str:
+    """Random per-session secret for rotating OTPs"""
+    return secrets.token_hex(20)
+
+
+def current_window(now: float | None = None) -> int:
+    return int((time.time() if now is None else now) // ROTATION_SECONDS)
+
+
+def code_for(secret: str, window: int, digits: int = 4) -> str:
+    """HOTP-style code (RFC 4226 dynamic truncation) for one time window"""
+    digest = hmac.new(bytes.fromhex(secret), struct.pack('>Q', window), hashlib.sha1).digest()
+    offset = digest[-1] & 0x0F
+    value = struct.unpack('>I', digest[offset:offset + 4])[0] & 0x7FFFFFFF
+    return f'{value % 10 ** digits:0{digits}d}'
+
+
+def current_code(secret: str, now: float | None = None) -> tuple[str, int]:
+    """The code to display right now and the seconds until it changes"""
+    now = time.time() if now is None else now
+    window = current_window(now)
+    seconds_remaining = math.ceil((window + 1) * ROTATION_SECONDS - now)
+    return code_for(secret, window), seconds_remaining
+
+
+def accepted_codes(secret: str, window: int) -> set[str]:
+    """Codes that verify during `window`, allowing ALLOWED_DRIFT windows either way"""
+    return {code_for(secret, window + step) for step in range(-ALLOWED_DRIFT, ALLOWED_DRIFT + 1)}
+
+
+def display_fields(session) -> dict:
+    """OTP fields for API responses: the live code for rotating sessions"""
+    if not session.otp_secret:
+        return {'otp': session.otp, 'rotating': False}
+    code, seconds_remaining = current_code(session.otp_secret)
+    return {'otp': code, 'rotating': True, 'seconds_remaining': seconds_remaining, 'period': ROTATION_SECONDS}
+
+
+def init_app(app):
+    global ROTATION_SECONDS
+    ROTATION_SECONDS = int(app.config.get('OTP_ROTATION_SECONDS', ROTATION_SECONDS))
@@ -0,0 +1,139 @@
+import atexit
+import heapq
+import threading
+import time
+from datetime import datetime
+
+from app import db
+from app.utils.session_index import as_utc
+
+# A failed expiry is retried after this long (the maintenance sweep is the backstop)
+RETRY_SECONDS = 5.0
+
+
+class SessionExpiry:
+    """Expires each session at its exact deadline instead of on the next sweep.
+
+    A min-heap of (deadline, session_id) is filled from the active sessions
+    when the process starts, then kept current by create_session (schedule)
+    and close_session (cancel). One thread sleeps until the earliest
+    deadline and flips the due sessions with a targeted UPDATE that only
+    matches rows still active and past their expires_at. This makes firing
+    in several processes, or after a close elsewhere, a no-op. Cancelled
+    and rescheduled entries stay in the heap and are skipped when popped.
+
+    Only server processes call start(). Elsewhere schedule() just records
+    the deadline, and the maintenance sweep (expire_old_sessions) catches
+    whatever no process expired.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._heap: list[tuple[float, int]] = []
+        self._deadlines: dict[int, float] = {}
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['session_expiry'] = self
+
+    def schedule(self, session_id: int, expires_at: datetime):
+        deadline = as_utc(expires_at).timestamp()
+        with self._condition:
+            self._deadlines[session_id] = deadline
+            heapq.heappush(self._heap, (deadline, session_id))
+            if self._heap[0] == (deadline, session_id):
+                self._condition.notify()
+
+    def cancel(self, session_id: int):
+        with self._condition:
+            self._deadlines.pop(session_id, None)
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._deadlines)
+
+    def start(self):
+        """Load the active sessions and start the timer thread; call from server entry points only"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='session-expiry', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def shutdown(self, timeout: float = 5.0):
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        thread.join(timeout)
+
+    def _load(self):
+        from app.models import AttendanceSession
+
+        with self._app.app_context():
+            try:
+                rows = db.session.query(AttendanceSession.id, AttendanceSession.expires_at).filter(
+                    AttendanceSession.status == 'active').all()
+            except Exception as e:
+                # Tables not created yet or database unavailable; the sweep covers these sessions
+                print(f"Error loading session deadlines: {e}")
+                return
+        for session_id, expires_at in rows:
+            self.schedule(session_id, expires_at)
+
+    def _due(self) -> list[int] | None:
+        """Block until sessions are due and return their ids; None once stopping"""
+        with self._condition:
+            while not self._stopping:
+                while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)  # cancelled, or rescheduled to another deadline
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                due = []
+                while self._heap and self._heap[0][0] <= time.time():
+                    deadline, session_id = heapq.heappop(self._heap)
+                    if self._deadlines.get(session_id) == deadline:
+                        del self._deadlines[session_id]
+                        due.append(session_id)
+                if due:
+                    return due
+            return None
+
+    def _run(self):
+        from app.utils.session_manager import SessionManager
+
+        self._load()
+        while True:
+            due = self._due()
+            if due is None:
+                return
+            with self._app.app_context():
+                try:
+                    SessionManager().expire_sessions(due)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error expiring sessions {due}: {e}")
+                    retry = time.time() + RETRY_SECONDS
+                    with self._condition:
+                        for session_id in due:
+                            self._deadlines.setdefault(session_id, retry)
+                            heapq.heappush(self._heap, (self._deadlines[session_id], session_id))
+
+
+session_expiry = SessionExpiry()
@@ -0,0 +1,332 @@
+import os
+import secrets
+import select
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.utils import rotating_otp
+
+# Postgres channel used to tell other workers that the active-session set changed
+NOTIFY_CHANNEL = 'session_index'
+
+# With a LISTEN connection up we still re-sync occasionally in case a notification was lost
+LISTENER_RESYNC_SECONDS = 60.0
+
+# A code that matches nothing may belong to a rotating session another worker just
+# created; re-sync on such misses, but at most this often
+MISS_RESYNC_SECONDS = 1.0
+
+
+def as_utc(value):
+    """Return a timezone-aware UTC datetime (SQLite hands back naive values)"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+@dataclass(frozen=True)
+class SessionSnapshot:
+    """Immutable copy of the AttendanceSession fields the mark path needs"""
+    id: int
+    session_code: str
+    otp: str
+    faculty_id: int
+    subject: str
+    faculty_latitude: float | None
+    faculty_longitude: float | None
+    faculty_location_accuracy: float | None
+    faculty_location_timestamp: datetime | None
+    expected_location_radius: float | None
+    expected_division: str | None
+    expires_at: datetime
+    status: str = 'active'
+    otp_secret: str | None = None
+
+    @classmethod
+    def from_model(cls, session) -> 'SessionSnapshot':
+        return cls(
+            id=session.id,
+            session_code=session.session_code,
+            otp=session.otp,
+            faculty_id=session.faculty_id,
+            subject=session.subject,
+            faculty_latitude=session.faculty_latitude,
+            faculty_longitude=session.faculty_longitude,
+            faculty_location_accuracy=session.faculty_location_accuracy,
+            faculty_location_timestamp=as_utc(session.faculty_location_timestamp),
+            expected_location_radius=session.expected_location_radius,
+            expected_division=session.expected_division,
+            expires_at=as_utc(session.expires_at),
+            status=session.status,
+            otp_secret=session.otp_secret,
+        )
+
+    @property
+    def rotating(self) -> bool:
+        return self.otp_secret is not None
+
+    def is_live(self, now: datetime | None = None) -> bool:
+        return self.status == 'active' and self.expires_at > (now or datetime.now(timezone.utc))
+
+    def with_location(self, latitude, longitude, accuracy, timestamp) -> 'SessionSnapshot':
+        return replace(
+            self,
+            faculty_latitude=latitude,
+            faculty_longitude=longitude,
+            faculty_location_accuracy=accuracy,
+            faculty_location_timestamp=timestamp,
+        )
+
+
+class ActiveSessionIndex:
+    """Process-local index of active sessions keyed by OTP and faculty_id.
+
+    Local writes go through put()/discard(). Changes made by other workers are
+    picked up through Postgres LISTEN/NOTIFY when available, and otherwise by
+    re-syncing the whole (small) active set once it is older than the TTL.
+    Lookups that miss fall through to the database so a session created by
+    another worker is visible immediately.
+
+    Rotating-OTP sessions are not keyed by their stored OTP. Instead a route
+    table maps every code accepted in the current window (plus drift) to its
+    sessions; it is rebuilt when the window rolls over or the set changes.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.RLock()
+        self._by_id: dict[int, SessionSnapshot] = {}
+        self._by_otp: dict[str, int] = {}
+        self._by_faculty: dict[int, int] = {}
+        self._routes: dict[str, list[int]] = {}
+        self._routes_window: int | None = None
+        self._synced_at: float | None = None
+        self._miss_resync_at = 0.0
+        self._token = secrets.token_hex(8)
+        self._app = None
+        self._listener: threading.Thread | None = None
+        self._listening = False
+        self.ttl = 2.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._app = app
+        self.ttl = float(app.config.get('SESSION_INDEX_TTL', self.ttl))
+        app.extensions['session_index'] = self
+
+    # -------------------------------
+    # Reads
+    # -------------------------------
+    def get_by_otp(self, otp: str, subject: str | None = None) -> SessionSnapshot | None:
+        """Live session accepting this OTP; `subject` breaks ties between rotating codes"""
+        self._ensure_fresh()
+        candidates = self._candidates(otp)
+        if not candidates:
+            snapshot = self._load(otp=otp)
+            if snapshot is not None:
+                candidates = [snapshot]
+            elif time.monotonic() - self._miss_resync_at > MISS_RESYNC_SECONDS:
+                self._miss_resync_at = time.monotonic()
+                self.warm()
+                candidates = self._candidates(otp)
+        live = [snapshot for snapshot in candidates if snapshot.is_live()]
+        if not live:
+            return None
+        for snapshot in live:
+            if snapshot.subject == subject:
+                return snapshot
+        return live[0]
+
+    def _candidates(self, otp: str) -> list[SessionSnapshot]:
+        with self._lock:
+            candidates = []
+            static = self._by_id.get(self._by_otp.get(otp))
+            if static is not None:
+                candidates.append(static)
+            for session_id in self._rotating_routes().get(otp, ()):
+                snapshot = self._by_id.get(session_id)
+                if snapshot is not None:  # removed since the routes were built
+                    candidates.append(snapshot)
+            return candidates
+
+    def _rotating_routes(self) -> dict[str, list[int]]:
+        window = rotating_otp.current_window()
+        if self._routes_window != window:
+            routes: dict[str, list[int]] = {}
+            for snapshot in self._by_id.values():
+                if snapshot.rotating:
+                    for code in rotating_otp.accepted_codes(snapshot.otp_secret, window):
+                        routes.setdefault(code, []).append(snapshot.id)
+            self._routes = routes
+            self._routes_window = window
+        return self._routes
+
+    def get_by_faculty(self, faculty_id: int) -> SessionSnapshot | None:
+        self._ensure_fresh()
+        with self._lock:
+            snapshot = self._by_id.get(self._by_faculty.get(faculty_id))
+        if snapshot is None:
+            snapshot = self._load(faculty_id=faculty_id)
+        return snapshot if snapshot and snapshot.is_live() else None
+
+    def snapshots(self) -> list[SessionSnapshot]:
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._by_id.values())
+
+    # -------------------------------
+    # Local writes
+    # -------------------------------
+    def put(self, session) -> SessionSnapshot:
+        """Insert or replace a session (model or snapshot) in the index"""
+        snapshot = session if isinstance(session, SessionSnapshot) else SessionSnapshot.from_model(session)
+        if snapshot.status != 'active':
+            self.discard(snapshot.id)
+            return snapshot
+        with self._lock:
+            self._remove(snapshot.id)
+            self._by_id[snapshot.id] = snapshot
+            if snapshot.rotating:
+                self._routes_window = None
+            else:
+                self._by_otp[snapshot.otp] = snapshot.id
+            self._by_faculty[snapshot.faculty_id] = snapshot.id
+        return snapshot
+
+    def discard(self, session_id: int):
+        with self._lock:
+            self._remove(session_id)
+
+    def _remove(self, session_id):
+        old = self._by_id.pop(session_id, None)
+        if old is None:
+            return
+        if old.rotating:
+            self._routes_window = None
+        if self._by_otp.get(old.otp) == session_id:
+            del self._by_otp[old.otp]
+        if self._by_faculty.get(old.faculty_id) == session_id:
+            del self._by_faculty[old.faculty_id]
+
+    # -------------------------------
+    # Loading / syncing
+    # -------------------------------
+    def warm(self):
+        """Replace the index contents with every live session in the database"""
+        from app.models import AttendanceSession
+
+        now = datetime.now(timezone.utc)
+        rows = AttendanceSession.query.filter(
+            AttendanceSession.status == 'active',
+            AttendanceSession.expires_at > now
+        ).all()
+        snapshots = [SessionSnapshot.from_model(row) for row in rows]
+        with self._lock:
+            self._by_id.clear()
+            self._by_otp.clear()
+            self._by_faculty.clear()
+            # Rebuilt on the next rotating lookup, even if no rotating session is left
+            self._routes = {}
+            self._routes_window = None
+            for snapshot in snapshots:
+                self.put(snapshot)
+            self._synced_at = time.monotonic()
+
+    def invalidate(self):
+        """Force the next lookup to re-sync from the database"""
+        with self._lock:
+            self._synced_at = None
+
+    def _ensure_fresh(self):
+        self._start_listener()
+        ttl = LISTENER_RESYNC_SECONDS if self._listening else self.ttl
+        synced_at = self._synced_at
+        if synced_at is None or time.monotonic() - synced_at > ttl:
+            self.warm()
+
+    def _load(self, otp=None, faculty_id=None) -> SessionSnapshot | None:
+        from app.models import AttendanceSession
+
+        # A row still marked active past its deadline is waiting for session_expiry; skip it
+        query = AttendanceSession.query.filter(AttendanceSession.status == 'active',
+                                               AttendanceSession.expires_at > datetime.now(timezone.utc))
+        if otp is not None:
+            # The stored OTP of a rotating session is never accepted as a code
+            query = query.filter(AttendanceSession.otp == otp, AttendanceSession.otp_secret.is_(None))
+        if faculty_id is not None:
+            query = query.filter(AttendanceSession.faculty_id == faculty_id)
+        session = query.first()
+        if not session:
+            return None
+        return self.put(session)
+
+    # -------------------------------
+    # Cross-worker invalidation
+    # -------------------------------
+    def notify(self, session_id: int):
+        """Queue a change notification in the current transaction (Postgres only).
+
+        NOTIFY is delivered on commit, so other workers never hear about a
+        change that was rolled back.
+        """
+        if db.engine.dialect.name != 'postgresql':
+            return
+        db.session.execute(
+            text('SELECT pg_notify(:channel, :payload)'),
+            {'channel': NOTIFY_CHANNEL, 'payload': f'{self._token}:{session_id}'}
+        )
+
+    def _start_listener(self):
+        if self._listener is not None or self._app is None:
+            return
+        if db.engine.dialect.name != 'postgresql':
+            self._listener = False
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, args=(db.engine,), daemon=True)
+            self._listener.start()
+
+    def _listen(self, engine):
+        """Hold a LISTEN connection and invalidate on foreign notifications"""
+        while True:
+            conn = None
+            try:
+                conn = engine.raw_connection()
+                # Keep the LISTEN connection out of the pool for good
+                conn.detach()
+                dbapi_conn = conn.driver_connection
+                dbapi_conn.autocommit = True
+                with dbapi_conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                # Anything could have changed while we were not listening
+                self.invalidate()
+                self._listening = True
+                while True:
+                    if select.select([dbapi_conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    dbapi_conn.poll()
+                    while dbapi_conn.notifies:
+                        notification = dbapi_conn.notifies.pop(0)
+                        if not notification.payload.startswith(self._token + ':'):
+                            self.invalidate()
+            except Exception as e:
+                self._listening = False
+                print(f"Session index listener error (pid {os.getpid()}): {str(e)}")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except SQLAlchemyError:
+                        pass
+
+
+session_index = ActiveSessionIndex()
@@ -1,29 +1,51 @@
 import random
 import string
 import math
+import time
 from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from sqlalchemy import DateTime, cast, delete, exists, func, literal, or_, select, union_all, update
+from sqlalchemy.exc import IntegrityError
 
 from app import db
-from app.models import AttendanceSession, Attendance, Faculty
+from app.models import AttendanceSession, Attendance, Student, SessionLocation
+from app.utils.session_index import session_index, SessionSnapshot, as_utc
+from app.utils.session_expiry import session_expiry
+from app.utils.attendance_ingest import attendance_ingest
+from app.utils.faculty_stats import faculty_stats
+from app.utils.live_feed import live_feed
+from app.utils.otp_pool import otp_pool
+from app.utils.location_trail import location_trail, nearest_fix
+from app.utils import archive, geofence, rollup, rotating_otp
+
+# Seconds a request waits for the batched ingest flusher before giving up
+INGEST_RESULT_TIMEOUT = 30
+
+# Inserts tried before giving up when another worker grabbed the same OTP/session code
+SESSION_CREATE_ATTEMPTS = 20
+
+# How a taken OTP or session code shows up in the driver's error: the index
+# name on PostgreSQL, the table.column on SQLite
+CODE_COLLISION_MARKERS = ('uq_session_active_otp', 'attendance_session_session_code_key',
+                          'attendance_session.otp', 'attendance_session.session_code')
 
 
 def generate_otp(length=4):
-    """Generate a unique 4-digit OTP"""
-    characters = string.digits
-    while True:
-        otp = ''.join(random.choice(characters) for _ in range(length))
-        # Check if OTP is unique
-        if not AttendanceSession.query.filter_by(otp=otp).first():
-            return otp
+    """Take a free 4-digit OTP from the process-local pool"""
+    return otp_pool.acquire()
 
 
 def generate_session_code(length=10):
-    """Generate a unique session code"""
+    """Generate a random session code (uniqueness is enforced by the column constraint)"""
     characters = string.ascii_uppercase + string.digits
-    while True:
-        session_code = ''.join(random.choice(characters) for _ in range(length))
-        if not AttendanceSession.query.filter_by(session_code=session_code).first():
-            return session_code
+    return ''.join(random.choice(characters) for _ in range(length))
+
+
+def is_code_collision(error: IntegrityError) -> bool:
+    """True when the insert lost on the active-OTP or session code unique index, not another constraint"""
+    message = str(error.orig)
+    return any(marker in message for marker in CODE_COLLISION_MARKERS)
 
 
 def calculate_distance(lat1, lon1, lat2, lon2):
@@ -39,210 +61,737 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
+# Rows per multi-row INSERT statement (keeps SQLite under its bound-parameter limit)
+INSERT_CHUNK_SIZE = 500
+
+# Outcomes of a single attendance mark
+MARK_PRESENT = 'present'
+MARK_DUPLICATE = 'duplicate'
+MARK_INVALID_SESSION = 'invalid_session'
+MARK_LOCATION_REQUIRED = 'location_required'
+MARK_OUT_OF_RADIUS = 'out_of_radius'
+MARK_UNKNOWN_STUDENT = 'unknown_student'
+MARK_OUTSIDE_WINDOW = 'outside_session_window'
+MARK_INVALID = 'invalid'
+
+
+class MarkResult(NamedTuple):
+    status: str
+    attendance_id: int | None = None
+    distance: float | None = None
+
+
+# Sessions handled per transaction by the expiry and retention sweeps
+SWEEP_CHUNK_SIZE = 200
+
+
+class SweepResult(NamedTuple):
+    """Progress of a chunked expiry or retention sweep (or, with dry_run, what it would touch)"""
+    sessions: int = 0
+    attendance: int = 0  # absence rows written (expiry) or attendance rows removed (retention)
+    locations: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    complete: bool = True  # False when the time budget ran out with sessions left
+    dry_run: bool = False
+
+    @property
+    def rows(self) -> int:
+        return self.sessions + self.attendance + self.locations
+
+
+def faculty_position(session_id: int, at: datetime, fallback: tuple, trail: list | None = None) -> tuple:
+    """(latitude, longitude, accuracy) of the faculty to check a mark taken at `at` against.
+
+    The fix nearest in time from this process's location trail, else from
+    `trail` (the session's written fixes, location_trail.stored), else
+    `fallback`, the position stored on the session.
+    """
+    fix = location_trail.nearest(session_id, at) or nearest_fix(trail, at)
+    if fix is None:
+        return fallback
+    return fix.latitude, fix.longitude, fix.accuracy
+
+
+def check_location(session, student_location: dict) -> tuple[str | None, float | None]:
+    """Check a student position against the session geofence.
+
+    Returns (failure status or None, distance in meters or None).
+    """
+    return check_locations(session, [student_location])[0]
+
+
+def check_locations(session, student_locations: list[dict],
+                    marked_at: list[datetime] | None = None) -> list[tuple[str | None, float | None]]:
+    """Check many student positions against one session geofence in a single pass.
+
+    Each position is compared with the faculty fix nearest in time to its
+    marked_at (default now) from the in-memory location trail, falling back
+    to the position stored on the session.
+    """
+    now = datetime.now(timezone.utc)
+    on_session = (session.faculty_latitude, session.faculty_longitude, session.faculty_location_accuracy)
+    faculty = [faculty_position(session.id, at, on_session) for at in marked_at or [now] * len(student_locations)]
+
+    result = geofence.evaluate(
+        [location.get('latitude') for location in student_locations],
+        [location.get('longitude') for location in student_locations],
+        [location.get('accuracy') for location in student_locations],
+        [position[0] for position in faculty],
+        [position[1] for position in faculty],
+        [position[2] for position in faculty],
+        session.expected_location_radius,
+    )
+    results = []
+    for (faculty_lat, faculty_lon, _), (distance, within) in zip(faculty, result.rows()):
+        if faculty_lat is None or faculty_lon is None:
+            results.append((None, None))  # No faculty position to check against
+        elif distance is None:
+            # If faculty has location, student must also provide location
+            results.append((MARK_LOCATION_REQUIRED, None))
+        elif not within:
+            results.append((MARK_OUT_OF_RADIUS, distance))  # Student too far from faculty location
+        else:
+            results.append((None, distance))
+    return results
+
+
+def attendance_row(session, student_id: int, student_location: dict, distance: float | None,
+                   marked_at: datetime | None = None, status: str = 'Present') -> dict:
+    """Column values for one attendance insert"""
+    marked_at = marked_at or datetime.now(timezone.utc)
+    return {
+        'student_id': student_id,
+        'session_id': session.id,
+        'subject': session.subject,
+        'faculty_id': session.faculty_id,
+        'date': marked_at.date(),
+        'status': status,
+        'student_latitude': student_location.get('latitude'),
+        'student_longitude': student_location.get('longitude'),
+        'student_location_accuracy': student_location.get('accuracy'),
+        'distance_from_faculty': distance,
+        'marked_at': marked_at,
+    }
+
+
+def insert_attendance_rows(rows: list[dict], active_only: bool = False) -> dict[tuple[int, int], int]:
+    """Insert attendance rows, skipping any (session_id, student_id) already present.
+
+    Uses INSERT ... ON CONFLICT DO NOTHING RETURNING on Postgres and SQLite so
+    duplicates cost nothing extra. With active_only, rows are inserted by
+    INSERT ... SELECT ... WHERE EXISTS against their session's row, so a mark
+    racing a close or the expiry deadline is dropped by the database rather
+    than by a cached snapshot. Otherwise (late uploads into a finished
+    session) an Absent row written at the close is upgraded to Present by
+    ON CONFLICT DO UPDATE, and moved across in the rollup.
+
+    Returns {(session_id, student_id): id} for the rows that were actually
+    inserted or upgraded and hands them to the live feed, which announces
+    them once the caller commits. The daily rollup counts new rows in later
+    (rollup.catch_up).
+    """
+    if not rows:
+        return {}
+    table = Attendance.__table__
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    # Sessions take marks until they close, and absences are written by the close,
+    # so only uploads that skip the open-session check can meet an Absent row
+    absent = {} if active_only else _lock_absences(rows)
+    if absent:
+        rollup.restatus(Attendance.id.in_(absent.values()), 'Present')
+        # ON CONFLICT DO UPDATE may not touch one row twice in a statement
+        unique = {}
+        for row in rows:
+            unique.setdefault((row['session_id'], row['student_id']), row)
+        rows = list(unique.values())
+
+    if insert is None:
+        inserted = _insert_attendance_rows_one_by_one(rows, active_only, absent)
+    else:
+        if active_only:
+            # One statement per session, as the EXISTS guard names a single session row
+            now = datetime.now(timezone.utc)
+            groups = {}
+            for row in rows:
+                groups.setdefault(row['session_id'], []).append(row)
+            groups = list(groups.values())
+        else:
+            groups = [rows]
+        inserted = {}
+        for group in groups:
+            for offset in range(0, len(group), INSERT_CHUNK_SIZE):
+                chunk = group[offset:offset + INSERT_CHUNK_SIZE]
+                if active_only:
+                    names = list(chunk[0])
+                    stmt = insert(table).from_select(
+                        names,
+                        select(_literal_rows(table, names, chunk, dialect)).where(
+                            session_is_open(chunk[0]['session_id'], now)),
+                    )
+                else:
+                    stmt = insert(table).values(chunk)
+                if absent:
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=['session_id', 'student_id'],
+                        set_={name: stmt.excluded[name] for name in UPGRADED_COLUMNS},
+                        where=(table.c.status == 'Absent') & table.c.id.in_(absent.values()),
+                    )
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=['session_id', 'student_id'])
+                stmt = stmt.returning(table.c.id, table.c.session_id, table.c.student_id)
+                inserted.update({(row.session_id, row.student_id): row.id for row in db.session.execute(stmt)})
+
+    if inserted:
+        for faculty_id in {row['faculty_id'] for row in rows}:
+            faculty_stats.touch(faculty_id)
+        live_feed.stage(rows, inserted)
+    return inserted
+
+
+# Columns a late mark overwrites on the Absent row it replaces (the date stays the session's)
+UPGRADED_COLUMNS = ('status', 'marked_at', 'student_latitude', 'student_longitude',
+                    'student_location_accuracy', 'distance_from_faculty')
+
+
+def _lock_absences(rows: list[dict]) -> dict[tuple[int, int], int]:
+    """{(session_id, student_id): id} of the Absent rows the given marks would replace, row-locked.
+
+    A cheap unlocked probe first, so uploads without absences never queue on
+    the rollup watermark; when there are some, the watermark is locked before
+    the rows, in the same order as rollup.remove().
+    """
+    students = {}
+    for row in rows:
+        students.setdefault(row['session_id'], set()).add(row['student_id'])
+    condition = (Attendance.status == 'Absent') & or_(*(
+        (Attendance.session_id == session_id) & Attendance.student_id.in_(student_ids)
+        for session_id, student_ids in students.items()
+    ))
+    if not db.session.query(exists().where(condition)).scalar():
+        return {}
+    rollup.watermark()
+    locked = db.session.query(Attendance.id, Attendance.session_id, Attendance.student_id).filter(
+        condition).with_for_update()
+    return {(row.session_id, row.student_id): row.id for row in locked}
+
+
+def session_is_open(session_id: int, now: datetime):
+    """EXISTS clause: the session row is still active and before its deadline"""
+    return exists().where(
+        AttendanceSession.id == session_id,
+        AttendanceSession.status == 'active',
+        AttendanceSession.expires_at > now,
+    )
+
+
+def _literal_rows(table, names: list[str], rows: list[dict], dialect: str):
+    """The rows as a derived table of SELECT ... UNION ALL SELECT ... literals.
+
+    (SQLite has no column list for a VALUES alias; INSERT_CHUNK_SIZE also stays
+    within its 500-term compound SELECT limit.) Postgres gets explicit casts
+    so a column that is NULL in every row is not typed as text.
+    """
+    def value(row, name):
+        column = literal(row[name], table.c[name].type)
+        return cast(column, table.c[name].type).label(name) if dialect == 'postgresql' else column.label(name)
+
+    return union_all(*(select(*(value(row, name) for name in names)) for row in rows)).subquery()
+
+
+def _insert_attendance_rows_one_by_one(rows, active_only=False, absent=None):
+    """Fallback for databases without ON CONFLICT: one savepoint per row"""
+    now = datetime.now(timezone.utc)
+    open_sessions = {}
+    inserted = {}
+    for row in rows:
+        key = (row['session_id'], row['student_id'])
+        if absent and key in absent:
+            db.session.execute(update(Attendance), [{'id': absent[key], **{name: row[name] for name in UPGRADED_COLUMNS}}])
+            inserted[key] = absent[key]
+            continue
+        if active_only:
+            if row['session_id'] not in open_sessions:
+                open_sessions[row['session_id']] = db.session.query(session_is_open(row['session_id'], now)).scalar()
+            if not open_sessions[row['session_id']]:
+                continue
+        try:
+            with db.session.begin_nested():
+                attendance = Attendance(**row)
+                db.session.add(attendance)
+            inserted[key] = attendance.id
+        except IntegrityError:
+            pass
+    return inserted
+
+
+def insert_absences(session: AttendanceSession, marked_at: datetime) -> int:
+    """Write an Absent row for every student in the session's division who has no mark.
+
+    A single INSERT ... SELECT over the roster, so students are never loaded
+    into Python; the NOT EXISTS (and ON CONFLICT DO NOTHING against a mark
+    racing the close) makes running it again a no-op. The rows are dated by
+    the day the session started. Returns how many were written. The caller commits.
+    """
+    if not session.expected_division:
+        return 0
+    table = Attendance.__table__
+    columns = ['student_id', 'session_id', 'subject', 'faculty_id', 'date', 'status', 'marked_at']
+    roster = select(
+        Student.id,
+        literal(session.id),
+        literal(session.subject),
+        literal(session.faculty_id),
+        literal(as_utc(session.created_at).date(), Attendance.date.type),
+        literal('Absent'),
+        literal(as_utc(marked_at), DateTime(timezone=True)),
+    ).where(
+        Student.division == session.expected_division,
+        ~exists().where(Attendance.session_id == session.id, Attendance.student_id == Student.id),
+    )
+
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # No ON CONFLICT / RETURNING: the NOT EXISTS alone keeps it idempotent
+        written = db.session.execute(table.insert().from_select(columns, roster)).rowcount
+        if written:
+            faculty_stats.touch(session.faculty_id)
+        return written
+
+    stmt = (insert(table).from_select(columns, roster)
+            .on_conflict_do_nothing(index_elements=['session_id', 'student_id'])
+            .returning(table.c.id))
+    written = len(db.session.scalars(stmt).all())
+    if written:
+        faculty_stats.touch(session.faculty_id)
+    return written
+
+
 class SessionManager:
     """Service class for managing attendance sessions"""
     
-    def create_session(self, faculty_id: int, subject: str, location_data: dict, expires_in_minutes: int = 5) -> AttendanceSession:
-        """Create a new attendance session"""
-        # Generate unique OTP and session code
-        otp = generate_otp()
-        session_code = generate_session_code()
-        
+    def create_session(self, faculty_id: int, subject: str, location_data: dict, expires_in_minutes: int = 5,
+                       rotating: bool = False, division: str | None = None) -> AttendanceSession:
+        """Create a new attendance session (rotating=True derives the OTP from a per-session secret).
+
+        With a division, students of that division who have not marked by the
+        time the session closes or expires are recorded as absent.
+        """
         # Calculate expiration time
         expires_at = datetime.now(timezone.utc) + timedelta(minutes=expires_in_minutes)
 
-        # Create new session
-        session = AttendanceSession(
-            session_code=session_code,
-            otp=otp,
-            faculty_id=faculty_id,
-            subject=subject,
-            faculty_latitude=location_data.get('latitude'),
-            faculty_longitude=location_data.get('longitude'),
-            faculty_location_accuracy=location_data.get('accuracy'),
-            faculty_location_timestamp=datetime.now(timezone.utc) if location_data.get('latitude') else None,
-            expires_at=expires_at
-        )
-        db.session.add(session)
+        # OTPs only need to be unique among active sessions (partial unique index);
+        # a collision with another worker's live session fails the insert and we
+        # move on to the next pooled code instead of probing the table first
+        for _ in range(SESSION_CREATE_ATTEMPTS):
+            session = AttendanceSession(
+                session_code=generate_session_code(),
+                otp=generate_otp(),
+                faculty_id=faculty_id,
+                subject=subject,
+                faculty_latitude=location_data.get('latitude'),
+                faculty_longitude=location_data.get('longitude'),
+                faculty_location_accuracy=location_data.get('accuracy'),
+                faculty_location_timestamp=datetime.now(timezone.utc) if location_data.get('latitude') else None,
+                expires_at=expires_at,
+                expected_division=division,
+                otp_secret=rotating_otp.new_secret() if rotating else None
+            )
+            try:
+                with db.session.begin_nested():
+                    db.session.add(session)
+            except IntegrityError as error:
+                if not is_code_collision(error):
+                    raise
+                continue
+            break
+        else:
+            raise RuntimeError('Could not allocate a free OTP')
+
+        session_index.notify(session.id)
+        faculty_stats.touch(faculty_id)
         db.session.commit()
+        session_index.put(session)
+        session_expiry.schedule(session.id, session.expires_at)
+        if session.faculty_latitude is not None and session.faculty_longitude is not None:
+            location_trail.record(session.id, session.faculty_latitude, session.faculty_longitude,
+                                  session.faculty_location_accuracy, as_utc(session.faculty_location_timestamp))
         return session
 
-    def get_active_session(self, faculty_id: int) -> AttendanceSession | None:
+    def get_active_session(self, faculty_id: int) -> SessionSnapshot | None:
         """Get the active session for a faculty member"""
-        now = datetime.now(timezone.utc)
-        # Get session without time filter first
-        session = AttendanceSession.query.filter(
-            AttendanceSession.faculty_id == faculty_id,
-            AttendanceSession.status == 'active'
-        ).first()
-        
+        return session_index.get_by_faculty(faculty_id)
+
+    def get_session_by_otp(self, otp: str, subject: str | None = None) -> SessionSnapshot | None:
+        """Get an active session by OTP (static or current rotating code)"""
+        return session_index.get_by_otp(otp, subject)
+
+    def validate_and_mark_attendance(self, otp: str, student_id: int, student_location: dict,
+                                     session: SessionSnapshot | None = None) -> MarkResult:
+        """Validate OTP and location, then mark attendance with a single INSERT.
+
+        Duplicates are caught by the (session_id, student_id) unique constraint
+        rather than a SELECT beforehand, so two concurrent submits cannot both win.
+        """
+        session = session or self.get_session_by_otp(otp)
         if not session:
-            return None
-        
-        # Handle timezone-naive datetime from SQLite
-        expires_at = session.expires_at
-        if expires_at.tzinfo is None:
-            expires_at = expires_at.replace(tzinfo=timezone.utc)
-        
-        # Check if expired
-        if expires_at <= now:
-            return None
-        
-        return session
+            return MarkResult(MARK_INVALID_SESSION)  # Session not found or expired
 
-    def get_session_by_otp(self, otp: str) -> AttendanceSession | None:
-        """Get an active session by OTP"""
+        failure, distance = check_location(session, student_location)
+        if failure:
+            return MarkResult(failure, distance=distance)
+
+        row = attendance_row(session, student_id, student_location, distance)
+        if attendance_ingest.enabled:
+            # Batched mode: the flusher thread inserts and commits alongside other marks
+            attendance_id = attendance_ingest.submit(row).result(timeout=INGEST_RESULT_TIMEOUT)
+        else:
+            inserted = insert_attendance_rows([row], active_only=True)
+            db.session.commit()
+            attendance_id = inserted.get((session.id, student_id))
+
+        if attendance_id is None:
+            # Nothing inserted: either a mark exists or the session closed or expired meanwhile
+            marked = db.session.query(exists().where(
+                Attendance.session_id == session.id, Attendance.student_id == student_id)).scalar()
+            if not marked:
+                return MarkResult(MARK_INVALID_SESSION)
+            return MarkResult(MARK_DUPLICATE)  # Attendance already marked
+        return MarkResult(MARK_PRESENT, attendance_id, distance)
+
+    def bulk_mark_attendance(self, session: AttendanceSession, entries: list[dict]) -> list[dict]:
+        """Validate and insert a batch of offline-collected marks for one session.
+
+        Each entry names a student by student_id or roll_number and carries
+        latitude, longitude, accuracy and captured_at. Students are resolved with
+        one query, distances are checked in one pass and every accepted row is
+        inserted in the same transaction. Returns one result per entry, in order.
+        """
         now = datetime.now(timezone.utc)
-        # Get session without time filter first
-        session = AttendanceSession.query.filter(
-            AttendanceSession.otp == otp,
-            AttendanceSession.status == 'active'
-        ).first()
-        
-        if not session:
-            return None
-        
-        # Handle timezone-naive datetime from SQLite
-        expires_at = session.expires_at
-        if expires_at.tzinfo is None:
-            expires_at = expires_at.replace(tzinfo=timezone.utc)
-        
-        # Check if expired
-        if expires_at <= now:
-            return None
-        
-        return session
+        window_start = as_utc(session.created_at)
+        window_end = as_utc(session.closed_at or session.expires_at)
+
+        # Resolve every referenced student in a single query
+        student_ids, roll_numbers = set(), set()
+        for entry in entries:
+            if entry.get('student_id') is not None:
+                try:
+                    student_ids.add(int(entry['student_id']))
+                except (TypeError, ValueError):
+                    pass
+            if entry.get('roll_number'):
+                roll_numbers.add(str(entry['roll_number']).strip())
+        conditions = []
+        if student_ids:
+            conditions.append(Student.id.in_(student_ids))
+        if roll_numbers:
+            conditions.append(Student.roll_number.in_(roll_numbers))
+        by_id, by_roll = {}, {}
+        if conditions:
+            for student in db.session.query(Student.id, Student.roll_number).filter(or_(*conditions)):
+                by_id[student.id] = student
+                by_roll.setdefault(student.roll_number, student)
+
+        results, pending = [], []
+        for entry in entries:
+            result = {'student_id': None, 'roll_number': entry.get('roll_number'), 'result': None, 'distance': None}
+            results.append(result)
+
+            student = None
+            try:
+                if entry.get('student_id') is not None:
+                    student = by_id.get(int(entry['student_id']))
+                elif entry.get('roll_number'):
+                    student = by_roll.get(str(entry['roll_number']).strip())
+            except (TypeError, ValueError):
+                pass
+            if student is None:
+                result['result'] = MARK_UNKNOWN_STUDENT
+                continue
+            result['student_id'], result['roll_number'] = student.id, student.roll_number
+
+            try:
+                location = {
+                    'latitude': float(entry['latitude']) if entry.get('latitude') is not None else None,
+                    'longitude': float(entry['longitude']) if entry.get('longitude') is not None else None,
+                    'accuracy': float(entry['accuracy']) if entry.get('accuracy') is not None else None,
+                }
+                captured_at = as_utc(datetime.fromisoformat(entry['captured_at'])) if entry.get('captured_at') else now
+            except (TypeError, ValueError):
+                result['result'] = MARK_INVALID
+                continue
+            if not window_start <= captured_at <= window_end:
+                result['result'] = MARK_OUTSIDE_WINDOW
+                continue
+            pending.append((result, location, captured_at))
 
-    def validate_and_mark_attendance(self, otp: str, student_id: int, student_location: dict) -> Attendance | None:
-        """Validate OTP and location, then mark attendance"""
-        session = self.get_session_by_otp(otp)
+        # Geofence every remaining row in one pass
+        checks = check_locations(session, [location for _, location, _ in pending],
+                                 marked_at=[captured_at for _, _, captured_at in pending])
+        rows = []
+        for (result, location, captured_at), (failure, distance) in zip(pending, checks):
+            result['distance'] = round(distance, 2) if distance is not None else None
+            if failure:
+                result['result'] = failure
+                continue
+            rows.append((result, attendance_row(session, result['student_id'], location, distance, marked_at=captured_at)))
 
+        inserted = insert_attendance_rows([row for _, row in rows])
+        db.session.commit()
+        for result, row in rows:
+            # pop() so the same student twice in one upload counts once
+            attendance_id = inserted.pop((row['session_id'], row['student_id']), None)
+            result['result'] = MARK_PRESENT if attendance_id is not None else MARK_DUPLICATE
+        return results
+
+    def update_location(self, session: SessionSnapshot, latitude: float, longitude: float,
+                        accuracy: float | None) -> tuple[SessionSnapshot, bool]:
+        """Record a faculty position fix for an active session.
+
+        The fix goes to the in-memory location trail, which writes fixes out in
+        batches; nothing is committed here. Returns the (possibly updated)
+        snapshot and whether the ping was kept rather than dropped as redundant.
+        """
+        fix = location_trail.record(session.id, latitude, longitude, accuracy)
+        if fix is None:
+            return session, False
+        return session_index.put(session.with_location(fix.latitude, fix.longitude, fix.accuracy, fix.recorded_at)), True
+
+    def revalidate_session(self, session_id: int) -> dict | None:
+        """Re-run the geofence for every present mark in a session against its current faculty position.
+
+        Stored distances are rewritten in one bulk UPDATE. Marks now outside the
+        radius are reported, not removed; the faculty decides what to do with them.
+        Absences written at close have no position and are left out.
+        """
+        session = db.session.get(AttendanceSession, session_id)
         if not session:
-            return None  # Session not found or expired
-
-        # Check if student already marked attendance for this session
-        existing_attendance = Attendance.query.filter_by(
-            session_id=session.id,
-            student_id=student_id
-        ).first()
-        if existing_attendance:
-            return None  # Attendance already marked
-
-        # Validate location if faculty location is available
-        distance = None
-        faculty_has_location = session.faculty_latitude is not None and session.faculty_longitude is not None
-        student_has_location = student_location.get('latitude') is not None and student_location.get('longitude') is not None
-
-        if faculty_has_location:
-            # If faculty has location, student must also provide location
-            if not student_has_location:
-                return None  # Student location required when faculty has location
-            
-            distance = calculate_distance(
-                session.faculty_latitude,
-                session.faculty_longitude,
-                student_location.get('latitude'),
-                student_location.get('longitude')
-            )
+            return None
+        marks = db.session.query(
+            Attendance.id, Attendance.student_id, Attendance.student_latitude,
+            Attendance.student_longitude, Attendance.student_location_accuracy,
+        ).filter(Attendance.session_id == session.id, Attendance.status == 'Present').all()
 
-            if distance is None:
-                return None  # Failed to calculate distance
-            
-            # Get allowed radius (default 100 meters, but can be adjusted based on accuracy)
-            allowed_radius = session.expected_location_radius or 100.0
-            
-            # Optionally add accuracy buffer if both locations have accuracy data
-            if session.faculty_location_accuracy and student_location.get('accuracy'):
-                accuracy_buffer = float(session.faculty_location_accuracy) + float(student_location.get('accuracy'))
-                allowed_radius = max(allowed_radius, accuracy_buffer)
-            
-            if distance > allowed_radius:
-                return None  # Student too far from faculty location
-
-        # Create attendance record
-        attendance = Attendance(
-            student_id=student_id,
-            session_id=session.id,
-            subject=session.subject,
-            faculty_id=session.faculty_id,
-            student_latitude=student_location.get('latitude'),
-            student_longitude=student_location.get('longitude'),
-            student_location_accuracy=student_location.get('accuracy'),
-            distance_from_faculty=distance,
-            status='Present'
+        summary = {'session_code': session.session_code, 'checked': len(marks), 'within': 0,
+                   'outside': [], 'unlocated': 0}
+        # The newest fix may not have been written to the session row yet
+        fix = location_trail.latest(session.id)
+        if fix is not None:
+            faculty_position = (fix.latitude, fix.longitude, fix.accuracy)
+        else:
+            faculty_position = (session.faculty_latitude, session.faculty_longitude, session.faculty_location_accuracy)
+        if faculty_position[0] is None or faculty_position[1] is None or not marks:
+            summary['unlocated'] = len(marks)
+            return summary
+
+        result = geofence.evaluate(
+            [mark.student_latitude for mark in marks],
+            [mark.student_longitude for mark in marks],
+            [mark.student_location_accuracy for mark in marks],
+            *faculty_position,
+            session.expected_location_radius,
         )
-        db.session.add(attendance)
+        updates = []
+        for mark, (distance, within) in zip(marks, result.rows()):
+            updates.append({'id': mark.id, 'distance_from_faculty': distance})
+            if distance is None:
+                summary['unlocated'] += 1
+            elif within:
+                summary['within'] += 1
+            else:
+                summary['outside'].append({'attendance_id': mark.id, 'student_id': mark.student_id,
+                                           'distance': round(distance, 2)})
+        db.session.execute(update(Attendance), updates)
         db.session.commit()
-        return attendance
+        return summary
 
     def close_session(self, session_id: int) -> bool:
         """Close a session"""
-        session = AttendanceSession.query.get(session_id)
+        session = db.session.get(AttendanceSession, session_id)
         if session:
             session.status = 'closed'
             session.closed_at = datetime.now(timezone.utc)
+            insert_absences(session, session.closed_at)
+            session_index.notify(session.id)
+            faculty_stats.touch(session.faculty_id)
             db.session.commit()
+            session_index.discard(session.id)
+            session_expiry.cancel(session.id)
+            otp_pool.release(session.otp)
+            location_trail.drop(session.id)
+            live_feed.end(session.id)
             return True
         return False
 
-    def expire_old_sessions(self) -> int:
-        """Expire sessions that have passed their expiration time"""
+    def expire_old_sessions(self, chunk_size: int = SWEEP_CHUNK_SIZE, time_budget: float | None = None,
+                            dry_run: bool = False, progress=None) -> SweepResult:
+        """Expire every session past its deadline (safety-net sweep behind session_expiry).
+
+        Works through the overdue sessions in id order, chunk_size at a time,
+        committing each chunk, and stops early once time_budget seconds have
+        passed. progress(result) is called after every chunk.
+        """
+        started = time.monotonic()
         now = datetime.now(timezone.utc)
-        expired_sessions = AttendanceSession.query.filter(
-            AttendanceSession.expires_at < now,
-            AttendanceSession.status == 'active'
-        ).all()
+        overdue = (AttendanceSession.status == 'active', AttendanceSession.expires_at <= now)
+        if dry_run:
+            sessions = db.session.query(func.count(AttendanceSession.id)).filter(*overdue).scalar()
+            absences = db.session.query(func.count()).select_from(AttendanceSession).join(
+                Student, Student.division == AttendanceSession.expected_division,
+            ).filter(*overdue, ~exists().where(
+                Attendance.session_id == AttendanceSession.id, Attendance.student_id == Student.id,
+            )).scalar()
+            return SweepResult(sessions, absences, seconds=time.monotonic() - started, dry_run=True)
+
+        return self._sweep(
+            db.session.query(AttendanceSession.id).filter(*overdue),
+            lambda ids: self.expire_sessions(ids) + (0,),
+            chunk_size, time_budget, started, progress,
+        )
+
+    def expire_sessions(self, session_ids: list[int]) -> tuple[int, int]:
+        """Expire the given sessions if they are still active and past their deadline.
+
+        The status flip is a single UPDATE that only matches rows still active
+        and past expires_at, so a session closed or expired meanwhile by
+        another process is left alone. Commits; returns (sessions expired,
+        absence rows written).
+        """
+        now = datetime.now(timezone.utc)
+        stmt = update(AttendanceSession).where(
+            AttendanceSession.id.in_(session_ids),
+            AttendanceSession.status == 'active',
+            AttendanceSession.expires_at <= now
+        ).values(status='expired').execution_options(synchronize_session=False)
+        if db.engine.dialect.update_returning:
+            expired_ids = list(db.session.scalars(stmt.returning(AttendanceSession.id)))
+        else:
+            candidates = db.session.query(AttendanceSession.id).filter(stmt.whereclause).all()
+            expired_ids = [session_id for (session_id,) in candidates]
+            db.session.execute(stmt.where(AttendanceSession.id.in_(expired_ids)))
+        if not expired_ids:
+            db.session.commit()
+            return 0, 0
+
+        absences = 0
+        expired_sessions = AttendanceSession.query.filter(AttendanceSession.id.in_(expired_ids)).all()
         for session in expired_sessions:
-            session.status = 'expired'
+            absences += insert_absences(session, session.expires_at)
+            session_index.notify(session.id)
+            faculty_stats.touch(session.faculty_id)
         db.session.commit()
-        return len(expired_sessions)
+        for session in expired_sessions:
+            session_index.discard(session.id)
+            session_expiry.cancel(session.id)
+            otp_pool.release(session.otp)
+            location_trail.drop(session.id)
+            live_feed.end(session.id)
+        return len(expired_sessions), absences
 
-    def delete_old_sessions(self, older_than_days: int = 7) -> int:
-        """Delete old sessions that are closed or expired"""
-        now = datetime.now(timezone.utc)
-        threshold_date = now - timedelta(days=older_than_days)
-
-        # Find sessions that are either closed or expired and are older than the threshold
-        old_sessions = AttendanceSession.query.filter(
-            AttendanceSession.status.in_(['closed', 'expired']),
-            AttendanceSession.expires_at < threshold_date
-        ).all()
-
-        deleted_count = 0
-        for session in old_sessions:
-            # Also delete associated attendance records to maintain data integrity
-            Attendance.query.filter_by(session_id=session.id).delete()
-            db.session.delete(session)
-            deleted_count += 1
+    def delete_old_sessions(self, older_than_days: int = 7, chunk_size: int = SWEEP_CHUNK_SIZE,
+                            time_budget: float | None = None, dry_run: bool = False, progress=None,
+                            archive_first: bool = True) -> SweepResult:
+        """Move closed or expired sessions older than the threshold out of the hot tables.
+
+        Each session is copied with its attendance and trail into the archive
+        (app/utils/archive.py), or dropped for good if archive_first is False.
+        Bulk DELETEs per chunk of chunk_size sessions in id order, each chunk
+        its own transaction, so locks on attendance are held briefly; stops
+        early once time_budget seconds have passed.
+        """
+        started = time.monotonic()
+        threshold_date = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        old = (AttendanceSession.status.in_(['closed', 'expired']), AttendanceSession.expires_at < threshold_date)
+        if dry_run:
+            old_ids = db.session.query(AttendanceSession.id).filter(*old)
+            return SweepResult(
+                old_ids.count(),
+                db.session.query(func.count(Attendance.id)).filter(Attendance.session_id.in_(old_ids)).scalar(),
+                db.session.query(func.count(SessionLocation.id)).filter(SessionLocation.session_id.in_(old_ids)).scalar(),
+                seconds=time.monotonic() - started, dry_run=True,
+            )
+
+        return self._sweep(
+            db.session.query(AttendanceSession.id).filter(*old),
+            lambda ids: self._delete_sessions(ids, archive_first), chunk_size, time_budget, started, progress,
+        )
+
+    def _delete_sessions(self, session_ids: list[int], archive_first: bool = False) -> tuple[int, int, int]:
+        """Delete sessions with their attendance (out of the rollup) and location trail; commits.
+
+        With archive_first they are copied into the archive in the same transaction.
+        """
+        if archive_first:
+            archive.archive_sessions(session_ids)
+        faculty_ids = {faculty_id for (faculty_id,) in db.session.query(AttendanceSession.faculty_id).filter(
+            AttendanceSession.id.in_(session_ids)).distinct()}
+        rollup.remove(Attendance.session_id.in_(session_ids))
+        options = {'synchronize_session': False}
+        locations = db.session.execute(
+            delete(SessionLocation).where(SessionLocation.session_id.in_(session_ids)).execution_options(**options)
+        ).rowcount
+        attendance = db.session.execute(
+            delete(Attendance).where(Attendance.session_id.in_(session_ids)).execution_options(**options)
+        ).rowcount
+        sessions = db.session.execute(
+            delete(AttendanceSession).where(AttendanceSession.id.in_(session_ids)).execution_options(**options)
+        ).rowcount
+        for faculty_id in faculty_ids:
+            faculty_stats.touch(faculty_id)
         db.session.commit()
-        return deleted_count
+        return sessions, attendance, locations
+
+    def _sweep(self, ids_query, handle, chunk_size, time_budget, started, progress) -> SweepResult:
+        """Keyset-walk the session ids of `ids_query`, passing each chunk to `handle`"""
+        result = SweepResult()
+        last_id = 0
+        while True:
+            ids = [session_id for (session_id,) in ids_query.filter(AttendanceSession.id > last_id)
+                   .order_by(AttendanceSession.id).limit(chunk_size)]
+            if not ids:
+                break
+            last_id = ids[-1]
+            sessions, attendance, locations = handle(ids)
+            result = result._replace(
+                sessions=result.sessions + sessions,
+                attendance=result.attendance + attendance,
+                locations=result.locations + locations,
+                chunks=result.chunks + 1,
+                seconds=time.monotonic() - started,
+            )
+            if progress is not None:
+                progress(result)
+            if len(ids) < chunk_size:
+                break
+            if time_budget is not None and result.seconds >= time_budget:
+                return result._replace(complete=False)
+        return result._replace(seconds=time.monotonic() - started)
 
     def get_session_statistics(self, faculty_id: int, start_date: datetime, end_date: datetime) -> dict:
-        """Get session statistics for a faculty member"""
-        total_sessions = AttendanceSession.query.filter(
-            AttendanceSession.faculty_id == faculty_id,
-            AttendanceSession.created_at >= start_date,
-            AttendanceSession.created_at <= end_date
-        ).count()
+        """Get session statistics for a faculty member (whole days, from the /faculty/stats aggregate).
 
-        active_sessions = AttendanceSession.query.filter(
+        Attendance counts Present marks only, not the absences written at close;
+        active_sessions is every session of the faculty active now, whatever the window.
+        """
+        totals = faculty_stats.get(faculty_id, start_date.date(), end_date.date() + timedelta(days=1))['totals']
+        active_sessions = db.session.query(func.count(AttendanceSession.id)).filter(
             AttendanceSession.faculty_id == faculty_id,
             AttendanceSession.status == 'active'
-        ).count()
-
-        total_attendance_records = db.session.query(Attendance).join(AttendanceSession).filter(
-            AttendanceSession.faculty_id == faculty_id,
-            Attendance.marked_at >= start_date,
-            Attendance.marked_at <= end_date
-        ).count()
-
-        # Calculate average students per session (avoid division by zero)
-        average_per_session = total_attendance_records / total_sessions if total_sessions else 0
-
+        ).scalar()
         return {
-            'total_sessions': total_sessions,
+            'total_sessions': totals['sessions'],
             'active_sessions': active_sessions,
-            'total_attendance': total_attendance_records,
-            'average_per_session': round(average_per_session, 2)
+            'total_attendance': totals['present'],
+            'average_per_session': totals['average_present_per_session']
         }
-
@@ -0,0 +1,242 @@
+import itertools
+import math
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Iterable, Sequence
+
+# Excel's last row; further rows spill onto a new sheet that repeats the header
+MAX_SHEET_ROWS = 1048576
+
+# Rows serialized per write into the zip entry (and per yielded chunk)
+CHUNK_ROWS = 2000
+
+# Distinct strings/dates whose cell XML is memoized per workbook; report
+# columns repeat the same names, subjects, statuses and days
+CELL_CACHE_SIZE = 50000
+
+# Day 0 of Excel's 1900 date system, as a proleptic ordinal
+_EPOCH_ORDINAL = date(1899, 12, 30).toordinal()
+
+# Characters that need escaping, plus control characters XML 1.0 does not allow at all
+_SPECIAL = re.compile('[&<>\x00-\x08\x0b\x0c\x0e-\x1f]')
+_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# cellXfs indexes in STYLES_XML
+_STYLE_DATE = 1
+_STYLE_DATETIME = 2
+_STYLE_HEADER = 3
+
+MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+# Every .xml part defaults to worksheet so sheets can be added without knowing their count up front
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<Relationships xmlns="{_PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<styleSheet xmlns="{_MAIN_NS}">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+class _Sink:
+    """Write-only file object collecting what zipfile writes until it is drained"""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _text(value: str, attrs: str = '') -> str:
+    if _SPECIAL.search(value):
+        value = _ILLEGAL.sub('', value).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if value != value.strip():
+        return f'<c t="inlineStr"{attrs}><is><t xml:space="preserve">{value}</t></is></c>'
+    return f'<c t="inlineStr"{attrs}><is><t>{value}</t></is></c>'
+
+
+def _cell(value) -> str:
+    """One <c> element; dates become serial numbers with a date style"""
+    if value is None:
+        return '<c/>'
+    if isinstance(value, str):
+        return _text(value)
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None)
+        seconds = value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6
+        return f'<c s="{_STYLE_DATETIME}"><v>{value.toordinal() - _EPOCH_ORDINAL + seconds / 86400!r}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="{_STYLE_DATE}"><v>{value.toordinal() - _EPOCH_ORDINAL}</v></c>'
+    if isinstance(value, (int, float)) and not (isinstance(value, float) and not math.isfinite(value)):
+        return f'<c><v>{value!r}</v></c>'
+    return _text(str(value))
+
+
+_MEMO_TYPES = (str, date, type(None))
+
+_END = object()
+
+
+class RowWriter:
+    """Serializes rows of Python values, reusing the XML of repeated cells"""
+
+    def __init__(self, cache_size: int = CELL_CACHE_SIZE):
+        self._cache = {}
+        self._cache_size = cache_size
+
+    def __call__(self, values: Sequence) -> str:
+        cells = list(map(self._cache.get, values))
+        if None in cells:
+            for i, cell in enumerate(cells):
+                if cell is None:
+                    cells[i] = self._cell(values[i])
+        return '<row>' + ''.join(cells) + '</row>'
+
+    def _cell(self, value) -> str:
+        cell = _cell(value)
+        # Only str/date/None are memoized, so 1, 1.0 and True never share an entry
+        if type(value) in _MEMO_TYPES:
+            if len(self._cache) >= self._cache_size:
+                self._cache.clear()
+            self._cache[value] = cell
+        return cell
+
+
+def _sheet_head(headers, widths) -> str:
+    cols = ''
+    if widths:
+        cols = '<cols>' + ''.join(
+            f'<col min="{i}" max="{i}" width="{width}" customWidth="1"/>'
+            for i, width in enumerate(widths, 1)) + '</cols>'
+    header = '<row>' + ''.join(_text(str(h), f' s="{_STYLE_HEADER}"') for h in headers) + '</row>'
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<worksheet xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+        # Header row frozen in place while scrolling
+        '<sheetViews><sheetView workbookViewId="0">'
+        '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+        '</sheetView></sheetViews>'
+        f'{cols}<sheetData>{header}'
+    )
+
+
+def _workbook_parts(sheet_names):
+    workbook = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>'
+        + ''.join(f'<sheet name="{name}" sheetId="{i}" r:id="rId{i}"/>' for i, name in enumerate(sheet_names, 1))
+        + '</sheets></workbook>'
+    )
+    count = len(sheet_names)
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{_PKG_REL_NS}">'
+        + ''.join(f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                  for i in range(1, count + 1))
+        + f'<Relationship Id="rId{count + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+        + '</Relationships>'
+    )
+    return workbook, rels
+
+
+def stream_xlsx(headers: Sequence[str], rows: Iterable[Sequence], sheet_name: str = 'Sheet',
+                widths: Sequence[float] | None = None, chunk_rows: int = CHUNK_ROWS,
+                compresslevel: int = 1):
+    """Yield the bytes of an .xlsx workbook as the rows are consumed.
+
+    Rows are serialized straight into a deflated zip entry and the zip
+    output is handed out every `chunk_rows` rows, so memory is bounded by
+    one chunk. Cells may be str, int, float, bool, date, datetime or None;
+    dates get a date format. Strings are written inline (no shared string
+    table) and the header row is bold and frozen. Past Excel's row limit the
+    rows continue on another sheet.
+    """
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+    archive.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+    archive.writestr('_rels/.rels', ROOT_RELS_XML)
+    archive.writestr('xl/styles.xml', STYLES_XML)
+    yield sink.drain()
+
+    sheet_names = []
+    head = _sheet_head(headers, widths)
+    row_xml = RowWriter()
+    rows = iter(rows)
+    while True:
+        sheet_names.append(f'{sheet_name}{len(sheet_names) + 1}' if sheet_names else sheet_name)
+        full = False
+        with archive.open(f'xl/worksheets/sheet{len(sheet_names)}.xml', 'w') as entry:
+            entry.write(head.encode('utf-8'))
+            room = MAX_SHEET_ROWS - 1
+            buffer = []
+            for values in rows:
+                buffer.append(row_xml(values))
+                room -= 1
+                if len(buffer) >= chunk_rows or not room:
+                    entry.write(''.join(buffer).encode('utf-8'))
+                    buffer = []
+                    yield sink.drain()
+                    if not room:
+                        full = True
+                        break
+            entry.write((''.join(buffer) + '</sheetData></worksheet>').encode('utf-8'))
+        yield sink.drain()
+        # Only start another sheet if a row is actually left over
+        following = next(rows, _END) if full else _END
+        if following is _END:
+            break
+        rows = itertools.chain([following], rows)
+
+    workbook, rels = _workbook_parts(sheet_names)
+    archive.writestr('xl/workbook.xml', workbook)
+    archive.writestr('xl/_rels/workbook.xml.rels', rels)
+    archive.close()
+    yield sink.drain()
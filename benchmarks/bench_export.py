@@ -0,0 +1,151 @@
+"""Memory and time to first byte of the streamed report exports.
+
+Seeds --rows synthetic attendance records, then downloads
+GET /faculty/export_reports as CSV (plain and gzip) and as .xlsx, and
+reports time to first byte, total time, bytes and peak Python heap / RSS
+growth while each body is consumed.
+--buffered also runs the old approach (query.all() into one StringIO) for
+comparison. Runs against a throwaway SQLite database unless DATABASE_URL is
+set:
+
+    python benchmarks/bench_export.py --rows 1000000 --buffered
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + tempfile.mktemp(suffix='.db')
+
+from app import create_app, db  # noqa: E402
+from app.models import Attendance, Faculty, Student  # noqa: E402
+from app.utils import hash_password, reports  # noqa: E402
+
+STUDENTS = 1000
+SUBJECTS = ['Maths', 'Physics', 'Chemistry', 'Networks', 'Compilers']
+
+
+def rss_kb():
+    """Current resident set size (Linux), 0 where /proc is unavailable"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def seed(rows):
+    password = hash_password('bench')
+    faculty = Faculty(full_name='Bench Faculty', email='bench-faculty@example.com', password=password)
+    db.session.add(faculty)
+    db.session.add_all([
+        Student(full_name=f'Student {i}', roll_number=f'E{i:05d}', division='AB'[i % 2],
+                mobile_number='0000000000', email=f'export-{i}@example.com', password=password)
+        for i in range(STUDENTS)
+    ])
+    db.session.commit()
+    student_ids = [sid for (sid,) in db.session.query(Student.id).order_by(Student.id)]
+    start = date(2024, 1, 1)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            'student_id': student_ids[i % STUDENTS],
+            'subject': SUBJECTS[i % len(SUBJECTS)],
+            'date': start + timedelta(days=(i // STUDENTS) % 365),
+            'status': 'Present' if i % 7 else 'Absent',
+            'faculty_id': faculty.id,
+        })
+        if len(batch) == 20000:
+            db.session.execute(Attendance.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Attendance.__table__.insert(), batch)
+    db.session.commit()
+
+
+def measure(label, produce):
+    """Consume the chunks from `produce()` and print time/memory figures"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    rss_before = rss_kb()
+    rss_peak = rss_before
+    size, first_byte = 0, None
+    start = time.perf_counter()
+    for count, chunk in enumerate(produce()):
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+        if count % 50 == 0:
+            rss_peak = max(rss_peak, rss_kb())
+    elapsed = time.perf_counter() - start
+    rss_peak = max(rss_peak, rss_kb())
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<24} first byte {first_byte * 1000:8.1f} ms  total {elapsed:6.2f} s  '
+          f'{size / 1e6:7.1f} MB  heap peak {heap_peak / 1e6:7.1f} MB  RSS +{(rss_peak - rss_before) / 1024:6.1f} MB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--buffered', action='store_true', help='also time the old all-in-memory export')
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        seed(args.rows)
+        print(f'seeded {args.rows} rows in {time.perf_counter() - start:.1f} s')
+
+    res = client.post('/faculty/login', json={'email': 'bench-faculty@example.com', 'password': 'bench'})
+    headers = {'Authorization': f"Bearer {res.get_json()['access_token']}"}
+
+    def streamed(accept_encoding, fmt='csv'):
+        def produce():
+            res = client.get(f'/faculty/export_reports?format={fmt}', buffered=False,
+                             headers={**headers, 'Accept-Encoding': accept_encoding})
+            try:
+                yield from res.response
+            finally:
+                res.close()
+        return produce
+
+    if args.buffered:
+        def buffered():
+            with app.app_context():
+                output = io.StringIO()
+                writer = csv.writer(output)
+                writer.writerow(reports.REPORT_HEADERS)
+                for row in reports.report_query(reports.report_filters({})).all():
+                    writer.writerow(reports.report_cells(row))
+                yield output.getvalue().encode('utf-8')
+        measure('buffered (old)', buffered)
+
+    measure('streamed', streamed('identity'))
+    measure('streamed, gzip', streamed('gzip'))
+    measure('streamed xlsx', streamed('identity', 'xlsx'))
+
+    # The gzip body must decode to exactly the plain one
+    plain = b''.join(streamed('identity')())
+    packed = b''.join(streamed('gzip')())
+    assert zlib.decompress(packed, 16 + zlib.MAX_WBITS) == plain, 'gzip body differs from plain body'
+    assert plain.count(b'\n') == args.rows + 1, 'row count mismatch'
+    print(f'gzip ratio {len(packed) / len(plain):.2f}, {args.rows} rows verified')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Geofence throughput: scalar per-mark loop vs the batch engine.
+
+Evaluates --points random student positions around one faculty position
+(single session) and around per-point faculty positions (semester audit):
+
+    python benchmarks/bench_geofence.py --points 1000000
+
+The numpy rows are skipped when numpy is not installed.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.utils import geofence  # noqa: E402
+from app.utils.session_manager import calculate_distance  # noqa: E402
+
+BASE_LAT, BASE_LON = 18.5204, 73.8567
+
+
+def timed(label, points, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<46} {elapsed * 1000:9.1f} ms  {points / elapsed / 1e6:7.2f} M points/s')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    n = args.points
+    # ~1 km box around the faculty, so roughly a tenth of points fall inside 100 m
+    lats = [BASE_LAT + rng.uniform(-0.005, 0.005) for _ in range(n)]
+    lons = [BASE_LON + rng.uniform(-0.005, 0.005) for _ in range(n)]
+    accs = [rng.uniform(5, 40) for _ in range(n)]
+    faculty_lats = [BASE_LAT + rng.uniform(-0.001, 0.001) for _ in range(n)]
+    faculty_lons = [BASE_LON + rng.uniform(-0.001, 0.001) for _ in range(n)]
+
+    print(f'{n} points')
+    timed('scalar calculate_distance loop', n,
+          lambda: [calculate_distance(BASE_LAT, BASE_LON, lat, lon) for lat, lon in zip(lats, lons)])
+
+    scenarios = [
+        ('one session', (BASE_LAT, BASE_LON, 15.0, 100.0)),
+        ('per-point faculty (audit)', (faculty_lats, faculty_lons, 15.0, 100.0)),
+    ]
+    for name, (f_lat, f_lon, f_acc, radius) in scenarios:
+        python = timed(f'pure Python, {name}', n, lambda: geofence.evaluate(
+            lats, lons, accs, f_lat, f_lon, f_acc, radius, use_numpy=False))
+        if geofence.np is None:
+            continue
+        arrays = [geofence.np.asarray(v, dtype=geofence.np.float64) if isinstance(v, list) else v
+                  for v in (lats, lons, accs, f_lat, f_lon)]
+        timed(f'numpy from lists, {name}', n, lambda: geofence.evaluate(
+            lats, lons, accs, f_lat, f_lon, f_acc, radius, use_numpy=True))
+        vectorized = timed(f'numpy from arrays, {name}', n, lambda: geofence.evaluate(
+            *arrays, f_acc, radius, use_numpy=True))
+
+        # Both engines must agree on every verdict
+        mismatches = sum(1 for a, b in zip(python.within, vectorized.within.tolist()) if a != b)
+        max_error = float(geofence.np.max(geofence.np.abs(
+            geofence.np.asarray(python.distances) - vectorized.distances)))
+        print(f'  verdict mismatches: {mismatches}, max distance difference: {max_error:.2e} m')
+
+
+if __name__ == '__main__':
+    main()
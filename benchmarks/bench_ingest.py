@@ -0,0 +1,91 @@
+"""Commits/sec for per-request commits vs the batched write-behind ingest queue.
+
+Marks are submitted straight to SessionManager from a thread pool, so the
+numbers isolate the write path from HTTP and JWT overhead:
+
+    python benchmarks/bench_ingest.py --students 2000 --threads 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + tempfile.mktemp(suffix='.db')
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Faculty, Student  # noqa: E402
+from app.utils.attendance_ingest import attendance_ingest  # noqa: E402
+from app.utils.session_manager import SessionManager, MARK_PRESENT  # noqa: E402
+
+
+def run(app, manager, session, student_ids, threads):
+    location = {'latitude': 18.5201, 'longitude': 73.8501, 'accuracy': 5}
+
+    def mark(student_id):
+        with app.app_context():
+            return manager.validate_and_mark_attendance(session.otp, student_id, location, session=session)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(mark, student_ids))
+    elapsed = time.perf_counter() - start
+    present = sum(1 for r in results if r.status == MARK_PRESENT)
+    return present, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args()
+
+    app = create_app()
+    manager = SessionManager()
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Faculty(full_name=f'Bench Faculty {i}', email=f'bench-faculty-{i}@example.com', password='x')
+            for i in range(2)
+        ])
+        db.session.add_all([
+            Student(full_name=f'Student {i}', roll_number=f'B{i:05d}', division='A',
+                    mobile_number='0000000000', email=f'bench-{i}@example.com', password='x')
+            for i in range(args.students)
+        ])
+        db.session.commit()
+        student_ids = [s.id for s in Student.query.order_by(Student.id).all()]
+        faculty_ids = [f.id for f in Faculty.query.order_by(Faculty.id).all()]
+        location = {'latitude': 18.52, 'longitude': 73.85, 'accuracy': 10}
+        for faculty_id in faculty_ids:
+            manager.create_session(faculty_id, 'Bench', location, 30)
+        sessions = [manager.get_active_session(faculty_id) for faculty_id in faculty_ids]
+        engine = db.engine
+
+    commits = {'n': 0}
+    lock = threading.Lock()
+
+    @event.listens_for(engine, 'commit')
+    def count_commit(_):
+        with lock:
+            commits['n'] += 1
+
+    for label, batched, session in (('per-request', False, sessions[0]), ('batched', True, sessions[1])):
+        attendance_ingest.enabled = batched
+        commits['n'] = 0
+        present, elapsed = run(app, manager, session, student_ids, args.threads)
+        print(f"{label:>12}: {present} marks in {elapsed:.2f}s, "
+              f"{present / elapsed:.0f} marks/s, {commits['n']} commits "
+              f"({commits['n'] / elapsed:.0f} commits/s, {present / max(commits['n'], 1):.1f} marks/commit)")
+    attendance_ingest.shutdown()
+
+
+if __name__ == '__main__':
+    main()
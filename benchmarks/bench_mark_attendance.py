@@ -0,0 +1,82 @@
+"""Per-mark query count and latency for POST /student/mark_attendance.
+
+Runs against a throwaway SQLite database unless DATABASE_URL is set:
+
+    python benchmarks/bench_mark_attendance.py --students 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + tempfile.mktemp(suffix='.db')
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Faculty, Student  # noqa: E402
+from app.utils import hash_password  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=300)
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        password = hash_password('bench')
+        faculty = Faculty(full_name='Bench Faculty', email='bench-faculty@example.com', password=password)
+        db.session.add(faculty)
+        db.session.add_all([
+            Student(full_name=f'Student {i}', roll_number=f'B{i:05d}', division='A',
+                    mobile_number='0000000000', email=f'bench-{i}@example.com', password=password)
+            for i in range(args.students)
+        ])
+        db.session.commit()
+        engine = db.engine
+
+    res = client.post('/faculty/login', json={'email': 'bench-faculty@example.com', 'password': 'bench'})
+    faculty_headers = {'Authorization': f"Bearer {res.get_json()['access_token']}"}
+    res = client.post('/faculty/start_session', headers=faculty_headers, json={
+        'subject': 'Bench', 'location': {'latitude': 18.52, 'longitude': 73.85, 'accuracy': 10},
+        'expires_in_minutes': 30,
+    })
+    otp = res.get_json()['otp']
+
+    student_headers = []
+    for i in range(args.students):
+        res = client.post('/student/login', json={'roll_number': f'B{i:05d}', 'password': 'bench'})
+        student_headers.append({'Authorization': f"Bearer {res.get_json()['access_token']}"})
+
+    counter = {'n': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(*_):
+        counter['n'] += 1
+
+    body = {'otp': otp, 'subject': 'Bench', 'latitude': 18.5201, 'longitude': 73.8501, 'accuracy': 5}
+    for label in ('first mark', 'duplicate'):
+        queries, latencies = [], []
+        for headers in student_headers:
+            counter['n'] = 0
+            start = time.perf_counter()
+            res = client.post('/student/mark_attendance', headers=headers, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(counter['n'])
+        latencies.sort()
+        print(f"{label:>10}: status {res.status_code}, "
+              f"queries/mark {statistics.mean(queries):.2f}, "
+              f"p50 {latencies[len(latencies) // 2]:.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""OTP allocation time as the attendance_session table grows.
+
+Seeds closed historical sessions in steps up to 50k and times
+create_session/close_session cycles at each size:
+
+    python benchmarks/bench_otp_allocation.py --history 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + tempfile.mktemp(suffix='.db')
+
+from app import create_app, db  # noqa: E402
+from app.models import AttendanceSession, Faculty  # noqa: E402
+from app.utils.session_manager import SessionManager  # noqa: E402
+
+
+def add_history(count, offset):
+    """Insert `count` closed sessions whose OTPs cover the whole 4-digit space"""
+    if count <= 0:
+        return
+    now = datetime.now(timezone.utc)
+    rows = [{
+        'session_code': f'H{offset + i:09d}',
+        'otp': f'{(offset + i) % 10000:04d}',
+        'faculty_id': 1,
+        'subject': 'History',
+        'status': 'closed',
+        'created_at': now - timedelta(days=1),
+        'expires_at': now - timedelta(days=1),
+        'closed_at': now - timedelta(days=1),
+    } for i in range(count)]
+    db.session.execute(AttendanceSession.__table__.insert(), rows)
+    db.session.commit()
+
+
+def legacy_probes(limit=1000):
+    """How many lookups the old random-probe generator needs to find an unused code"""
+    for probes in range(1, limit + 1):
+        otp = f'{random.randrange(10000):04d}'
+        if not AttendanceSession.query.filter_by(otp=otp).first():
+            return probes
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--history', type=int, default=50000)
+    parser.add_argument('--cycles', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app()
+    manager = SessionManager()
+    location = {'latitude': 18.52, 'longitude': 73.85, 'accuracy': 10}
+    with app.app_context():
+        db.create_all()
+        db.session.add(Faculty(full_name='Bench Faculty', email='bench-faculty@example.com', password='x'))
+        db.session.commit()
+
+        seeded = 0
+        for target in sorted({0, 10000, args.history // 2, args.history}):
+            add_history(target - seeded, seeded)
+            seeded = target
+
+            start = time.perf_counter()
+            for _ in range(args.cycles):
+                session = manager.create_session(1, 'Bench', location, 5)
+                manager.close_session(session.id)
+            per_cycle = (time.perf_counter() - start) / args.cycles * 1000
+
+            probes = legacy_probes()
+            legacy = f'{probes} probes' if probes else 'no free code after 1000 probes'
+            print(f"{seeded:>7} historical sessions: {per_cycle:.2f} ms per create+close; "
+                  f"legacy generator: {legacy}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Class-start burst load test for the attendance flow.
+
+Seeds faculty and students through the models, logs everyone in, starts one
+session per faculty via /faculty/start_session and then fires
+/student/mark_attendance on an arrival curve with bounded concurrency.
+
+In-process against the Flask test client (SQLite temp database by default):
+
+    python benchmarks/load_test.py --students 300 --duration 20
+
+Against a running server sharing the same database (start it with
+SQL_QUERY_COUNT_HEADER=1 to get per-request query counts):
+
+    DATABASE_URL=sqlite:////tmp/load.db SQL_QUERY_COUNT_HEADER=1 gunicorn -w 4 run:app
+    DATABASE_URL=sqlite:////tmp/load.db python benchmarks/load_test.py --url http://127.0.0.1:8000
+"""
+import argparse
+import json
+import os
+import random
+import secrets
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Base coordinates for every session; students are scattered within ~30 m
+BASE_LAT, BASE_LON = 18.5204, 73.8567
+
+
+def arrival_offsets(count: int, duration: float, curve: str, rng: random.Random) -> list[float]:
+    """Seconds after start at which each of `count` students submits"""
+    if count == 0:
+        return []
+    if curve == 'poisson':
+        gaps = [rng.expovariate(1.0) for _ in range(count)]
+        scale = duration / sum(gaps)
+        offsets, t = [], 0.0
+        for gap in gaps:
+            t += gap * scale
+            offsets.append(t)
+        return offsets
+    fractions = [i / count for i in range(count)]
+    if curve == 'ramp':
+        # Arrival rate grows linearly over the window
+        return [duration * f ** 0.5 for f in fractions]
+    if curve == 'front':
+        # Most of the class submits right after the OTP is read out
+        return [duration * f ** 2 for f in fractions]
+    return [duration * f for f in fractions]
+
+
+class TestClientTransport:
+    """Issue requests through Flask test clients (one per thread)"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, token=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        res = client.open(path, method=method, json=body, headers=headers)
+        return res.status_code, res.get_json(silent=True) or {}, res.headers.get('X-Query-Count')
+
+
+class HttpTransport:
+    """Issue requests to a live server with urllib"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=60) as res:
+                return res.status, json.loads(res.read() or b'{}'), res.headers.get('X-Query-Count')
+        except urllib.error.HTTPError as e:
+            payload = e.read()
+            try:
+                payload = json.loads(payload or b'{}')
+            except ValueError:
+                payload = {}
+            return e.code, payload, e.headers.get('X-Query-Count')
+
+
+def seed(app, run_id, faculty_count, student_count):
+    """Create faculty and students directly through the models"""
+    from app import db
+    from app.models import Faculty, Student
+    from app.utils import hash_password
+
+    with app.app_context():
+        db.create_all()
+        # One hash for everyone: seeding speed matters more than realism here
+        password = hash_password('loadtest')
+        db.session.add_all([
+            Faculty(full_name=f'Load Faculty {i}', email=f'lt-{run_id}-f{i}@example.com', password=password)
+            for i in range(faculty_count)
+        ])
+        db.session.add_all([
+            Student(full_name=f'Load Student {i}', roll_number=f'LT{run_id}{i:05d}', division=f'D{i % 4}',
+                    mobile_number='0000000000', email=f'lt-{run_id}-s{i}@example.com', password=password)
+            for i in range(student_count)
+        ])
+        db.session.commit()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process test client)')
+    parser.add_argument('--faculty', type=int, default=1, help='Concurrent sessions')
+    parser.add_argument('--students', type=int, default=300)
+    parser.add_argument('--duration', type=float, default=20.0, help='Arrival window in seconds')
+    parser.add_argument('--curve', choices=['uniform', 'ramp', 'front', 'poisson'], default='uniform')
+    parser.add_argument('--concurrency', type=int, default=50, help='Max in-flight requests')
+    parser.add_argument('--duplicates', type=float, default=0.0, help='Fraction of students who submit twice')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    if not args.url:
+        os.environ.setdefault('DATABASE_URL', 'sqlite:///' + tempfile.mktemp(suffix='.db'))
+        os.environ['SQL_QUERY_COUNT_HEADER'] = '1'
+
+    from app import create_app
+
+    rng = random.Random(args.seed)
+    run_id = secrets.token_hex(3)
+    app = create_app()
+    seed(app, run_id, args.faculty, args.students)
+    transport = HttpTransport(args.url) if args.url else TestClientTransport(app)
+
+    # Log everyone in and start one session per faculty
+    sessions = []
+    for i in range(args.faculty):
+        status, body, _ = transport.request('POST', '/faculty/login', {
+            'email': f'lt-{run_id}-f{i}@example.com', 'password': 'loadtest'})
+        if status != 200:
+            sys.exit(f'Faculty login failed: {status} {body}')
+        status, body, _ = transport.request('POST', '/faculty/start_session', {
+            'subject': f'Load Subject {i}',
+            'location': {'latitude': BASE_LAT, 'longitude': BASE_LON, 'accuracy': 15},
+            'expires_in_minutes': max(5, int(args.duration / 60) + 5),
+        }, token=body['access_token'])
+        if status != 200:
+            sys.exit(f'start_session failed: {status} {body}')
+        sessions.append({'otp': body['otp'], 'subject': body['subject']})
+
+    def login_student(i):
+        status, body, _ = transport.request('POST', '/student/login', {
+            'roll_number': f'LT{run_id}{i:05d}', 'password': 'loadtest'})
+        return body.get('access_token') if status == 200 else None
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        tokens = list(pool.map(login_student, range(args.students)))
+    if not all(tokens):
+        sys.exit('Some student logins failed')
+
+    jobs = []
+    for i, token in enumerate(tokens):
+        session = sessions[i % len(sessions)]
+        body = {
+            'otp': session['otp'],
+            'subject': session['subject'],
+            'latitude': BASE_LAT + rng.uniform(-0.0002, 0.0002),
+            'longitude': BASE_LON + rng.uniform(-0.0002, 0.0002),
+            'accuracy': rng.uniform(5, 25),
+        }
+        jobs.append((token, body))
+        if rng.random() < args.duplicates:
+            jobs.append((token, body))
+    rng.shuffle(jobs)
+    offsets = arrival_offsets(len(jobs), args.duration, args.curve, rng)
+
+    samples = []
+    lock = threading.Lock()
+
+    def fire(job, scheduled):
+        token, body = job
+        started = time.perf_counter()
+        try:
+            status, payload, query_count = transport.request('POST', '/student/mark_attendance', body, token=token)
+            error = None if status == 200 else f"{status} {payload.get('message', '')}".strip()
+        except Exception as e:
+            status, query_count, error = None, None, type(e).__name__
+        finished = time.perf_counter()
+        with lock:
+            samples.append({
+                'latency': finished - started,
+                'lag': started - scheduled,
+                'error': error,
+                'queries': int(query_count) if query_count is not None else None,
+            })
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for job, offset in zip(jobs, offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, job, start + offset)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(s['latency'] * 1000 for s in samples)
+    queries = [s['queries'] for s in samples if s['queries'] is not None]
+    report = {
+        'target': args.url or 'test-client',
+        'requests': len(samples),
+        'curve': args.curve,
+        'duration_s': round(elapsed, 2),
+        'throughput_rps': round(len(samples) / elapsed, 1),
+        'ok': sum(1 for s in samples if s['error'] is None),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(latencies[-1], 2) if latencies else 0.0,
+        },
+        # How late requests left the client; large values mean the harness itself saturated
+        'dispatch_lag_ms_p99': round(percentile(sorted(s['lag'] * 1000 for s in samples), 99), 2),
+        'errors': dict(Counter(s['error'] for s in samples if s['error'])),
+        'queries_per_request': {
+            'mean': round(statistics.mean(queries), 2),
+            'max': max(queries),
+        } if queries else None,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['requests']} marks against {report['target']} ({args.curve}, {args.concurrency} concurrent) "
+          f"in {report['duration_s']}s: {report['throughput_rps']} req/s, {report['ok']} ok")
+    lat = report['latency_ms']
+    print(f"latency ms: p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}  "
+          f"(dispatch lag p99 {report['dispatch_lag_ms_p99']})")
+    if report['queries_per_request']:
+        print(f"queries/request: mean {report['queries_per_request']['mean']}  max {report['queries_per_request']['max']}")
+    for error, count in sorted(report['errors'].items(), key=lambda item: -item[1]):
+        print(f"  {count:6d}  {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+# gunicorn settings, read from the working directory by `gunicorn run:app`
+import os
+
+# A live feed (SSE) holds a worker thread for as long as it is open, so workers are
+# threaded with room for LIVE_FEED_MAX_CONNECTIONS streams plus ordinary requests;
+# GUNICORN_THREADS can raise it. Worker processes: WEB_CONCURRENCY (gunicorn's own)
+_live_feeds = int(os.environ.get('LIVE_FEED_MAX_CONNECTIONS', 50))
+worker_class = 'gthread'
+threads = max(int(os.environ.get('GUNICORN_THREADS', 0)), _live_feeds + 8)
+
+
+def post_worker_init(worker):
+    # Each worker starts its background threads once it has imported run:app
+    from run import start_background_work
+    start_background_work()
@@ -0,0 +1,43 @@
+"""OTP unique among active sessions only
+
+Revision ID: 2211d23ac9db
+Revises: d3629796a4e4
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2211d23ac9db'
+down_revision = 'd3629796a4e4'
+branch_labels = None
+depends_on = None
+
+# Lets batch mode address the unnamed UNIQUE(otp) that SQLite reflects
+naming_convention = {
+    "uq": "uq_%(table_name)s_%(column_0_name)s",
+}
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('attendance_session_otp_key', 'attendance_session', type_='unique')
+    else:
+        with op.batch_alter_table('attendance_session', schema=None, naming_convention=naming_convention) as batch_op:
+            batch_op.drop_constraint('uq_attendance_session_otp', type_='unique')
+
+    with op.batch_alter_table('attendance_session', schema=None) as batch_op:
+        batch_op.create_index(
+            'uq_session_active_otp', ['otp'], unique=True,
+            postgresql_where=sa.text("status = 'active'"),
+            sqlite_where=sa.text("status = 'active'"),
+        )
+
+
+def downgrade():
+    # Fails if historical sessions have reused an OTP; clear those first
+    with op.batch_alter_table('attendance_session', schema=None) as batch_op:
+        batch_op.drop_index('uq_session_active_otp')
+        batch_op.create_unique_constraint('attendance_session_otp_key', ['otp'])
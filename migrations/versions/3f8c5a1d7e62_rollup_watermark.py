@@ -0,0 +1,35 @@
+"""Rollup watermark: attendance is counted into the rollup after it is inserted
+
+Revision ID: 3f8c5a1d7e62
+Revises: b6e1f04a9d27
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8c5a1d7e62'
+down_revision = 'b6e1f04a9d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rollup_watermark',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('seen_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Until now inserts counted themselves into the rollup, so every existing row is counted
+    op.execute(
+        "INSERT INTO rollup_watermark (id, last_id, seen_id) "
+        "SELECT 1, COALESCE(MAX(id), 0), COALESCE(MAX(id), 0) FROM attendance"
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_watermark')
@@ -0,0 +1,38 @@
+"""Faculty location trail per session
+
+Revision ID: 5b0e7f3c21a4
+Revises: ec119e9e5103
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0e7f3c21a4'
+down_revision = 'ec119e9e5103'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('session_location',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('accuracy', sa.Float(), nullable=True),
+    sa.Column('recorded_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['session_id'], ['attendance_session.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('session_location', schema=None) as batch_op:
+        batch_op.create_index('ix_session_location_session_recorded', ['session_id', 'recorded_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('session_location', schema=None) as batch_op:
+        batch_op.drop_index('ix_session_location_session_recorded')
+
+    op.drop_table('session_location')
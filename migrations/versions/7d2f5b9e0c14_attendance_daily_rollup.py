@@ -0,0 +1,42 @@
+"""Daily attendance rollup
+
+Revision ID: 7d2f5b9e0c14
+Revises: e4b8a2c6d1f3
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2f5b9e0c14'
+down_revision = 'e4b8a2c6d1f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attendance_daily',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('faculty_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('subject', sa.String(length=100), nullable=False),
+    sa.Column('division', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('date', 'faculty_id', 'subject', 'division', 'status')
+    )
+    op.create_index('ix_attendance_daily_faculty_date', 'attendance_daily', ['faculty_id', 'date'], unique=False)
+
+    # Seed from existing attendance (same grouping as app.utils.rollup.rebuild)
+    op.execute(
+        "INSERT INTO attendance_daily (date, faculty_id, subject, division, status, count) "
+        "SELECT a.date, COALESCE(a.faculty_id, 0), a.subject, s.division, a.status, COUNT(*) "
+        "FROM attendance a JOIN student s ON s.id = a.student_id "
+        "GROUP BY a.date, COALESCE(a.faculty_id, 0), a.subject, s.division, a.status"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_attendance_daily_faculty_date', table_name='attendance_daily')
+    op.drop_table('attendance_daily')
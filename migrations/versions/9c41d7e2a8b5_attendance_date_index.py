@@ -0,0 +1,35 @@
+"""Index attendance.date for report date ranges
+
+Revision ID: 9c41d7e2a8b5
+Revises: 5b0e7f3c21a4
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41d7e2a8b5'
+down_revision = '5b0e7f3c21a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY keeps attendance writable while the index builds; it cannot
+        # run inside a transaction, and IF NOT EXISTS lets a failed run be retried
+        with op.get_context().autocommit_block():
+            op.create_index('ix_attendance_date', 'attendance', ['date'], unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+        return
+    op.create_index('ix_attendance_date', 'attendance', ['date'], unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_attendance_date', table_name='attendance', postgresql_concurrently=True, if_exists=True)
+        return
+    op.drop_index('ix_attendance_date', table_name='attendance')
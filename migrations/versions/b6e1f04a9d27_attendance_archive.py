@@ -0,0 +1,49 @@
+"""Attendance archive for retired sessions
+
+Revision ID: b6e1f04a9d27
+Revises: 7d2f5b9e0c14
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1f04a9d27'
+down_revision = '7d2f5b9e0c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attendance_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('session_code', sa.String(length=20), nullable=False),
+    sa.Column('faculty_id', sa.Integer(), nullable=True),
+    sa.Column('faculty_name', sa.String(length=100), nullable=True),
+    sa.Column('subject', sa.String(length=100), nullable=False),
+    sa.Column('expected_division', sa.String(length=50), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('closed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('first_date', sa.Date(), nullable=False),
+    sa.Column('last_date', sa.Date(), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('counts', sa.Text(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_attendance_archive_faculty_first_date', 'attendance_archive', ['faculty_id', 'first_date'], unique=False)
+    op.create_index('ix_attendance_archive_first_date', 'attendance_archive', ['first_date'], unique=False)
+    op.create_index('ix_attendance_archive_session_id', 'attendance_archive', ['session_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_attendance_archive_session_id', table_name='attendance_archive')
+    op.drop_index('ix_attendance_archive_first_date', table_name='attendance_archive')
+    op.drop_index('ix_attendance_archive_faculty_first_date', table_name='attendance_archive')
+    op.drop_table('attendance_archive')
@@ -0,0 +1,33 @@
+"""Unique attendance per (session_id, student_id)
+
+Revision ID: d3629796a4e4
+Revises: 74af339e801b
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3629796a4e4'
+down_revision = '74af339e801b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicates left behind by the old check-then-insert race, keeping the first mark
+    op.execute(
+        "DELETE FROM attendance "
+        "WHERE session_id IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM attendance WHERE session_id IS NOT NULL GROUP BY session_id, student_id"
+        ")"
+    )
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_attendance_session_student', ['session_id', 'student_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_attendance_session_student', type_='unique')
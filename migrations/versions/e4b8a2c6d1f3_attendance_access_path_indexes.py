@@ -0,0 +1,50 @@
+"""Indexes for attendance, student and faculty access paths
+
+Revision ID: e4b8a2c6d1f3
+Revises: 9c41d7e2a8b5
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b8a2c6d1f3'
+down_revision = '9c41d7e2a8b5'
+branch_labels = None
+depends_on = None
+
+# (session_id, student_id) is already covered by uq_attendance_session_student
+# and faculty.email by its unique constraint
+INDEXES = [
+    ('ix_attendance_faculty_date', 'attendance', ['faculty_id', 'date']),
+    ('ix_attendance_subject_date', 'attendance', ['subject', 'date']),
+    ('ix_attendance_student_date', 'attendance', ['student_id', 'date']),
+    ('ix_attendance_marked_at', 'attendance', ['marked_at']),
+    ('ix_student_roll_number', 'student', ['roll_number']),
+    ('ix_student_division', 'student', ['division']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY keeps the tables writable while the indexes build; it cannot
+        # run inside a transaction, and IF NOT EXISTS lets a failed run be retried
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+        return
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        return
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,26 @@
+"""Per-session secret for rotating OTPs
+
+Revision ID: ec119e9e5103
+Revises: 2211d23ac9db
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ec119e9e5103'
+down_revision = '2211d23ac9db'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('attendance_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('otp_secret', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('attendance_session', schema=None) as batch_op:
+        batch_op.drop_column('otp_secret')
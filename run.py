@@ -1,6 +1,25 @@
+import os
+
 from app import create_app
+from app.utils.maintenance import maintenance
+from app.utils.session_expiry import session_expiry
 
 app = create_app()
 
+
+def start_background_work():
+    """Start this server process's threads: it expires sessions at their deadlines and
+    takes part in electing the process that runs the maintenance sweeps.
+
+    Called by gunicorn.conf.py once a worker has loaded the app, and by the development
+    server below; never on import, so the flask CLI (migrations, commands) starts none.
+    """
+    session_expiry.start()
+    maintenance.start()
+
+
 if __name__ == "__main__":
+    # The debug reloader runs this file twice; only its serving child gets the threads
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_work()
     app.run(debug=True)
@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import Faculty, Student  # noqa: E402
+from app.utils import hash_password  # noqa: E402
+from app.utils.faculty_stats import faculty_stats  # noqa: E402
+from app.utils.location_trail import location_trail  # noqa: E402
+from app.utils.session_index import session_index  # noqa: E402
+
+PASSWORD = 'secret'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The application on a throwaway SQLite database, inside an app context"""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'attendance.db'}")
+    monkeypatch.setenv('EXPORT_DIR', str(tmp_path / 'exports'))
+    monkeypatch.setenv('MAINTENANCE_STATUS_FILE', str(tmp_path / 'maintenance.json'))
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        session_index.warm()  # forget sessions of the previous test's database
+        faculty_stats.clear()
+        location_trail.clear()
+        yield app
+        location_trail.shutdown()  # writes this test's fixes to its own database
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def postgres_app(tmp_path, monkeypatch):
+    """The application on the Postgres database named by TEST_POSTGRES_URL (skipped without one).
+
+    Tables are created for the test and dropped after it, so point it at a scratch database.
+    """
+    url = os.environ.get('TEST_POSTGRES_URL')
+    if not url:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    monkeypatch.setenv('DATABASE_URL', url)
+    monkeypatch.setenv('EXPORT_DIR', str(tmp_path / 'exports'))
+    monkeypatch.setenv('MAINTENANCE_STATUS_FILE', str(tmp_path / 'maintenance.json'))
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        session_index.warm()
+        faculty_stats.clear()
+        location_trail.clear()
+        yield app
+        location_trail.shutdown()
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def faculty(app):
+    member = Faculty(full_name='Ada Faculty', email='ada@example.edu', password=hash_password(PASSWORD))
+    db.session.add(member)
+    db.session.commit()
+    return member
+
+
+@pytest.fixture
+def faculty_headers(client, faculty):
+    response = client.post('/faculty/login', json={'email': faculty.email, 'password': PASSWORD})
+    return {'Authorization': f"Bearer {response.json['access_token']}"}
+
+
+def add_students(count: int, division: str = 'A', prefix: str = 'S') -> list[Student]:
+    """Insert `count` students and return them"""
+    students = [
+        Student(full_name=f'Student {prefix}{i:04d}', roll_number=f'{prefix}{i:04d}', division=division,
+                mobile_number='0000000000', email=f'{prefix.lower()}{i}@example.edu', password='x')
+        for i in range(count)
+    ]
+    db.session.add_all(students)
+    db.session.commit()
+    return students
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app import db
+from app.models import Attendance, AttendanceSession
+from app.utils import rollup
+
+from conftest import add_students
+
+LOCATION = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+
+
+@pytest.fixture
+def closed_session(client, faculty, faculty_headers):
+    """A division-A session over three students, closed with one of them present"""
+    students = add_students(3, 'A')
+    started = client.post('/faculty/start_session', json={'subject': 'Maths', 'division': 'A', 'location': LOCATION},
+                          headers=faculty_headers).json
+    session = AttendanceSession.query.filter_by(session_code=started['session_code']).one()
+    db.session.add(Attendance(student_id=students[0].id, session_id=session.id, subject='Maths',
+                              faculty_id=faculty.id, date=session.created_at.date(), status='Present',
+                              marked_at=datetime.now(timezone.utc)))
+    db.session.commit()
+    assert client.post('/faculty/close_session', headers=faculty_headers).status_code == 200
+    return session, students
+
+
+def _statuses(session):
+    db.session.expire_all()
+    return {row.student_id: row.status for row in Attendance.query.filter_by(session_id=session.id)}
+
+
+def _bulk_mark(client, headers, session, students):
+    db.session.refresh(session)
+    started, closed = (moment.replace(tzinfo=timezone.utc) for moment in (session.created_at, session.closed_at))
+    captured_at = (started + (closed - started) / 2).isoformat()
+    marks = [{'student_id': student.id, **LOCATION, 'captured_at': captured_at} for student in students]
+    response = client.post(f'/faculty/sessions/{session.session_code}/bulk_mark', json={'marks': marks},
+                           headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_close_writes_absences_for_unmarked_students(closed_session):
+    session, students = closed_session
+    assert _statuses(session) == {students[0].id: 'Present', students[1].id: 'Absent', students[2].id: 'Absent'}
+
+
+def test_late_upload_upgrades_absences_to_present(client, faculty_headers, closed_session):
+    session, students = closed_session
+    response = _bulk_mark(client, faculty_headers, session, students)
+    assert [result['result'] for result in response['results']] == ['duplicate', 'present', 'present']
+    assert set(_statuses(session).values()) == {'Present'}
+    upgraded = Attendance.query.filter_by(session_id=session.id, student_id=students[1].id).one()
+    assert upgraded.student_latitude == LOCATION['latitude']
+    assert upgraded.date == session.created_at.date()  # still the session's day
+
+    again = _bulk_mark(client, faculty_headers, session, students)
+    assert {result['result'] for result in again['results']} == {'duplicate'}
+
+
+def test_same_student_twice_in_an_upload_is_upgraded_once(client, faculty_headers, closed_session):
+    session, students = closed_session
+    response = _bulk_mark(client, faculty_headers, session, [students[1], students[1]])
+    assert [result['result'] for result in response['results']] == ['present', 'duplicate']
+
+
+@pytest.mark.parametrize('counted', [True, False], ids=['counted', 'not-yet-counted'])
+def test_rollup_follows_the_upgrade(client, faculty_headers, closed_session, counted):
+    session, students = closed_session
+    if counted:
+        rollup.catch_up()
+        rollup.catch_up()  # the second run passes the rows the first one saw
+        assert rollup.watermark(lock=False).last_id >= max(row.id for row in Attendance.query)
+    _bulk_mark(client, faculty_headers, session, students[1:])
+    rollup.catch_up()
+    rollup.catch_up()
+    assert rollup.drift() == []
+    groups = rollup.summary({}, ['division'])
+    assert groups[0]['by_status'] == {'Present': 3}
@@ -0,0 +1,110 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models import Attendance, AttendanceArchive, AttendanceSession, SessionLocation
+from app.utils import archive, reports
+from app.utils.session_manager import SessionManager
+
+from conftest import add_students
+
+SUBJECTS = ('Maths', 'Physics')
+STATUSES = ('Present', 'Absent', 'Present', 'Present')
+
+
+def _session(faculty, number, started, students):
+    session = AttendanceSession(session_code=f'ARCH{number:05d}', otp=f'{number:04d}', faculty_id=faculty.id,
+                                subject=SUBJECTS[number % 2], status='closed', created_at=started,
+                                expires_at=started + timedelta(minutes=10), closed_at=started + timedelta(minutes=5))
+    db.session.add(session)
+    db.session.flush()
+    db.session.add_all([
+        Attendance(student_id=student.id, session_id=session.id, subject=session.subject, faculty_id=faculty.id,
+                   date=started.date(), status=STATUSES[(number + k) % 4], marked_at=started + timedelta(seconds=k),
+                   student_latitude=18.5, student_longitude=73.8 + k * 0.0001)
+        for k, student in enumerate(students)
+    ])
+    return session
+
+
+@pytest.fixture
+def history(app, faculty):
+    """Three sessions from weeks ago, archived, and one recent session; returns every report row before archiving"""
+    students = add_students(2, 'A', 'A') + add_students(2, 'B', 'B')
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    old = [_session(faculty, number, now - timedelta(days=20 - number), students) for number in range(3)]
+    _session(faculty, 3, now - timedelta(days=1), students)
+    db.session.add_all([SessionLocation(session_id=old[0].id, latitude=18.5, longitude=73.8, accuracy=4.0,
+                                        recorded_at=old[0].created_at + timedelta(seconds=seconds))
+                        for seconds in (0, 60)])
+    db.session.commit()
+    before = reports.report_query({}).all()
+    archived, started = [session.id for session in old], old[0].created_at
+
+    result = SessionManager().delete_old_sessions(older_than_days=7)
+    assert (result.sessions, result.attendance, result.locations) == (3, 12, 2)
+    return {'rows': before, 'archived': archived, 'started': started}
+
+
+def test_payload_is_gzipped_json_of_the_session(history):
+    record = AttendanceArchive.query.filter_by(session_id=history['archived'][0]).one()
+    document = json.loads(gzip.decompress(record.payload))
+    assert document['version'] == archive.PAYLOAD_VERSION
+    assert set(document['attendance']) == set(archive.ATTENDANCE_FIELDS)
+    assert document['attendance']['roll_number'] == ['A0000', 'A0001', 'B0000', 'B0001']
+    assert (record.rows, record.faculty_name, record.first_date) == (4, 'Ada Faculty', history['started'].date())
+
+    marks, trail = archive.decode(record.payload)
+    original = {row.id: row for row in history['rows']}
+    assert [(mark['status'], mark['date'], mark['division']) for mark in marks] == [
+        (original[mark['id']].status, original[mark['id']].date, original[mark['id']].division) for mark in marks]
+    assert marks[1]['marked_at'].replace(tzinfo=None) == history['started'].replace(tzinfo=None) + timedelta(seconds=1)
+    assert [fix['accuracy'] for fix in trail] == [4.0, 4.0]
+    # Gone from the hot tables
+    assert Attendance.query.filter(Attendance.session_id.in_(history['archived'])).count() == 0
+
+
+@pytest.mark.parametrize('filters', [
+    {}, {'status': 'Absent'}, {'division': 'B'}, {'subject': 'Physics'}, {'faculty_id': 1},
+    {'date_from': 1, 'date_to': 2}, {'date_to': 1, 'status': 'Present'},
+])
+def test_total_matches_the_archived_rows(history, filters):
+    # Date bounds are given in days after the first archived session
+    start = history['started'].date()
+    filters = {name: (start + timedelta(days=value)).isoformat() if name.startswith('date_') else value
+               for name, value in filters.items()}
+    archived = list(archive.iter_rows(filters))
+    assert archive.total(filters) == len(archived)
+    # Together with the rows still in the hot table, every row from before archiving
+    hot = reports.count_query(filters).scalar()
+    assert len(archived) + hot == sum(1 for row in history['rows'] if _passes(row, filters))
+
+
+def _passes(row, filters):
+    return ((not filters.get('status') or row.status == filters['status'])
+            and (not filters.get('division') or row.division == filters['division'])
+            and (not filters.get('subject') or row.subject == filters['subject'])
+            and (not filters.get('date_from') or row.date.isoformat() >= filters['date_from'])
+            and (not filters.get('date_to') or row.date.isoformat() < filters['date_to']))
+
+
+@pytest.mark.parametrize('order', ['desc', 'asc'])
+def test_export_merges_archived_rows_by_date(history, order):
+    exported = [(row.date, row.id, row.status, row.roll_number) for row in reports.export_rows({}, 'date', order)]
+    expected = sorted(((row.date, row.id, row.status, row.roll_number) for row in history['rows']),
+                      reverse=order == 'desc')
+    assert exported == expected
+
+
+def test_export_route_and_archived_session_route(client, faculty_headers, history):
+    response = client.get('/faculty/export_reports?gzip=0', headers=faculty_headers)
+    assert response.status_code == 200
+    assert response.data.decode().count('\n') == len(history['rows']) + 1
+
+    session = client.get(f"/faculty/archive/sessions/{history['archived'][0]}", headers=faculty_headers).json
+    assert session['status'] == 'success'
+    assert len(session['session']['attendance']) == 4 and len(session['session']['locations']) == 2
+    assert client.get('/faculty/archive/sessions/999', headers=faculty_headers).status_code == 404
@@ -0,0 +1,87 @@
+import pytest
+
+from app import db
+from app.models import Attendance
+from app.utils import hash_password
+from app.utils.attendance_ingest import IngestQueueFull, attendance_ingest
+from app.utils.session_manager import SessionManager, attendance_row
+
+from conftest import PASSWORD, add_students
+
+LOCATION = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+
+
+@pytest.fixture
+def ingest(app):
+    """The write-behind queue in batched mode; its flusher is stopped after the test"""
+    app.config.update(ATTENDANCE_INGEST_MODE='batched', ATTENDANCE_INGEST_FLUSH_MS=20,
+                      ATTENDANCE_INGEST_BATCH_SIZE=200, ATTENDANCE_INGEST_QUEUE_SIZE=2000)
+    attendance_ingest.init_app(app)
+    yield attendance_ingest
+    attendance_ingest.shutdown()
+    app.config['ATTENDANCE_INGEST_MODE'] = 'direct'
+    attendance_ingest.init_app(app)
+
+
+@pytest.fixture
+def live_session(app, faculty):
+    return SessionManager().create_session(faculty.id, 'Maths', LOCATION)
+
+
+def _row(session, student):
+    return attendance_row(session, student.id, LOCATION, 0.0)
+
+
+def test_futures_resolve_to_the_id_or_none(ingest, live_session):
+    student = add_students(1)[0]
+    attendance_id = ingest.submit(_row(live_session, student)).result(timeout=5)
+    assert db.session.get(Attendance, attendance_id).student_id == student.id
+    assert ingest.submit(_row(live_session, student)).result(timeout=5) is None
+
+    result = SessionManager().validate_and_mark_attendance(live_session.otp, add_students(1, prefix='T')[0].id,
+                                                           LOCATION)
+    assert result.status == 'present' and result.attendance_id is not None
+
+
+def test_repeat_submit_within_one_batch(ingest, live_session):
+    # Two rows fill a batch, so both land in the same flush
+    ingest.batch_size = 2
+    ingest.flush_interval = 5.0
+    student = add_students(1)[0]
+    first, second = ingest.submit(_row(live_session, student)), ingest.submit(_row(live_session, student))
+    assert first.result(timeout=5) is not None
+    assert second.result(timeout=5) is None
+    assert Attendance.query.filter_by(session_id=live_session.id).count() == 1
+
+
+def test_full_queue_answers_503(ingest, client, live_session, monkeypatch):
+    student = add_students(1)[0]
+    student.password = hash_password(PASSWORD)
+    db.session.commit()
+    login = client.post('/student/login', json={'roll_number': student.roll_number, 'password': PASSWORD}).json
+
+    # No flusher draining a one-slot queue that is already taken
+    monkeypatch.setattr(ingest, '_start', lambda: None)
+    ingest._queue.maxsize = 1
+    ingest.submit_timeout = 0.01
+    ingest.submit(_row(live_session, student))
+    with pytest.raises(IngestQueueFull):
+        ingest.submit(_row(live_session, student))
+
+    response = client.post('/student/mark_attendance', headers={'Authorization': f"Bearer {login['access_token']}"},
+                           json={'otp': live_session.otp, 'subject': 'Maths', **LOCATION})
+    assert response.status_code == 503
+    assert response.json == {'status': 'error', 'message': 'Attendance queue is full, please retry'}
+    ingest._queue.get_nowait()
+
+
+def test_shutdown_drains_the_queue(ingest, live_session):
+    # Without the shutdown these would wait out the flush interval
+    ingest.flush_interval = 30.0
+    students = add_students(3)
+    futures = [ingest.submit(_row(live_session, student)) for student in students]
+    ingest.shutdown()
+    assert all(future.done() for future in futures)
+    assert all(future.result() is not None for future in futures)
+    assert not ingest._thread.is_alive()
+    assert Attendance.query.filter_by(session_id=live_session.id).count() == 3
@@ -0,0 +1,105 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import commands, db
+from app.models import Attendance, AttendanceSession, SessionLocation
+
+from conftest import add_students
+
+
+@pytest.fixture
+def marks(app, faculty):
+    """10 located marks, every other one with a stale stored distance"""
+    session = AttendanceSession(session_code='AUDIT1', otp='123456', faculty_id=faculty.id, subject='Maths',
+                                faculty_latitude=18.5, faculty_longitude=73.8, faculty_location_accuracy=5.0,
+                                status='closed', expires_at=datetime.now(timezone.utc) - timedelta(hours=1),
+                                expected_location_radius=100.0)
+    db.session.add(session)
+    db.session.commit()
+    db.session.add_all([
+        Attendance(student_id=student.id, session_id=session.id, subject='Maths', faculty_id=faculty.id,
+                   date=date(2026, 3, 2), status='Present', student_latitude=18.5 + i * 0.00005,
+                   student_longitude=73.8, student_location_accuracy=5.0,
+                   distance_from_faculty=999.0 if i % 2 else None)
+        for i, student in enumerate(add_students(10))
+    ])
+    db.session.commit()
+
+
+@pytest.fixture
+def commits(app):
+    """Number of commits made while the test runs"""
+    count = []
+
+    def record(session):
+        count.append(session)
+
+    event.listen(db.session, 'after_commit', record)
+    yield count
+    event.remove(db.session, 'after_commit', record)
+
+
+def test_fix_is_written_and_committed_per_chunk(app, marks, commits, monkeypatch):
+    monkeypatch.setattr(commands, 'AUDIT_CHUNK_SIZE', 4)
+    result = app.test_cli_runner().invoke(args=['audit-geofence', '--fix'])
+    assert result.exit_code == 0, result.output
+    assert 'stored distance off by more than 1.0 m: 10 (rewritten)' in result.output
+    assert len(commits) == 3  # 4 + 4 + 2 marks
+
+    db.session.expire_all()
+    distances = [row.distance_from_faculty for row in Attendance.query.order_by(Attendance.id)]
+    assert all(distance is not None and distance < 100 for distance in distances)
+    assert distances == sorted(distances)
+
+    again = app.test_cli_runner().invoke(args=['audit-geofence', '--fix'])
+    assert 'stored distance off by more than 1.0 m: 0 (rewritten)' in again.output
+
+
+def test_report_only_writes_nothing(app, marks, commits):
+    result = app.test_cli_runner().invoke(args=['audit-geofence'])
+    assert 'stored distance off by more than 1.0 m: 10\n' in result.output
+    assert commits == []
+    assert Attendance.query.filter(Attendance.distance_from_faculty.is_(None)).count() == 5
+
+
+def test_marks_are_checked_against_the_nearest_trail_fix(app, faculty):
+    """The faculty walked 11 km during the session; the session row only has where they ended up"""
+    started = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+    session = AttendanceSession(session_code='AUDIT2', otp='654321', faculty_id=faculty.id, subject='Maths',
+                                faculty_latitude=18.6, faculty_longitude=73.8, status='closed', created_at=started,
+                                expires_at=started + timedelta(hours=1), expected_location_radius=100.0)
+    db.session.add(session)
+    db.session.flush()
+    db.session.add_all([SessionLocation(session_id=session.id, latitude=latitude, longitude=73.8, accuracy=5.0,
+                                        recorded_at=started + timedelta(minutes=minutes))
+                        for minutes, latitude in [(0, 18.5), (20, 18.55), (40, 18.6)]])
+    students = add_students(3)
+    db.session.add_all([
+        Attendance(student_id=student.id, session_id=session.id, subject='Maths', faculty_id=faculty.id,
+                   date=started.date(), status='Present', marked_at=started + timedelta(minutes=minutes),
+                   student_latitude=latitude, student_longitude=73.8, student_location_accuracy=5.0)
+        for student, (minutes, latitude) in zip(students, [(2, 18.5), (22, 18.55), (39, 18.6)])
+    ])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['audit-geofence', '--fix'])
+    assert 'outside the radius: 0' in result.output, result.output
+    db.session.expire_all()
+    assert all(row.distance_from_faculty < 1 for row in Attendance.query)
+
+
+def test_revalidate_checks_present_marks_only(client, faculty_headers):
+    location = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+    students = add_students(3, 'A')
+    code = client.post('/faculty/start_session', json={'subject': 'Maths', 'division': 'A', 'location': location},
+                       headers=faculty_headers).json['session_code']
+    marked = client.post(f'/faculty/sessions/{code}/bulk_mark', headers=faculty_headers,
+                         json={'marks': [{'student_id': students[0].id, **location}]})
+    assert marked.json['summary'] == {'present': 1}
+    assert client.post('/faculty/close_session', headers=faculty_headers).status_code == 200
+    assert Attendance.query.filter_by(status='Absent').count() == 2
+
+    summary = client.post(f'/faculty/sessions/{code}/revalidate', headers=faculty_headers, json={}).json
+    assert (summary['checked'], summary['within'], summary['unlocated'], summary['outside']) == (1, 1, 0, [])
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models import Attendance, AttendanceSession
+
+from conftest import add_students
+
+
+@pytest.fixture
+def sessions(app, faculty):
+    """Closed division-A sessions started today, two days ago and last term, none with absences yet"""
+    add_students(3, 'A')
+    now = datetime.now(timezone.utc)
+    started = {'today': now, 'recent': now - timedelta(days=2), 'old': now - timedelta(days=120)}
+    rows = {
+        name: AttendanceSession(session_code=f'BF{name.upper()}', otp=f'{i:04d}', faculty_id=faculty.id,
+                                subject='Maths', status='closed', expected_division='A', created_at=at,
+                                expires_at=at + timedelta(minutes=10), closed_at=at + timedelta(minutes=5))
+        for i, (name, at) in enumerate(started.items())
+    }
+    db.session.add_all(rows.values())
+    db.session.commit()
+    return {name: session.id for name, session in rows.items()}
+
+
+def _backfilled(sessions):
+    names = {session_id: name for name, session_id in sessions.items()}
+    return sorted({names[row.session_id] for row in Attendance.query.filter_by(status='Absent')})
+
+
+@pytest.mark.parametrize('args,backfilled', [
+    ([], ['today']),
+    (['--since', (datetime.now(timezone.utc) - timedelta(days=3)).date().isoformat()], ['recent', 'today']),
+    (['--all'], ['old', 'recent', 'today']),
+])
+def test_past_sessions_are_skipped_unless_asked_for(app, sessions, args, backfilled):
+    result = app.test_cli_runner().invoke(args=['backfill-absences', *args])
+    assert result.exit_code == 0, result.output
+    assert _backfilled(sessions) == backfilled
+    assert Attendance.query.count() == 3 * len(backfilled)
+
+
+def test_help_states_the_current_roster_assumption(app):
+    result = app.test_cli_runner().invoke(args=['backfill-absences', '--help'])
+    assert 'as they are now' in result.output
+
+
+def test_since_and_all_are_exclusive(app, sessions):
+    result = app.test_cli_runner().invoke(args=['backfill-absences', '--all', '--since', '2026-01-01'])
+    assert result.exit_code != 0
+    assert Attendance.query.count() == 0
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models import Attendance, Faculty
+from app.routes.faculty_routes import BULK_MARK_MAX_ROWS
+from app.utils import hash_password
+
+from conftest import PASSWORD, add_students
+
+LOCATION = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+
+
+@pytest.fixture
+def session_code(client, faculty_headers):
+    response = client.post('/faculty/start_session', json={'subject': 'Maths', 'location': LOCATION},
+                           headers=faculty_headers)
+    return response.json['session_code']
+
+
+def _mark(student, **fields):
+    return {'student_id': student.id, **LOCATION, 'captured_at': datetime.now(timezone.utc).isoformat(), **fields}
+
+
+def _upload(client, headers, code, marks):
+    return client.post(f'/faculty/sessions/{code}/bulk_mark', json={'marks': marks}, headers=headers)
+
+
+def test_each_result_is_reported_in_order(client, faculty_headers, session_code):
+    students = add_students(4)
+    long_ago = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+    marks = [
+        _mark(students[0]),
+        {'roll_number': students[1].roll_number, **LOCATION},
+        _mark(students[0]),
+        _mark(students[2], latitude=18.6),  # about 11 km north
+        {'student_id': 999999, **LOCATION},
+        {'roll_number': 'NOPE', **LOCATION},
+        _mark(students[3], captured_at=long_ago),
+        _mark(students[3], captured_at='yesterday'),
+    ]
+    response = _upload(client, faculty_headers, session_code, marks)
+    assert response.status_code == 200, response.json
+    assert [result['result'] for result in response.json['results']] == [
+        'present', 'present', 'duplicate', 'out_of_radius', 'unknown_student', 'unknown_student',
+        'outside_session_window', 'invalid',
+    ]
+    assert response.json['summary'] == {'present': 2, 'duplicate': 1, 'out_of_radius': 1, 'unknown_student': 2,
+                                        'outside_session_window': 1, 'invalid': 1}
+    assert response.json['results'][1]['student_id'] == students[1].id
+    assert response.json['results'][3]['distance'] > 10000
+    assert {row.student_id for row in Attendance.query} == {students[0].id, students[1].id}
+
+
+def test_marks_already_taken_are_duplicates(client, faculty_headers, session_code):
+    students = add_students(2)
+    assert _upload(client, faculty_headers, session_code, [_mark(students[0])]).json['summary'] == {'present': 1}
+    response = _upload(client, faculty_headers, session_code, [_mark(student) for student in students])
+    assert [result['result'] for result in response.json['results']] == ['duplicate', 'present']
+    assert Attendance.query.count() == 2
+
+
+def test_upload_is_capped(client, faculty_headers, session_code):
+    student = add_students(1)[0]
+    response = _upload(client, faculty_headers, session_code, [_mark(student)] * (BULK_MARK_MAX_ROWS + 1))
+    assert response.status_code == 400
+    assert Attendance.query.count() == 0
+    assert _upload(client, faculty_headers, session_code, [_mark(student)] * BULK_MARK_MAX_ROWS).status_code == 200
+
+
+@pytest.mark.parametrize('body', [{}, {'marks': []}, {'marks': 'x'}, {'marks': [1, 2]}])
+def test_malformed_upload_is_rejected(client, faculty_headers, session_code, body):
+    response = client.post(f'/faculty/sessions/{session_code}/bulk_mark', json=body, headers=faculty_headers)
+    assert response.status_code == 400
+
+
+def test_only_the_session_owner_may_upload(client, faculty_headers, session_code):
+    db.session.add(Faculty(full_name='Bo Faculty', email='bo@example.edu', password=hash_password(PASSWORD)))
+    db.session.commit()
+    token = client.post('/faculty/login', json={'email': 'bo@example.edu', 'password': PASSWORD}).json['access_token']
+    student = add_students(1)[0]
+
+    response = _upload(client, {'Authorization': f'Bearer {token}'}, session_code, [_mark(student)])
+    assert response.status_code == 403
+    assert _upload(client, faculty_headers, 'NOSUCHCODE', [_mark(student)]).status_code == 404
+    assert Attendance.query.count() == 0
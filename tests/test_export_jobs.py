@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.utils import export_jobs as export_jobs_module
+from app.utils.export_jobs import STALE_SECONDS, export_jobs
+
+
+@pytest.fixture
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _job(letter: str, age: float = 2 * STALE_SECONDS, **fields) -> dict:
+    """Write a sidecar created and last updated `age` seconds ago"""
+    then = time.time() - age
+    job = {
+        'id': letter * 32, 'key': letter, 'format': 'csv', 'filters': {}, 'sort': 'date', 'order': 'desc',
+        'requested_by': None, 'pid': os.getpid(), 'host': export_jobs_module._HOST, 'state': 'queued',
+        'rows': 0, 'total': None, 'bytes': None, 'error': None, 'created_at': then, 'started_at': None,
+        'finished_at': None, 'updated_at': then,
+    }
+    job.update(fields)
+    os.makedirs(export_jobs.directory, exist_ok=True)
+    with open(export_jobs._sidecar(job['id']), 'w') as f:
+        json.dump(job, f)
+    return job
+
+
+def test_job_queued_behind_long_exports_stays_queued(app):
+    job = _job('a')
+    assert export_jobs.get(job['id'])['state'] == 'queued'
+    export_jobs.evict()
+    assert export_jobs.get(job['id'])['state'] == 'queued'
+
+
+def test_queued_job_of_a_stopped_process_fails(app, dead_pid):
+    job = _job('b', age=1, pid=dead_pid)
+    found = export_jobs.get(job['id'])
+    assert (found['state'], found['error']) == ('failed', 'Export worker stopped')
+    export_jobs.evict()
+    assert export_jobs.get(job['id']) is None
+
+
+def test_queued_job_of_another_host_expires_with_max_age(app, dead_pid):
+    assert export_jobs.get(_job('c', pid=dead_pid, host='elsewhere')['id'])['state'] == 'queued'
+    old = _job('d', age=export_jobs.max_age + 1, pid=dead_pid, host='elsewhere')
+    assert export_jobs.get(old['id'])['state'] == 'failed'
+
+
+def test_running_job_is_stale_only_without_progress(app):
+    assert export_jobs.get(_job('e', age=60, state='running')['id'])['state'] == 'running'
+    assert export_jobs.get(_job('f', state='running')['id'])['state'] == 'failed'
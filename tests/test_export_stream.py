@@ -0,0 +1,90 @@
+import gzip
+import itertools
+import tracemalloc
+from datetime import date, timedelta
+
+import pytest
+
+from app import db
+from app.models import Attendance
+from app.utils import reports
+
+from conftest import add_students
+
+
+def _add_marks(faculty, students, count: int, start: int = 0):
+    rows = [
+        {'student_id': students[i % len(students)].id, 'subject': ('Maths', 'Physics')[i % 2],
+         'faculty_id': faculty.id, 'date': date(2025, 1, 1) + timedelta(days=i % 300),
+         'status': 'Present' if i % 5 else 'Absent'}
+        for i in range(start, start + count)
+    ]
+    db.session.execute(Attendance.__table__.insert(), rows)
+    db.session.commit()
+
+
+def _stream_export(client, headers, query=''):
+    """(CSV lines, peak traced memory) of an export read chunk by chunk"""
+    tracemalloc.start()
+    try:
+        response = client.get(f'/faculty/export_reports?{query}', headers=headers, buffered=False)
+        assert response.status_code == 200
+        compressed = response.headers.get('Content-Encoding') == 'gzip'
+        lines, body = 0, []
+        for chunk in response.response:
+            if compressed:
+                body.append(chunk)  # decompressed once the peak has been taken
+            else:
+                lines += chunk.count(b'\n')
+        response.close()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    if compressed:
+        lines = gzip.decompress(b''.join(body)).count(b'\n')
+    return lines, peak
+
+
+@pytest.mark.parametrize('query,accept', [('gzip=0', {}), ('', {'Accept-Encoding': 'gzip'})])
+def test_export_memory_does_not_grow_with_row_count(client, faculty, faculty_headers, query, accept):
+    students = add_students(200)
+    headers = {**faculty_headers, **accept}
+    _add_marks(faculty, students, 5000)
+    small_lines, small_peak = _stream_export(client, headers, query)
+    _add_marks(faculty, students, 45000, start=5000)
+    large_lines, large_peak = _stream_export(client, headers, query)
+
+    assert (small_lines, large_lines) == (5001, 50001)  # header + rows
+    # Ten times the rows in (nearly) the same memory: rows are never all held at once
+    assert large_peak < small_peak * 1.5
+
+
+def test_header_is_sent_before_rows_are_read(app):
+    consumed = []
+
+    def rows():
+        for i in itertools.count():
+            consumed.append(i)
+            yield None
+
+    chunks = reports.iter_csv(rows(), chunk_rows=100)
+    assert next(chunks).startswith('Student,')
+    assert consumed == []
+
+
+def test_rows_are_written_in_bounded_chunks(client, faculty, faculty_headers):
+    students = add_students(20)
+    _add_marks(faculty, students, reports.EXPORT_CHUNK_SIZE * 3 + 10)
+    response = client.get('/faculty/export_reports?gzip=0', headers=faculty_headers, buffered=False)
+    chunks = list(response.response)
+    response.close()
+    assert max(chunk.count(b'\n') for chunk in chunks) <= reports.EXPORT_CHUNK_SIZE
+    assert sum(chunk.count(b'\n') for chunk in chunks) == reports.EXPORT_CHUNK_SIZE * 3 + 11
+
+
+def test_gzip_export_decompresses_to_the_plain_export(client, faculty, faculty_headers):
+    _add_marks(faculty, add_students(10), 300)
+    plain = client.get('/faculty/export_reports?gzip=0', headers=faculty_headers).data
+    compressed = client.get('/faculty/export_reports', headers={**faculty_headers, 'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain
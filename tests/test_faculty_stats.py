@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models import Attendance, AttendanceSession
+from app.utils.session_manager import SessionManager
+
+from conftest import add_students
+
+LOCATION = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+
+
+def _session(faculty, code, subject, started, status='closed', division=None):
+    session = AttendanceSession(session_code=code, otp=code[-4:], faculty_id=faculty.id, subject=subject,
+                                status=status, created_at=started, expires_at=started + timedelta(minutes=10),
+                                expected_division=division, faculty_latitude=LOCATION['latitude'],
+                                faculty_longitude=LOCATION['longitude'])
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def _marks(session, students, statuses):
+    db.session.add_all([
+        Attendance(student_id=student.id, session_id=session.id, subject=session.subject,
+                   faculty_id=session.faculty_id, date=session.created_at.date(), status=status)
+        for student, status in zip(students, statuses)
+    ])
+    db.session.commit()
+
+
+@pytest.fixture
+def sessions(app, faculty):
+    """Three sessions over two days: Maths for A and B, Physics for A, and a live Physics one"""
+    a, b = add_students(3, 'A', 'A'), add_students(2, 'B', 'B')
+    today = datetime.now(timezone.utc).replace(hour=9, minute=0, second=0, microsecond=0)
+    maths = _session(faculty, 'MATHS0001', 'Maths', today - timedelta(days=1))
+    _marks(maths, a + b, ['Present', 'Present', 'Absent', 'Present', 'Absent'])
+    physics = _session(faculty, 'PHYSX0002', 'Physics', today, division='A')
+    _marks(physics, a, ['Present', 'Absent', 'Absent'])
+    live = _session(faculty, 'PHYSX0003', 'Physics', datetime.now(timezone.utc), status='active')
+    return {'maths': maths, 'physics': physics, 'live': live, 'students': a + b}
+
+
+def _stats(client, headers, query=''):
+    response = client.get(f'/faculty/stats?{query}', headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_totals_and_breakdowns(client, faculty_headers, sessions):
+    stats = _stats(client, faculty_headers)
+    assert stats['totals'] == {'sessions': 3, 'active_sessions': 1, 'present': 4, 'absent': 4, 'marks': 8,
+                               'average_present_per_session': 1.33, 'attendance_rate': 0.5}
+    assert [(group['subject'], group['sessions'], group['present'], group['absent'])
+            for group in stats['by_subject']] == [('Maths', 1, 3, 2), ('Physics', 2, 1, 2)]
+    today = datetime.now(timezone.utc).date()
+    assert [(group['date'], group['sessions'], group['present']) for group in stats['by_day']] == [
+        ((today - timedelta(days=1)).isoformat(), 1, 3), (today.isoformat(), 2, 1)]
+    assert [(group['division'], group['sessions'], group['present'], group['absent'])
+            for group in stats['by_division']] == [('A', 2, 3, 3), ('B', 1, 1, 1)]
+
+    only_today = _stats(client, faculty_headers, f'date={today.isoformat()}')
+    assert only_today['totals']['sessions'] == 2
+    assert client.get('/faculty/stats?date=2025-13', headers=faculty_headers).status_code == 400
+
+
+def test_cache_is_dropped_after_a_mark(client, faculty_headers, sessions):
+    before = _stats(client, faculty_headers)['totals']
+
+    # A write that does not go through the app is not seen until the cache expires
+    _marks(sessions['physics'], sessions['students'][3:4], ['Present'])
+    assert _stats(client, faculty_headers)['totals'] == before
+
+    student = add_students(1, 'A', 'C')[0]
+    response = client.post(f"/faculty/sessions/{sessions['live'].session_code}/bulk_mark",
+                           json={'marks': [{'student_id': student.id, **LOCATION}]}, headers=faculty_headers)
+    assert response.json['summary'] == {'present': 1}
+    after = _stats(client, faculty_headers)['totals']
+    assert (after['present'], after['marks']) == (before['present'] + 2, before['marks'] + 2)
+
+
+def test_session_statistics_count_present_marks_only(app, faculty, sessions):
+    today = datetime.now(timezone.utc)
+    stats = SessionManager().get_session_statistics(faculty.id, today - timedelta(days=1), today)
+    assert stats == {'total_sessions': 3, 'active_sessions': 1, 'total_attendance': 4, 'average_per_session': 1.33}
+
+    # Active sessions outside the window still count, as they did before the stats aggregate
+    earlier = SessionManager().get_session_statistics(faculty.id, today - timedelta(days=30), today - timedelta(days=20))
+    assert (earlier['total_sessions'], earlier['active_sessions']) == (0, 1)
@@ -0,0 +1,125 @@
+import json
+import queue
+import threading
+
+import pytest
+
+from app import db
+from app.models import Attendance, AttendanceSession
+from app.utils.live_feed import live_feed
+
+from conftest import add_students
+
+LOCATION = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+
+
+@pytest.fixture
+def live(client, faculty_headers):
+    """An active session with three present marks; closed after the test so open streams end"""
+    students = add_students(5)
+    code = client.post('/faculty/start_session', json={'subject': 'Maths', 'location': LOCATION},
+                       headers=faculty_headers).json['session_code']
+    marked = _bulk_mark(client, faculty_headers, code, students[:3])
+    yield {'code': code, 'students': students, 'ids': marked}
+    client.post('/faculty/close_session', headers=faculty_headers)
+
+
+def _bulk_mark(client, headers, code, students):
+    response = client.post(f'/faculty/sessions/{code}/bulk_mark', headers=headers,
+                           json={'marks': [{'student_id': student.id, **LOCATION} for student in students]})
+    assert response.status_code == 200, response.json
+    assert {result['result'] for result in response.json['results']} == {'present'}
+    return [attendance_id for (attendance_id,) in db.session.query(Attendance.id).join(AttendanceSession).filter(
+        AttendanceSession.session_code == code, Attendance.student_id.in_([student.id for student in students]))
+        .order_by(Attendance.id)]
+
+
+def _parse(chunk: str) -> dict | None:
+    """One SSE event as {'id', 'event', 'data'}; None for the retry field and keep-alive comments"""
+    fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines() if not line.startswith(':'))
+    if 'event' not in fields:
+        return None
+    return {'id': int(fields['id']) if 'id' in fields else None, 'event': fields['event'],
+            'data': json.loads(fields['data'])}
+
+
+class _Reader:
+    """Reads one SSE stream in a thread, handing its events over a queue"""
+
+    def __init__(self, app, headers, path):
+        self.events = queue.Queue()
+        self.status = None
+        self._thread = threading.Thread(target=self._read, args=(app, headers, path), daemon=True)
+        self._thread.start()
+
+    def _read(self, app, headers, path):
+        response = app.test_client().get(path, headers=headers, buffered=False)
+        self.status = response.status_code
+        try:
+            for chunk in response.response:
+                event = _parse(chunk.decode() if isinstance(chunk, bytes) else chunk)
+                if event is not None:
+                    self.events.put(event)
+        finally:
+            response.close()
+            self.events.put(None)
+
+    def next(self, timeout=5.0):
+        return self.events.get(timeout=timeout)
+
+    def join(self, timeout=5.0):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+def test_resume_after_last_event_id(app, client, faculty_headers, live):
+    first, second, third = live['ids']
+    reader = _Reader(app, {**faculty_headers, 'Last-Event-ID': str(first)}, f"/faculty/sessions/{live['code']}/live")
+
+    assert reader.next() == {'id': None, 'event': 'status', 'data': {'present_count': 3}}
+    replayed = [reader.next(), reader.next()]
+    assert [(event['id'], event['event'], event['data']['present_count']) for event in replayed] == [
+        (second, 'mark', 2), (third, 'mark', 3)]
+    assert replayed[0]['data']['roll_number'] == live['students'][1].roll_number
+
+    # A mark committed while the stream is open arrives on it
+    (fourth,) = _bulk_mark(client, faculty_headers, live['code'], live['students'][3:4])
+    event = reader.next()
+    assert (event['id'], event['event'], event['data']['present_count']) == (fourth, 'mark', 4)
+    assert event['data']['roll_number'] == live['students'][3].roll_number
+
+    client.post('/faculty/close_session', headers=faculty_headers)
+    assert reader.next() == {'id': None, 'event': 'closed', 'data': {'present_count': 4}}
+    assert reader.next() is None and reader.join()
+    assert reader.status == 200
+
+
+def test_resume_from_the_query_parameter_and_poll(client, faculty_headers, live):
+    first, second, third = live['ids']
+    polled = client.get(f"/faculty/sessions/{live['code']}/live?poll=1&last_event_id={second}",
+                        headers=faculty_headers).json
+    assert [mark['attendance_id'] for mark in polled['marks']] == [third]
+    assert (polled['present_count'], polled['last_event_id']) == (3, third)
+    bad = client.get(f"/faculty/sessions/{live['code']}/live", headers={**faculty_headers, 'Last-Event-ID': 'x'})
+    assert bad.status_code == 400
+
+
+def test_connection_cap(app, client, faculty_headers, live, monkeypatch):
+    monkeypatch.setattr(live_feed, 'max_connections', 1)
+    path = f"/faculty/sessions/{live['code']}/live"
+    reader = _Reader(app, faculty_headers, path)
+    assert reader.next()['event'] == 'status'  # subscribed
+
+    turned_away = client.get(path, headers=faculty_headers)
+    assert turned_away.status_code == 503
+    assert turned_away.json['message'] == 'Too many live feeds, please poll'
+    assert client.get(f'{path}?poll=1', headers=faculty_headers).status_code == 200
+
+    # A stream that got past the route check but lost the race for the last slot
+    events = [_parse(chunk) for chunk in live_feed.stream(0, 0)]
+    assert events == [None, {'id': None, 'event': 'error',
+                             'data': {'message': 'Too many live feeds on this server, please retry'}}]
+
+    client.post('/faculty/close_session', headers=faculty_headers)
+    assert reader.join()
+    assert live_feed.available() and live_feed._connections == 0
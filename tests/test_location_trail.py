@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models import AttendanceSession, SessionLocation
+from app.utils import location_trail as trail_module
+from app.utils.location_trail import location_trail
+from app.utils.session_manager import SessionManager
+
+START = datetime(2025, 11, 3, 9, 0, tzinfo=timezone.utc)
+# About 1.1 m and 11 m north of 18.5, 73.8
+NUDGE, STEP = 0.00001, 0.0001
+
+
+@pytest.fixture
+def session(app, faculty):
+    session = SessionManager().create_session(faculty.id, 'Maths', {})
+    location_trail.min_move, location_trail.min_interval = 10.0, 30.0
+    return session
+
+
+def _record(session, seconds, latitude=18.5, accuracy=20.0):
+    return location_trail.record(session.id, latitude, 73.8, accuracy, START + timedelta(seconds=seconds))
+
+
+def test_redundant_pings_are_dropped(session):
+    assert _record(session, 0) is not None
+    assert _record(session, 10, 18.5 + NUDGE) is None  # too soon and too close
+    assert _record(session, 40, 18.5 + NUDGE) is not None  # interval passed
+    assert _record(session, 45, 18.5 + NUDGE + STEP) is not None  # moved far enough
+    assert _record(session, 50, 18.5 + NUDGE + STEP, accuracy=15.0) is None  # not much sharper
+    assert _record(session, 55, 18.5 + NUDGE + STEP, accuracy=5.0) is not None  # twice as sharp
+    assert [fix.recorded_at for fix in location_trail._trails[session.id]] == [
+        START + timedelta(seconds=seconds) for seconds in (0, 40, 45, 55)]
+
+
+def test_nearest_fix_to_a_moment(session):
+    for seconds, step in [(0, 0), (60, 1), (120, 2), (180, 3)]:
+        _record(session, seconds, 18.5 + step * STEP)
+
+    def nearest(seconds):
+        return location_trail.nearest(session.id, START + timedelta(seconds=seconds)).recorded_at
+
+    assert nearest(-30) == START
+    assert nearest(70) == START + timedelta(seconds=60)
+    assert nearest(100) == START + timedelta(seconds=120)
+    assert nearest(500) == START + timedelta(seconds=180)
+    assert location_trail.nearest(session.id + 1, START) is None
+
+
+def test_flush_writes_fixes_and_the_newest_position(session):
+    _record(session, 0)
+    _record(session, 60, 18.5 + STEP, accuracy=8.0)
+    assert location_trail.flush() == 2
+    assert SessionLocation.query.filter_by(session_id=session.id).count() == 2
+    db.session.expire_all()
+    row = db.session.get(AttendanceSession, session.id)
+    assert (row.faculty_latitude, row.faculty_location_accuracy) == (18.5 + STEP, 8.0)
+    assert location_trail.flush() == 0
+
+
+def test_failed_flush_keeps_fixes_for_the_next_one(session, monkeypatch, capsys):
+    _record(session, 0)
+    _record(session, 60, 18.5 + STEP)
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError('database unavailable')
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, 'execute', unavailable)
+        assert location_trail.flush() == 0
+    assert 'fixes kept for the next flush' in capsys.readouterr().out
+
+    _record(session, 120, 18.5 + 2 * STEP)
+    assert location_trail.flush() == 3
+    assert [row.recorded_at.replace(tzinfo=timezone.utc) for row in SessionLocation.query.order_by(
+        SessionLocation.id)] == [START, START + timedelta(seconds=60), START + timedelta(seconds=120)]
+
+
+def test_failing_batch_is_dropped_after_the_last_attempt(session, monkeypatch, capsys):
+    _record(session, 0)
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr(db.session, 'execute', unavailable)
+    for _ in range(trail_module.FLUSH_ATTEMPTS):
+        location_trail.flush()
+    assert f'1 fixes dropped after {trail_module.FLUSH_ATTEMPTS} attempts' in capsys.readouterr().out
+    assert location_trail._pending == []
@@ -0,0 +1,105 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.commands import expire_sessions, purge_sessions
+from app.models import Attendance, AttendanceArchive, AttendanceSession
+from app.utils import maintenance as maintenance_module
+from app.utils.maintenance import MaintenanceScheduler
+from app.utils.session_manager import SessionManager
+
+from conftest import add_students
+
+
+def _sessions(faculty, count, status='active', ended_days_ago=0.0, division='A'):
+    """Sessions past their deadline, in id order"""
+    expires = datetime.now(timezone.utc) - timedelta(days=ended_days_ago, seconds=1)
+    rows = [{'session_code': f'{status[:3].upper()}{i:06d}', 'otp': f'{i:04d}', 'faculty_id': faculty.id,
+             'subject': 'Maths', 'status': status, 'expected_division': division,
+             'created_at': expires - timedelta(minutes=10), 'expires_at': expires} for i in range(count)]
+    db.session.execute(AttendanceSession.__table__.insert(), rows)
+    db.session.commit()
+    return [session_id for (session_id,) in db.session.query(AttendanceSession.id).filter_by(status=status)
+            .order_by(AttendanceSession.id)]
+
+
+@pytest.fixture
+def overdue(app, faculty):
+    add_students(2, 'A')
+    return _sessions(faculty, 5)
+
+
+@pytest.mark.parametrize('chunk_size,chunks', [(2, 3), (5, 1), (1, 5), (10, 1)])
+def test_expire_sweep_chunk_boundaries(overdue, chunk_size, chunks):
+    seen = []
+    result = SessionManager().expire_old_sessions(chunk_size=chunk_size, progress=lambda r: seen.append(r.sessions))
+    assert (result.sessions, result.attendance, result.chunks, result.complete) == (5, 10, chunks, True)
+    assert seen == [min(5, chunk_size * (i + 1)) for i in range(chunks)]
+    assert AttendanceSession.query.filter_by(status='expired').count() == 5
+
+
+def test_time_budget_stops_between_chunks(overdue):
+    manager = SessionManager()
+    first = manager.expire_old_sessions(chunk_size=2, time_budget=0)
+    assert (first.sessions, first.chunks, first.complete) == (2, 1, False)
+    # The next run carries on with what is left
+    assert AttendanceSession.query.filter_by(status='active').count() == 3
+    rest = manager.expire_old_sessions(chunk_size=2)
+    assert (rest.sessions, rest.complete) == (3, True)
+
+
+def test_dry_runs_only_count(app, faculty, overdue):
+    retired = _sessions(faculty, 3, status='closed', ended_days_ago=10)
+    db.session.add_all([Attendance(student_id=1, session_id=session_id, subject='Maths', faculty_id=faculty.id,
+                                   date=datetime.now(timezone.utc).date(), status='Present')
+                        for session_id in retired])
+    db.session.commit()
+    manager = SessionManager()
+
+    expire = manager.expire_old_sessions(dry_run=True)
+    assert (expire.sessions, expire.attendance, expire.dry_run) == (5, 10, True)
+    purge = manager.delete_old_sessions(older_than_days=7, dry_run=True)
+    assert (purge.sessions, purge.attendance, purge.locations) == (3, 3, 0)
+    assert AttendanceSession.query.filter_by(status='active').count() == 5
+    assert AttendanceSession.query.count() == 8
+
+    runner = app.test_cli_runner()
+    output = runner.invoke(expire_sessions, ['--dry-run']).output
+    assert output.strip() == 'Would expire 5 sessions, 10 attendance rows, 0 location rows'
+    output = runner.invoke(purge_sessions, ['--chunk-size', '2']).output
+    assert 'chunk 2: 3 sessions' in output and 'Archived 3 sessions, 3 attendance rows' in output
+    assert AttendanceSession.query.count() == 5
+    assert db.session.query(AttendanceArchive).count() == 3
+
+
+def test_only_one_scheduler_leads(app, monkeypatch):
+    monkeypatch.setattr(maintenance_module, 'STARTUP_DELAY_SECONDS', 0.0)
+    runs = {0: [], 1: []}
+    schedulers = [MaintenanceScheduler(app), MaintenanceScheduler(app)]
+    app.extensions['maintenance'] = maintenance_module.maintenance
+    for number, scheduler in enumerate(schedulers):
+        scheduler.election_interval = 0.05
+        for name in list(scheduler._tasks):
+            scheduler.add_task(name, 0, None)
+        scheduler.add_task('count', 0.05, lambda number=number: runs[number].append(time.monotonic()))
+    try:
+        for scheduler in schedulers:
+            scheduler.start()
+        time.sleep(0.5)
+        assert sorted(len(times) > 1 for times in runs.values()) == [False, True]
+        assert min(len(times) for times in runs.values()) == 0
+        assert [scheduler.leader for scheduler in schedulers].count(True) == 1
+
+        # The follower takes over once the leader stops
+        leader = next(scheduler for scheduler in schedulers if scheduler.leader)
+        follower = next(scheduler for scheduler in schedulers if not scheduler.leader)
+        leader.shutdown()
+        deadline = time.monotonic() + 2
+        while not follower.leader and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert follower.leader and not leader.leader
+    finally:
+        for scheduler in schedulers:
+            scheduler.shutdown()
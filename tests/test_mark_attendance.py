@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Attendance
+from app.utils import hash_password
+from app.utils.session_index import SessionSnapshot
+from app.utils.session_manager import (
+    MARK_DUPLICATE, MARK_INVALID_SESSION, MARK_LOCATION_REQUIRED, MARK_OUT_OF_RADIUS, MARK_PRESENT,
+    SessionManager,
+)
+
+from conftest import PASSWORD, add_students
+
+LOCATION = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+FAR_AWAY = {'latitude': 18.6, 'longitude': 73.8, 'accuracy': 5.0}
+
+
+@pytest.fixture
+def live_session(app, faculty):
+    return SessionManager().create_session(faculty.id, 'Maths', LOCATION)
+
+
+@pytest.fixture
+def student(app):
+    return add_students(1)[0]
+
+
+def test_mark_results(live_session, student):
+    manager = SessionManager()
+    unused_otp = '0000' if live_session.otp != '0000' else '0001'
+    assert manager.validate_and_mark_attendance(unused_otp, student.id, LOCATION).status == MARK_INVALID_SESSION
+    assert manager.validate_and_mark_attendance(live_session.otp, student.id, {}).status == MARK_LOCATION_REQUIRED
+    far = manager.validate_and_mark_attendance(live_session.otp, student.id, FAR_AWAY)
+    assert far.status == MARK_OUT_OF_RADIUS and far.distance > 10000 and far.attendance_id is None
+
+    present = manager.validate_and_mark_attendance(live_session.otp, student.id, LOCATION)
+    assert present.status == MARK_PRESENT
+    assert db.session.get(Attendance, present.attendance_id).student_id == student.id
+    assert present.distance == pytest.approx(0, abs=0.01)
+
+    again = manager.validate_and_mark_attendance(live_session.otp, student.id, LOCATION)
+    assert again == (MARK_DUPLICATE, None, None)
+    assert Attendance.query.filter_by(session_id=live_session.id).count() == 1
+
+
+def test_session_closed_after_lookup_is_invalid(live_session, student):
+    manager = SessionManager()
+    snapshot = manager.get_session_by_otp(live_session.otp)
+    manager.close_session(live_session.id)
+    # The caller still holds the snapshot from before the close; the insert refuses it
+    assert isinstance(snapshot, SessionSnapshot)
+    result = manager.validate_and_mark_attendance(live_session.otp, student.id, LOCATION, session=snapshot)
+    assert result.status == MARK_INVALID_SESSION
+    assert Attendance.query.filter_by(session_id=live_session.id, status='Present').count() == 0
+
+
+def test_unique_constraint_rejects_a_second_row(live_session, student):
+    row = dict(student_id=student.id, session_id=live_session.id, subject='Maths', faculty_id=live_session.faculty_id,
+               date=live_session.created_at.date(), status='Present')
+    db.session.add(Attendance(**row))
+    db.session.commit()
+    db.session.add(Attendance(**row))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_mark_attendance_route_maps_results(client, live_session, student):
+    student.password = hash_password(PASSWORD)
+    db.session.commit()
+    login = client.post('/student/login', json={'roll_number': student.roll_number, 'password': PASSWORD}).json
+    headers = {'Authorization': f"Bearer {login['access_token']}"}
+
+    def mark(location):
+        return client.post('/student/mark_attendance', headers=headers,
+                           json={'otp': live_session.otp, 'subject': 'Maths', **location})
+
+    assert mark(FAR_AWAY).status_code == 403
+    first = mark(LOCATION)
+    assert first.status_code == 200, first.json
+    second = mark(LOCATION)
+    assert (second.status_code, second.json['message']) == (400, 'Attendance already marked')
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import AttendanceSession
+from app.utils.otp_pool import OtpPool
+from app.utils.session_index import session_index
+from app.utils.session_manager import SessionManager
+
+
+def _live_session(faculty, otp, code):
+    return AttendanceSession(session_code=code, otp=otp, faculty_id=faculty.id, subject='Maths',
+                             expires_at=datetime.now(timezone.utc) + timedelta(minutes=5))
+
+
+def test_pool_hands_out_every_code_once(app):
+    pool = OtpPool(length=2)
+    codes = [pool.acquire() for _ in range(100)]
+    assert len(set(codes)) == 100
+    assert all(len(code) == 2 and code.isdigit() for code in codes)
+
+
+def test_released_code_is_handed_out_last(app):
+    pool = OtpPool(length=1)
+    first = pool.acquire()
+    pool.release(first)
+    pool.release(first)  # a second release does not queue it twice
+    codes = [pool.acquire() for _ in range(10)]
+    assert codes[-1] == first
+    assert len(set(codes)) == 10
+
+
+def test_refill_skips_codes_of_live_sessions(app, faculty):
+    db.session.add_all([_live_session(faculty, str(digit), f'LIVE{digit}') for digit in range(5)])
+    db.session.commit()
+    session_index.warm()
+    pool = OtpPool(length=1)
+    assert sorted(pool.acquire() for _ in range(5)) == ['5', '6', '7', '8', '9']
+
+
+def test_pool_exhausted_when_every_code_is_live(app, faculty):
+    db.session.add_all([_live_session(faculty, str(digit), f'LIVE{digit}') for digit in range(10)])
+    db.session.commit()
+    session_index.warm()
+    with pytest.raises(RuntimeError, match='No free OTP'):
+        OtpPool(length=1).acquire()
+
+
+def test_ended_sessions_free_their_otp(app, faculty):
+    manager = SessionManager()
+    first = manager.create_session(faculty.id, 'Maths', {})
+    assert manager.close_session(first.id)
+    second = AttendanceSession(session_code='REUSED', otp=first.otp, faculty_id=faculty.id, subject='Maths',
+                               expires_at=datetime.now(timezone.utc) + timedelta(minutes=5))
+    db.session.add(second)
+    db.session.commit()  # unique among active sessions only
+    assert second.id != first.id
+
+
+def test_collision_with_a_live_otp_moves_on_to_the_next_code(app, faculty, monkeypatch):
+    db.session.add(_live_session(faculty, '1234', 'OTHERWORKER'))
+    db.session.commit()
+    codes = iter(['1234', '1234', '5678'])  # another worker already holds 1234
+    monkeypatch.setattr('app.utils.session_manager.generate_otp', lambda length=4: next(codes))
+    session = SessionManager().create_session(faculty.id, 'Maths', {})
+    assert session.otp == '5678'
+    live = [otp for (otp,) in db.session.query(AttendanceSession.otp).filter_by(status='active')]
+    assert sorted(live) == ['1234', '5678']
+
+
+def test_collision_with_a_taken_session_code_moves_on(app, faculty, monkeypatch):
+    db.session.add(_live_session(faculty, '1234', 'TAKEN'))
+    db.session.commit()
+    codes = iter(['TAKEN', 'FREE'])
+    monkeypatch.setattr('app.utils.session_manager.generate_session_code', lambda length=10: next(codes))
+    assert SessionManager().create_session(faculty.id, 'Maths', {}).session_code == 'FREE'
+
+
+def test_other_integrity_errors_are_not_retried(app, faculty, monkeypatch):
+    attempts = []
+    monkeypatch.setattr('app.utils.session_manager.generate_session_code',
+                        lambda length=10: attempts.append(1) or f'CODE{len(attempts)}')
+    with pytest.raises(IntegrityError, match='subject'):
+        SessionManager().create_session(faculty.id, None, {})
+    assert len(attempts) == 1
@@ -0,0 +1,95 @@
+import random
+from datetime import datetime, timedelta, timezone
+from itertools import combinations
+
+import pytest
+
+from app.utils import proxy_detector
+from app.utils.proxy_detector import Mark
+from app.utils.session_manager import calculate_distance
+
+START = datetime(2025, 11, 3, 9, 0, tzinfo=timezone.utc)
+# About 1.1 m of latitude
+METER = 0.00001
+
+
+def _mark(mark_id, student_id, seconds, north_m=0.0, east_m=0.0):
+    return Mark(mark_id, student_id, 1, 18.5 + north_m * METER, 73.8 + east_m * METER, 5.0,
+                START + timedelta(seconds=seconds))
+
+
+def _brute_force(marks, radius, window):
+    """Clusters as sets of attendance ids, by comparing every pair"""
+    parent = {mark.id: mark.id for mark in marks}
+
+    def find(node):
+        while parent[node] != node:
+            node = parent[node]
+        return node
+
+    linked = set()
+    for a, b in combinations(marks, 2):
+        if (a.student_id != b.student_id and abs((a.marked_at - b.marked_at).total_seconds()) <= window
+                and calculate_distance(a.latitude, a.longitude, b.latitude, b.longitude) <= radius):
+            parent[find(a.id)] = find(b.id)
+            linked.update((a.id, b.id))
+    groups = {}
+    for mark_id in linked:
+        groups.setdefault(find(mark_id), set()).add(mark_id)
+    return sorted(sorted(group) for group in groups.values())
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_a_brute_force_comparison(seed):
+    rng = random.Random(seed)
+    # 150 marks by 40 students in a 15 m square over ten minutes: plenty of near misses
+    marks = sorted((_mark(i, rng.randrange(40), rng.uniform(0, 600), rng.uniform(0, 13.5), rng.uniform(0, 13.5))
+                    for i in range(150)), key=lambda mark: (mark.marked_at, mark.id))
+    radius, window = 3.0, 120
+
+    clusters, total = proxy_detector.detect(marks, radius, window)
+    expected = _brute_force(marks, radius, window)
+    assert expected, 'the seeded set should contain clusters'
+    assert sorted(cluster['attendance_ids'] for cluster in clusters) == expected
+    assert total == len(expected)
+
+
+def test_marks_further_apart_than_the_window_are_not_grouped():
+    apart = [_mark(1, 1, 0), _mark(2, 2, 121)]
+    assert proxy_detector.detect(apart, 3.0, 120) == ([], 0)
+
+    within = [_mark(1, 1, 0), _mark(2, 2, 120)]
+    clusters, total = proxy_detector.detect(within, 3.0, 120)
+    assert total == 1 and clusters[0]['student_ids'] == [1, 2]
+
+
+def test_clusters_chain_through_the_window_and_close_when_it_passes():
+    detector = proxy_detector.ProxyDetector(3.0, 120)
+    # 1 and 3 are 200 s apart, but each is within the window of 2
+    assert detector.feed(_mark(1, 1, 0)) == []
+    assert detector.feed(_mark(2, 2, 100, north_m=1)) == []
+    assert detector.feed(_mark(3, 3, 200, north_m=2)) == []
+    # A mark far away in space and time closes the cluster
+    closed = detector.feed(_mark(4, 4, 400, north_m=500))
+    assert [cluster['attendance_ids'] for cluster in closed] == [[1, 2, 3]]
+    assert detector.finish() == []
+
+
+def test_the_same_student_twice_is_not_a_cluster():
+    assert proxy_detector.detect([_mark(1, 7, 0), _mark(2, 7, 10)], 3.0, 120) == ([], 0)
+
+
+def test_limit_keeps_the_largest_clusters():
+    marks, mark_id = [], 0
+    # Four clusters far apart in time, of 2, 4, 3 and 2 students
+    for group, size in enumerate((2, 4, 3, 2)):
+        for student in range(size):
+            mark_id += 1
+            marks.append(_mark(mark_id, group * 10 + student, group * 1000 + student))
+    clusters, total = proxy_detector.detect(marks, 3.0, 120, limit=2)
+    assert total == 4
+    assert [len(cluster['student_ids']) for cluster in clusters] == [4, 3]
+
+    everything, _ = proxy_detector.detect(marks, 3.0, 120)
+    # Ties keep the order the clusters closed in
+    assert [cluster['student_ids'][0] for cluster in everything] == [10, 20, 0, 30]
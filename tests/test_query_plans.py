@@ -0,0 +1,181 @@
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.commands import check_query_plans
+from app.models import Attendance, AttendanceSession, Faculty
+from app.utils import query_plans
+
+from conftest import PASSWORD, add_students
+
+DIVISIONS = 'ABCDEFGH'
+SUBJECTS = ('Maths', 'Physics', 'Chemistry', 'Biology')
+
+
+@pytest.fixture
+def campus(app, faculty):
+    """Ten faculty, 480 students in eight divisions and 400 sessions of 50 marks over 200 days"""
+    staff = [faculty] + [Faculty(full_name=f'Faculty {i}', email=f'faculty{i}@example.edu', password='x')
+                         for i in range(9)]
+    db.session.add_all(staff)
+    db.session.commit()
+    students = {division: add_students(60, division, division) for division in DIVISIONS}
+
+    now = datetime.now(timezone.utc)
+    sessions = []
+    for i in range(400):
+        created = now - timedelta(days=i % 200, hours=i % 7)
+        sessions.append({
+            'session_code': f'CODE{i:05d}', 'otp': f'{i:04d}', 'faculty_id': staff[i % 10].id,
+            'subject': SUBJECTS[i % 4], 'expected_division': DIVISIONS[i % 8], 'status': 'closed' if i else 'active',
+            'created_at': created, 'expires_at': created + timedelta(minutes=10),
+        })
+    db.session.execute(AttendanceSession.__table__.insert(), sessions)
+    db.session.commit()
+
+    marks = []
+    for session_id, session in enumerate(sessions, 1):
+        for k, student in enumerate(students[session['expected_division']][:50]):
+            marks.append({
+                'student_id': student.id, 'session_id': session_id, 'subject': session['subject'],
+                'faculty_id': session['faculty_id'], 'date': session['created_at'].date(),
+                'status': 'Present' if k % 6 else 'Absent', 'marked_at': session['created_at'] + timedelta(seconds=k),
+                'student_latitude': 18.52 + (k % 10) * 0.001, 'student_longitude': 73.85 + (k // 10) * 0.001,
+            })
+    db.session.execute(Attendance.__table__.insert(), marks)
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def test_route_queries_use_an_index_on_seeded_data(campus):
+    failures = {}
+    for label, query in query_plans.route_queries():
+        plan = query_plans.explain(query)
+        if query_plans.full_scans(plan, query):
+            failures[label] = plan
+    assert failures == {}
+
+
+def test_route_queries_use_an_index_on_an_empty_database(app):
+    failures = {label: query_plans.explain(query) for label, query in query_plans.route_queries()
+                if query_plans.full_scans(query_plans.explain(query), query)}
+    assert failures == {}
+
+
+def test_full_scan_is_detected(campus):
+    unindexed = db.session.query(Attendance.id).filter(Attendance.student_latitude > 18)
+    assert query_plans.full_scans(query_plans.explain(unindexed)) == ['attendance']
+
+
+def test_check_query_plans_command(app, campus):
+    result = app.test_cli_runner().invoke(check_query_plans)
+    assert result.exit_code == 0, result.output
+    assert 'All route queries use an index' in result.output
+    assert 'FULL SCAN' not in result.output
+
+
+def _route_calls(client, campus_ids):
+    """One request per API route, in an order that leaves each later call something to act on"""
+    faculty = client.post('/faculty/login', json={'email': 'ada@example.edu', 'password': PASSWORD}).json
+    headers = {'Authorization': f"Bearer {faculty['access_token']}"}
+    refresh = {'Authorization': f"Bearer {faculty['refresh_token']}"}
+    client.post('/student/register', json={'full_name': 'New Student', 'roll_number': 'NEW1', 'division': 'A',
+                                           'mobile_number': '0', 'email': 'new@example.edu', 'password': PASSWORD})
+    student = client.post('/student/login', json={'roll_number': 'NEW1', 'password': PASSWORD}).json
+    student_headers = {'Authorization': f"Bearer {student['access_token']}"}
+    code, attendance_id = campus_ids
+    term = f'start_date={date.today() - timedelta(days=180)}&end_date={date.today()}'
+    location = {'latitude': 18.52, 'longitude': 73.85}
+    job = client.post(f'/faculty/export_jobs?faculty_id=1&{term}', headers=headers).json.get('job', {}).get('id', 'x')
+    return [
+        ('POST', '/faculty/login', None, {'email': 'ada@example.edu', 'password': PASSWORD}),
+        ('GET', '/faculty/profile', headers),
+        ('POST', '/faculty/refresh', refresh, None),
+        ('POST', '/faculty/start_session', headers, {'subject': 'Maths', 'location': location}),
+        ('POST', '/faculty/generate_otp', headers, {'subject': 'Maths'}),
+        ('GET', '/faculty/get_active_session', headers), ('GET', '/faculty/get_active_session/code', headers),
+        ('POST', '/faculty/update_location', headers, {**location, 'accuracy': 5}),
+        ('POST', f'/faculty/sessions/{code}/bulk_mark', headers,
+         {'marks': [{'roll_number': 'A0051', **location}, {'student_id': 3, **location}]}),
+        ('GET', f'/faculty/sessions/{code}/live?poll=1&last_event_id=1', headers),
+        ('POST', f'/faculty/sessions/{code}/revalidate', headers, {}),
+        ('GET', f'/faculty/sessions/{code}/proxy_clusters', headers),
+        ('GET', f'/faculty/proxy_clusters?{term}', headers),
+        ('GET', '/faculty/list?q=Ada', headers),
+        ('GET', f'/faculty/view_reports?faculty_id=1&{term}', headers),
+        ('GET', f'/faculty/view_reports?faculty_name=Ada&{term}&sort=student', headers),
+        ('GET', '/faculty/stats', headers), ('GET', '/faculty/maintenance', headers),
+        ('GET', f'/faculty/attendance_summary?faculty_name=Ada&{term}&group_by=subject', headers),
+        ('GET', f'/faculty/export_reports?division=B&{term}&gzip=0', headers),
+        ('POST', '/faculty/export_jobs', headers, None),
+        ('GET', f'/faculty/export_jobs/{job}', headers), ('GET', f'/faculty/export_jobs/{job}/download', headers),
+        ('GET', '/faculty/archive/sessions/1', headers),
+        ('DELETE', f'/faculty/attendance/{attendance_id}', headers),
+        ('POST', '/student/register', None, {'full_name': 'Other', 'roll_number': 'NEW2', 'division': 'A',
+                                             'mobile_number': '0', 'email': 'new2@example.edu', 'password': 'x'}),
+        ('POST', '/student/login', None, {'roll_number': 'NEW1', 'password': PASSWORD}),
+        ('GET', '/student/profile', student_headers),
+        ('POST', '/student/refresh', {'Authorization': f"Bearer {student['refresh_token']}"}),
+        ('POST', '/student/mark_attendance', student_headers, {'otp': '0000', 'subject': 'Maths', **location}),
+        ('POST', '/faculty/close_session', headers, None),
+    ]
+
+
+def test_every_route_statement_uses_an_index(app, client, campus):
+    """Run each API route and EXPLAIN the statements it actually sent, so new routes cannot slip past"""
+    session = db.session.get(AttendanceSession, 1)
+    attendance_id = db.session.query(Attendance.id).filter_by(session_id=2).limit(1).scalar()
+    calls = _route_calls(client, (session.session_code, attendance_id))
+    adapter = app.url_map.bind('localhost')
+    api_routes = {(rule.endpoint, method) for rule in app.url_map.iter_rules()
+                  if rule.endpoint.startswith(('faculty_bp.', 'student.')) for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    called = {(adapter.match(path.split('?')[0], method)[0], method) for method, path, *_ in calls}
+    assert api_routes - called == set(), 'add the new route to _route_calls'
+
+    statements, thread = [], threading.get_ident()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread and not executemany and statement.lstrip().split(' ', 1)[0].upper() in (
+                'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'):
+            statements.append((statement, parameters))
+
+    # A route that fails still sent its statements; the plans are what is checked here
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        for method, path, *rest in calls:
+            headers, body = (rest + [None, None])[:2]
+            response = client.open(path, method=method, headers=headers, json=body)
+            response.get_data()  # runs a streamed body's queries
+            response.close()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert len(statements) > 30
+    failures = {}
+    for statement, parameters in dict(statements).items():
+        plan = query_plans.explain(statement, parameters)
+        if query_plans.full_scans(plan, statement):
+            failures[statement] = plan
+    assert failures == {}
+
+
+def test_postgres_plans_price_out_sequential_scans(postgres_app):
+    faculty = Faculty(full_name='Ada Faculty', email='ada@example.edu', password='x')
+    db.session.add(faculty)
+    db.session.commit()
+    add_students(20)
+    # Tiny tables: without enable_seqscan = off every plan would be a Seq Scan
+    failures = {label: plan for label, query in query_plans.route_queries()
+                if query_plans.full_scans(plan := query_plans.explain(query), query)}
+    assert failures == {}
+
+    unindexed = db.session.query(Attendance.id).filter(Attendance.student_latitude > 18)
+    plan = query_plans.explain(unindexed)
+    assert query_plans.full_scans(plan) == ['attendance']
+    # SET LOCAL ends with the EXPLAIN's transaction
+    assert db.session.execute(db.text('SHOW enable_seqscan')).scalar() == 'on'
@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import db
+from app.models import Attendance
+from app.utils import reports
+
+from conftest import add_students
+
+SIZE = 7
+
+
+@pytest.fixture
+def marks(app, faculty):
+    """45 marks with repeated sort values, so the id tiebreaker matters"""
+    students = add_students(15, 'A', 'A') + add_students(15, 'B', 'B')
+    day = date(2026, 3, 2)
+    db.session.add_all([
+        Attendance(student_id=student.id, subject=('Maths', 'Physics', 'Art')[i % 3], faculty_id=faculty.id,
+                   date=day + timedelta(days=i % 4), status='Present' if i % 4 else 'Absent')
+        for i, student in enumerate(students + students[:15])
+    ])
+    db.session.commit()
+
+
+def _page(client, headers, sort, order, cursor=None):
+    query = f'size={SIZE}&sort={sort}&order={order}&with_total=0'
+    response = client.get(f"/faculty/view_reports?{query}{'&cursor=' + cursor if cursor else ''}", headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def _insert_more(faculty, batch: int):
+    """Marks that sort before, between and after the existing ones on every key"""
+    students = add_students(3, ('0', 'M', 'Z')[batch % 3], f'{"AMZ"[batch % 3]}{batch}X')
+    db.session.add_all([
+        Attendance(student_id=student.id, subject=('Aardvark', 'Maths', 'Zoology')[i], faculty_id=faculty.id,
+                   date=date(2026, 3, 2) + timedelta(days=(-5, 2, 30)[i]), status=('Absent', 'Late', 'Present')[i])
+        for i, student in enumerate(students)
+    ])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+@pytest.mark.parametrize('sort', sorted(reports.SORT_COLUMNS))
+def test_cursor_walk_is_stable_while_rows_are_inserted(client, faculty, faculty_headers, marks, sort, order):
+    expected = [record['id'] for record in client.get(
+        f'/faculty/view_reports?size=100&sort={sort}&order={order}', headers=faculty_headers).json['records']]
+    assert len(expected) == 45
+
+    walked, cursor, batch = [], None, 0
+    while True:
+        page = _page(client, faculty_headers, sort, order, cursor)
+        walked.extend(record['id'] for record in page['records'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+        _insert_more(faculty, batch)
+        batch += 1
+
+    assert batch >= 6
+    assert len(walked) == len(set(walked)), 'a row was returned twice'
+    assert [row_id for row_id in walked if row_id in set(expected)] == expected, 'a row was skipped or moved'
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_prev_cursor_returns_the_previous_page(client, faculty_headers, marks, order):
+    first = _page(client, faculty_headers, 'student', order)
+    second = _page(client, faculty_headers, 'student', order, first['next_cursor'])
+    back = _page(client, faculty_headers, 'student', order, second['prev_cursor'])
+    assert [record['id'] for record in back['records']] == [record['id'] for record in first['records']]
+    assert back['prev_cursor'] is None
+
+
+def test_cursor_from_another_sort_is_rejected(client, faculty_headers, marks):
+    cursor = _page(client, faculty_headers, 'date', 'desc')['next_cursor']
+    response = client.get(f'/faculty/view_reports?size={SIZE}&sort=roll&cursor={cursor}', headers=faculty_headers)
+    assert response.status_code == 400
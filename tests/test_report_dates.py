@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import db
+from app.models import Attendance
+from app.utils import query_plans, reports
+
+from conftest import add_students
+
+
+@pytest.mark.parametrize('value,start,end', [
+    ('2025-11-03', date(2025, 11, 3), date(2025, 11, 4)),
+    ('2025-12-31', date(2025, 12, 31), date(2026, 1, 1)),
+    ('2025-11', date(2025, 11, 1), date(2025, 12, 1)),
+    ('2025-12', date(2025, 12, 1), date(2026, 1, 1)),
+    ('2025-W45', date(2025, 11, 3), date(2025, 11, 10)),
+    ('2026w01', date(2025, 12, 29), date(2026, 1, 5)),
+    ('2025-odd', date(2025, 7, 1), date(2026, 1, 1)),
+    ('2025-EVEN', date(2026, 1, 1), date(2026, 7, 1)),
+    ('2025', date(2025, 1, 1), date(2026, 1, 1)),
+    (' 2025-11 ', date(2025, 11, 1), date(2025, 12, 1)),
+])
+def test_date_span(value, start, end):
+    assert reports.date_span(value) == (start, end)
+
+
+@pytest.mark.parametrize('value', ['', '2025-13', '2025-02-30', '2025-W54', '2025-spring', '11/03/2025', '%2025%'])
+def test_invalid_dates_are_rejected(value):
+    with pytest.raises(ValueError):
+        reports.date_span(value)
+
+
+def test_open_ended_and_combined_bounds():
+    assert reports.date_bounds() == (None, None)
+    assert reports.date_bounds(start='2025-09') == (date(2025, 9, 1), None)
+    assert reports.date_bounds(end='2025-11') == (None, date(2025, 12, 1))
+    assert reports.date_bounds(start='2025-09', end='2025-11') == (date(2025, 9, 1), date(2025, 12, 1))
+    # A day inside a term narrows it
+    assert reports.date_bounds('2025-odd', start='2025-10-15') == (date(2025, 10, 15), date(2026, 1, 1))
+    with pytest.raises(ValueError):
+        reports.date_bounds(start='2025-12', end='2025-11')
+
+
+@pytest.fixture
+def marks(app, faculty):
+    """One mark a day from 2025-10-25 to 2025-11-14"""
+    student = add_students(1)[0]
+    db.session.add_all([
+        Attendance(student_id=student.id, subject='Maths', faculty_id=faculty.id, status='Present',
+                   date=date(2025, 10, 25) + timedelta(days=i))
+        for i in range(21)
+    ])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('query,days', [
+    ('date=2025-11-03', ['2025-11-03']),
+    ('date=2025-W45', [f'2025-11-{day:02d}' for day in range(3, 10)]),
+    ('date=2025-10', [f'2025-10-{day:02d}' for day in range(25, 32)]),
+    ('start_date=2025-11-12', ['2025-11-12', '2025-11-13', '2025-11-14']),
+    ('end_date=2025-10-26', ['2025-10-25', '2025-10-26']),
+    ('start_date=2025-10-31&end_date=2025-11-01', ['2025-10-31', '2025-11-01']),
+])
+def test_view_reports_date_filters(client, faculty_headers, marks, query, days):
+    response = client.get(f'/faculty/view_reports?size=100&sort=date&order=asc&{query}', headers=faculty_headers)
+    assert response.status_code == 200
+    assert [record['date'] for record in response.json['records']] == days
+    assert response.json['total'] == len(days)
+
+
+@pytest.mark.parametrize('route', ['view_reports', 'export_reports'])
+def test_unparseable_date_is_a_bad_request(client, faculty_headers, marks, route):
+    response = client.get(f'/faculty/{route}?date=2025-11-3x', headers=faculty_headers)
+    assert response.status_code == 400
+    assert 'Invalid date' in response.json['message']
+
+
+@pytest.mark.parametrize('value', ['2025-11-03', '2025-11', '2025-W45', '2025-odd', '2025'])
+def test_date_filter_is_an_index_range_scan(app, marks, value):
+    start, end = reports.date_span(value)
+    query = reports.report_query({'date_from': start.isoformat(), 'date_to': end.isoformat()})
+    sql = str(query.statement.compile(db.engine)).lower()
+    assert 'like' not in sql and 'cast' not in sql
+    plan = query_plans.explain(query)
+    assert query_plans.full_scans(plan) == []
+    assert any('attendance using index' in line.lower() and 'date>' in line.replace(' ', '') for line in plan), plan
+
+
+@pytest.mark.parametrize('value', ['2025-11-03', '2025-W45', '2025-odd'])
+def test_date_filter_is_an_index_range_scan_on_postgres(postgres_app, value):
+    start, end = reports.date_span(value)
+    query = reports.report_query({'date_from': start.isoformat(), 'date_to': end.isoformat()})
+    plan = query_plans.explain(query)
+    assert query_plans.full_scans(plan) == []
+    # One range condition on the bare column, served by the date index
+    text = '\n'.join(plan)
+    assert 'ix_attendance_date' in text, plan
+    assert f"(date >= '{start.isoformat()}'::date) AND (date < '{end.isoformat()}'::date)" in text, plan
@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import Attendance, Faculty
+from app.utils import reports
+
+from conftest import add_students
+
+
+@pytest.fixture
+def marks(app, faculty):
+    """120 marks by two faculty over 60 students in two divisions"""
+    other = Faculty(full_name='Bo Faculty', email='bo@example.edu', password='x')
+    db.session.add(other)
+    db.session.commit()
+    students = add_students(30, 'A', 'A') + add_students(30, 'B', 'B')
+    day = date(2026, 3, 2)
+    db.session.add_all([
+        Attendance(student_id=student.id, subject='Maths', faculty_id=(faculty, other)[i % 2].id,
+                   date=day + timedelta(days=i % 10), status='Present' if i % 3 else 'Absent')
+        for i, student in enumerate(students * 2)
+    ])
+    db.session.commit()
+
+
+@pytest.fixture
+def statements(app):
+    """SQL statements run while the test makes requests"""
+    executed = []
+
+    def record(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def _report_statements(client, headers, statements, query):
+    statements.clear()
+    response = client.get(f'/faculty/view_reports?{query}', headers=headers)
+    assert response.status_code == 200, response.json
+    return len(statements), response.json
+
+
+@pytest.mark.parametrize('query', ['', 'division=A&sort=student&order=asc', 'status=Present&sort=roll',
+                                   'with_total=0&sort=subject'])
+def test_query_count_does_not_grow_with_page_size(client, faculty_headers, marks, statements, query):
+    small, page = _report_statements(client, faculty_headers, statements, f'size=5&{query}')
+    large, full_page = _report_statements(client, faculty_headers, statements, f'size=100&{query}')
+    assert len(page['records']) == 5
+    assert len(full_page['records']) > 5
+    assert small == large
+    assert large <= 2  # the page, and the total unless it was turned off
+
+
+def test_records_carry_names_without_extra_queries(client, faculty_headers, marks, statements):
+    count, page = _report_statements(client, faculty_headers, statements, 'size=20&faculty_name=Bo')
+    assert count == 2
+    assert {record['faculty_name'] for record in page['records']} == {'Bo Faculty'}
+    assert all(record['student_name'].startswith('Student ') for record in page['records'])
+
+
+def test_division_filter_and_student_sort_join_student_once(app):
+    sql = str(reports.report_query({'division': 'A', 'faculty_name': 'Bo'}, 'student', 'asc').statement.compile(
+        db.engine)).lower()
+    assert sql.count('join student') == 1
+    assert sql.count('join faculty') == 1
+    # Only the reported columns, none of the location data
+    assert 'student_latitude' not in sql and 'distance_from_faculty' not in sql
@@ -0,0 +1,120 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import delete
+
+from app import db
+from app.models import Attendance, AttendanceDaily
+from app.utils import rollup
+
+from conftest import add_students
+
+DAY = date(2026, 3, 2)
+
+
+def _add_marks(faculty, students, statuses, subject='Maths', day=DAY) -> list[int]:
+    rows = [Attendance(student_id=student.id, subject=subject, faculty_id=faculty.id, date=day, status=status)
+            for student, status in zip(students, statuses)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [row.id for row in rows]
+
+
+def _counts(**filters) -> dict:
+    return {group.get('division'): group['by_status'] for group in rollup.summary(filters, ['division'])}
+
+
+def _delete(condition):
+    rollup.remove(condition)
+    db.session.execute(delete(Attendance).where(condition))
+    db.session.commit()
+
+
+def test_catch_up_counts_rows_once_they_have_been_seen(app, faculty):
+    students = add_students(3, 'A')
+    _add_marks(faculty, students, ['Present', 'Present', 'Absent'])
+    # The first run only notes the newest id, as inserts below it may still be committing
+    assert rollup.catch_up() == 0
+    assert _counts() == {}
+    assert rollup.catch_up() == 3
+    assert _counts() == {'A': {'Present': 2, 'Absent': 1}}
+
+    more = add_students(2, 'B', 'B')
+    _add_marks(faculty, more, ['Present', 'Late'])
+    assert rollup.catch_up() == 0
+    assert rollup.catch_up() == 2
+    assert rollup.catch_up() == 0
+    assert _counts() == {'A': {'Present': 2, 'Absent': 1}, 'B': {'Present': 1, 'Late': 1}}
+    assert rollup.drift() == []
+
+
+def test_rows_deleted_before_the_watermark_passes_are_never_counted(app, faculty):
+    students = add_students(3, 'A')
+    ids = _add_marks(faculty, students, ['Present'] * 3)
+    rollup.catch_up()
+    _delete(Attendance.id == ids[0])
+    assert rollup.catch_up() == 2
+    assert _counts() == {'A': {'Present': 2}}
+    assert rollup.drift() == []
+
+
+def test_rows_deleted_after_the_watermark_passes_are_taken_out(app, faculty):
+    students = add_students(3, 'A')
+    ids = _add_marks(faculty, students, ['Present', 'Present', 'Absent'])
+    rollup.catch_up()
+    rollup.catch_up()
+    _delete(Attendance.id.in_(ids[1:]))
+    assert _counts() == {'A': {'Present': 1}}
+    assert rollup.drift() == []
+
+
+def test_drift_is_reported_and_rebuilt(app, faculty):
+    runner = app.test_cli_runner()
+    _add_marks(faculty, add_students(2, 'A'), ['Present', 'Absent'])
+    rollup.catch_up()
+    rollup.catch_up()
+    assert runner.invoke(args=['rebuild-rollup', '--check']).exit_code == 0
+
+    db.session.query(AttendanceDaily).filter_by(status='Present').update({'count': 5})
+    db.session.commit()
+    result = runner.invoke(args=['rebuild-rollup', '--check'])
+    assert result.exit_code != 0
+    assert f'{DAY}  faculty {faculty.id}  Maths  A  Present: stored 5, actual 1' in result.output
+    assert '1 rollup rows are out of date' in result.output
+
+    assert 'Rebuilt rollup: 2 rows' in runner.invoke(args=['rebuild-rollup']).output
+    assert runner.invoke(args=['rebuild-rollup', '--check']).exit_code == 0
+
+
+def test_rebuild_counts_everything_and_moves_the_watermark(app, faculty):
+    ids = _add_marks(faculty, add_students(2, 'A'), ['Present', 'Absent'])
+    rollup.rebuild()
+    db.session.commit()
+    assert rollup.watermark(lock=False).last_id == ids[-1]
+    assert _counts() == {'A': {'Present': 1, 'Absent': 1}}
+    assert rollup.catch_up() == 0
+    assert rollup.catch_up() == 0
+
+
+@pytest.fixture
+def counted(app, faculty):
+    _add_marks(faculty, add_students(4, 'A', 'A'), ['Present', 'Present', 'Present', 'Absent'])
+    _add_marks(faculty, add_students(2, 'B', 'B'), ['Present', 'Absent'], subject='Physics', day=date(2026, 3, 3))
+    rollup.catch_up()
+    rollup.catch_up()
+
+
+def test_attendance_summary(client, faculty_headers, counted):
+    response = client.get('/faculty/attendance_summary?group_by=date,division', headers=faculty_headers)
+    assert response.status_code == 200
+    assert response.json['total'] == 6
+    assert response.json['groups'] == [
+        {'date': '2026-03-02', 'division': 'A', 'total': 4, 'by_status': {'Present': 3, 'Absent': 1},
+         'attendance_rate': 0.75},
+        {'date': '2026-03-03', 'division': 'B', 'total': 2, 'by_status': {'Present': 1, 'Absent': 1},
+         'attendance_rate': 0.5},
+    ]
+
+    filtered = client.get('/faculty/attendance_summary?group_by=subject&subject=Physics', headers=faculty_headers)
+    assert [(group['subject'], group['total']) for group in filtered.json['groups']] == [('Physics', 2)]
+    assert client.get('/faculty/attendance_summary?group_by=room', headers=faculty_headers).status_code == 400
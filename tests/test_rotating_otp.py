@@ -0,0 +1,77 @@
+import pytest
+
+from app.utils import rotating_otp
+from app.utils.session_index import session_index
+from app.utils.session_manager import SessionManager
+
+LOCATION = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+
+
+@pytest.fixture
+def window(monkeypatch):
+    """Pin the current code window; returns a setter to move it"""
+    current = {'window': rotating_otp.current_window()}
+    monkeypatch.setattr(rotating_otp, 'current_window', lambda now=None: current['window'])
+
+    def move(to):
+        current['window'] = to
+    move.start = current['window']
+    return move
+
+
+@pytest.fixture
+def rotating_session(app, faculty, window):
+    return SessionManager().create_session(faculty.id, 'Maths', LOCATION, rotating=True)
+
+
+def _lookup(code):
+    snapshot = SessionManager().get_session_by_otp(code, 'Maths')
+    return snapshot.id if snapshot else None
+
+
+def test_codes_are_accepted_within_the_drift(rotating_session, window):
+    secret = rotating_session.otp_secret
+    for step in range(-rotating_otp.ALLOWED_DRIFT, rotating_otp.ALLOWED_DRIFT + 1):
+        assert _lookup(rotating_otp.code_for(secret, window.start + step)) == rotating_session.id
+
+
+def test_codes_outside_the_drift_are_rejected(rotating_session, window):
+    secret = rotating_session.otp_secret
+    accepted = rotating_otp.accepted_codes(secret, window.start)
+    stale = [rotating_otp.code_for(secret, window.start + step) for step in (-5, -3, -2, 2, 3, 5)]
+    for code in stale:
+        if code not in accepted:  # 4-digit codes of far windows can repeat
+            assert _lookup(code) is None
+
+    # The same code works again once its window comes round
+    code = rotating_otp.code_for(secret, window.start + 3)
+    window(window.start + 3)
+    assert _lookup(code) == rotating_session.id
+
+
+def test_stored_otp_is_never_accepted_for_a_rotating_session(rotating_session, window):
+    stored = rotating_session.otp
+    for start in range(window.start, window.start + 20):
+        window(start)
+        if stored not in rotating_otp.accepted_codes(rotating_session.otp_secret, start):
+            assert _lookup(stored) is None
+    # Not even after a full re-sync from the database
+    session_index.warm()
+    if stored not in rotating_otp.accepted_codes(rotating_session.otp_secret, window.start + 19):
+        assert _lookup(stored) is None
+
+
+def test_code_for_is_deterministic_and_display_counts_down():
+    secret = rotating_otp.new_secret()
+    assert rotating_otp.code_for(secret, 1000) == rotating_otp.code_for(secret, 1000)
+    assert len(rotating_otp.code_for(secret, 1000)) == 4
+    period = rotating_otp.ROTATION_SECONDS
+    code, remaining = rotating_otp.current_code(secret, now=1000 * period + 1)
+    assert (code, remaining) == (rotating_otp.code_for(secret, 1000), period - 1)
+
+
+def test_start_session_shows_the_live_code(client, faculty_headers, window):
+    started = client.post('/faculty/start_session', headers=faculty_headers,
+                          json={'subject': 'Maths', 'location': LOCATION, 'rotating_otp': True}).json
+    assert started['rotating'] is True
+    assert _lookup(started['otp']) is not None
@@ -0,0 +1,109 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models import Attendance, AttendanceSession
+from app.utils.session_expiry import SessionExpiry, session_expiry
+from app.utils.session_manager import SessionManager
+
+from conftest import add_students
+
+LOCATION = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+
+
+@pytest.fixture
+def expiry(app):
+    """The process timer with no deadlines left over from other tests; stopped afterwards"""
+    with session_expiry._condition:
+        session_expiry._heap.clear()
+        session_expiry._deadlines.clear()
+    yield session_expiry
+    session_expiry.shutdown()
+
+
+def _session_due_in(faculty, seconds, division='A'):
+    session = SessionManager().create_session(faculty.id, 'Maths', LOCATION, division=division)
+    session.expires_at = datetime.now(timezone.utc) + timedelta(seconds=seconds)
+    db.session.commit()
+    return session
+
+
+def _status(session_id):
+    db.session.expire_all()
+    return db.session.get(AttendanceSession, session_id).status
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_session_expires_at_its_deadline(expiry, faculty):
+    add_students(3, 'A')
+    session = _session_due_in(faculty, 0.5)
+    expiry.schedule(session.id, session.expires_at)
+    deadline = session.expires_at.timestamp()
+    expiry.start()
+
+    time.sleep(0.3)
+    assert _status(session.id) == 'active'
+    assert _wait_for(lambda: _status(session.id) == 'expired')
+    # Fired at the deadline, not on the next sweep
+    assert time.time() - deadline < 1.0
+    assert Attendance.query.filter_by(session_id=session.id, status='Absent').count() == 3
+    assert expiry.pending() == 0
+
+
+def test_start_loads_active_sessions(expiry, faculty):
+    session = _session_due_in(faculty, 0.2)
+    expiry.cancel(session.id)  # as in a freshly started process, which only knows the database
+    expiry.start()
+    assert _wait_for(lambda: _status(session.id) == 'expired')
+
+
+def test_close_cancels_the_deadline(expiry, faculty):
+    closed = _session_due_in(faculty, 0.2)
+    expiry.schedule(closed.id, closed.expires_at)
+    SessionManager().close_session(closed.id)
+    assert expiry.pending() == 0
+    expiry.start()
+    time.sleep(0.5)
+    assert _status(closed.id) == 'closed'
+
+
+def test_cancelled_and_rescheduled_entries_are_skipped():
+    timer = SessionExpiry()
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    for session_id in (1, 2, 3):
+        timer.schedule(session_id, past)
+    timer.cancel(1)
+    timer.schedule(2, datetime.now(timezone.utc) + timedelta(minutes=5))
+    assert timer._due() == [3]
+    assert timer.pending() == 1
+    # A stopping timer hands out nothing more
+    timer._stopping = True
+    assert timer._due() is None
+
+
+def test_firing_in_two_processes_expires_once(app, expiry, faculty):
+    add_students(2, 'A')
+    session = _session_due_in(faculty, 0.3)
+    other = SessionExpiry(app)  # a second worker process with the same deadline
+    app.extensions['session_expiry'] = session_expiry
+    try:
+        for timer in (expiry, other):
+            timer.schedule(session.id, session.expires_at)
+            timer.start()
+        assert _wait_for(lambda: _status(session.id) == 'expired')
+        assert _wait_for(lambda: expiry.pending() == 0 and other.pending() == 0)
+        time.sleep(0.2)
+        assert Attendance.query.filter_by(session_id=session.id).count() == 2
+        assert SessionManager().expire_sessions([session.id]) == (0, 0)
+    finally:
+        other.shutdown()
@@ -0,0 +1,113 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models import AttendanceSession
+from app.utils import rotating_otp
+from app.utils.session_index import session_index
+from app.utils.session_manager import SessionManager
+
+LOCATION = {'latitude': 18.5, 'longitude': 73.8, 'accuracy': 5.0}
+
+
+def _insert(faculty, otp='4321', expires_in=timedelta(minutes=5), secret=None):
+    """An active session written straight to the database, as another worker would"""
+    session = AttendanceSession(session_code=f'OTHER{otp}', otp=otp, faculty_id=faculty.id, subject='Maths',
+                                expires_at=datetime.now(timezone.utc) + expires_in, otp_secret=secret)
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+@pytest.fixture
+def fresh_index(app):
+    """The index just warmed, so the TTL does not re-sync during the test"""
+    session_index.warm()
+    yield session_index
+
+
+def test_miss_falls_through_to_the_database(fresh_index, faculty):
+    session = _insert(faculty)
+    assert session.id not in {snapshot.id for snapshot in fresh_index._by_id.values()}
+
+    found = fresh_index.get_by_otp('4321')
+    assert found is not None and found.id == session.id
+    assert fresh_index.get_by_faculty(faculty.id).id == session.id
+    assert fresh_index.get_by_otp('0000') is None
+
+
+def test_create_close_and_expire_update_the_index(fresh_index, faculty):
+    manager = SessionManager()
+    session = manager.create_session(faculty.id, 'Maths', LOCATION)
+    assert fresh_index._by_id[session.id].otp == session.otp
+    assert fresh_index._by_faculty[faculty.id] == session.id
+
+    manager.close_session(session.id)
+    assert session.id not in fresh_index._by_id
+    assert fresh_index.get_by_otp(session.otp) is None
+
+    overdue = manager.create_session(faculty.id, 'Maths', LOCATION)
+    assert overdue.id in fresh_index._by_id
+    overdue.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.session.commit()
+    assert manager.expire_sessions([overdue.id])[0] == 1
+    assert overdue.id not in fresh_index._by_id
+    assert faculty.id not in fresh_index._by_faculty
+
+
+def test_stale_entries_last_until_the_ttl_re_warms(fresh_index, faculty):
+    session = _insert(faculty)
+    assert fresh_index.get_by_otp('4321').id == session.id
+
+    # Closed by another worker: still served from the index within the TTL
+    AttendanceSession.query.filter_by(id=session.id).update({'status': 'closed'})
+    db.session.commit()
+    assert fresh_index.get_by_otp('4321') is not None
+
+    fresh_index._synced_at = time.monotonic() - fresh_index.ttl - 1
+    assert fresh_index.get_by_otp('4321') is None
+    assert session.id not in fresh_index._by_id
+
+
+def test_rotating_routes_rebuild_on_window_rollover(fresh_index, faculty, monkeypatch):
+    window = rotating_otp.current_window()
+    monkeypatch.setattr(rotating_otp, 'current_window', lambda now=None: window)
+    secret = rotating_otp.new_secret()
+    session = _insert(faculty, otp='9999', secret=secret)
+    fresh_index.warm()
+
+    # A later window whose code is not accepted now (4-digit codes can collide)
+    later = next(later for later in range(window + 2 * rotating_otp.ALLOWED_DRIFT + 1, window + 100)
+                 if rotating_otp.code_for(secret, later) not in rotating_otp.accepted_codes(secret, window))
+    future_code = rotating_otp.code_for(secret, later)
+    current_code = rotating_otp.code_for(secret, window)
+    assert fresh_index.get_by_otp(current_code).id == session.id
+    assert fresh_index._candidates(future_code) == []
+
+    monkeypatch.setattr(rotating_otp, 'current_window', lambda now=None: later)
+    assert [snapshot.id for snapshot in fresh_index._candidates(future_code)] == [session.id]
+    assert fresh_index._routes_window == later
+    if current_code not in rotating_otp.accepted_codes(secret, later):
+        assert fresh_index._candidates(current_code) == []
+
+
+def test_stored_otp_of_a_rotating_session_is_not_accepted(fresh_index, faculty):
+    secret = rotating_otp.new_secret()
+    _insert(faculty, otp='9999', secret=secret)
+    if '9999' not in rotating_otp.accepted_codes(secret, rotating_otp.current_window()):
+        assert fresh_index.get_by_otp('9999') is None
+
+
+def test_expired_but_active_row_is_not_served(fresh_index, faculty):
+    session = _insert(faculty, expires_in=timedelta(seconds=-1))
+    # Not loaded on a miss
+    assert fresh_index.get_by_otp('4321') is None
+    assert fresh_index.get_by_faculty(faculty.id) is None
+
+    # Nor served when it is still in the index, waiting for session_expiry
+    fresh_index.put(session)
+    assert session.id in fresh_index._by_id
+    assert fresh_index.get_by_otp('4321') is None
+    assert fresh_index.get_by_faculty(faculty.id) is None
@@ -0,0 +1,101 @@
+import io
+import zipfile
+from datetime import date, datetime, timedelta
+from xml.etree import ElementTree
+
+from app import db
+from app.models import Attendance
+from app.utils import xlsx
+
+from conftest import add_students
+
+NS = {'m': xlsx._MAIN_NS}
+
+
+def _workbook(chunks) -> zipfile.ZipFile:
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+    assert archive.testzip() is None
+    return archive
+
+
+def _sheet_names(archive):
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    return [sheet.get('name') for sheet in workbook.iterfind('m:sheets/m:sheet', NS)]
+
+
+def _rows(archive, number=1):
+    """Each row of a sheet as a list of (style, type, text) cells"""
+    sheet = ElementTree.fromstring(archive.read(f'xl/worksheets/sheet{number}.xml'))
+    return [[(cell.get('s'), cell.get('t'), ''.join(cell.itertext()) or None) for cell in row]
+            for row in sheet.iterfind('m:sheetData/m:row', NS)]
+
+
+def test_workbook_parts_and_typed_cells():
+    moment = datetime(2025, 11, 3, 18, 0)
+    chunks = list(xlsx.stream_xlsx(['Name', 'Count', 'Day', 'At', 'Ok', 'Rate', 'Gap'],
+                                   [['Ada', 3, date(2025, 11, 3), moment, True, 0.5, None]], widths=[20] * 7))
+    archive = _workbook(chunks)
+    assert {'[Content_Types].xml', '_rels/.rels', 'xl/styles.xml', 'xl/workbook.xml',
+            'xl/_rels/workbook.xml.rels', 'xl/worksheets/sheet1.xml'} <= set(archive.namelist())
+    assert _sheet_names(archive) == ['Sheet']
+
+    header, row = _rows(archive)
+    assert header[0] == (str(xlsx._STYLE_HEADER), 'inlineStr', 'Name')
+    serial = (date(2025, 11, 3) - date(1899, 12, 30)).days
+    assert row == [
+        (None, 'inlineStr', 'Ada'),
+        (None, None, '3'),
+        (str(xlsx._STYLE_DATE), None, str(serial)),
+        (str(xlsx._STYLE_DATETIME), None, repr(serial + 0.75)),
+        (None, 'b', '1'),
+        (None, None, '0.5'),
+        (None, None, None),
+    ]
+    # The date formats the styles point at
+    styles = archive.read('xl/styles.xml').decode()
+    assert 'formatCode="yyyy-mm-dd"' in styles and 'formatCode="yyyy-mm-dd hh:mm:ss"' in styles
+
+
+def test_text_is_escaped():
+    values = ['<b>Tom & Jerry</b>', 'bell\x07 and tab\t', '  padded ', float('nan')]
+    archive = _workbook(xlsx.stream_xlsx(['a', 'b', 'c', 'd'], [values]))
+    raw = archive.read('xl/worksheets/sheet1.xml').decode()
+    assert '&lt;b&gt;Tom &amp; Jerry&lt;/b&gt;' in raw and 'xml:space="preserve"' in raw
+    cells = [text for _, _, text in _rows(archive)[1]]
+    assert cells == ['<b>Tom & Jerry</b>', 'bell and tab\t', '  padded ', 'nan']
+
+
+def test_rows_roll_over_onto_new_sheets(monkeypatch):
+    monkeypatch.setattr(xlsx, 'MAX_SHEET_ROWS', 4)  # the header and three rows
+    archive = _workbook(xlsx.stream_xlsx(['n'], ([i] for i in range(7)), sheet_name='Attendance', chunk_rows=2))
+    assert _sheet_names(archive) == ['Attendance', 'Attendance2', 'Attendance3']
+    sheets = [_rows(archive, number) for number in (1, 2, 3)]
+    assert all(sheet[0] == [(str(xlsx._STYLE_HEADER), 'inlineStr', 'n')] for sheet in sheets)
+    assert [[row[0][2] for row in sheet[1:]] for sheet in sheets] == [['0', '1', '2'], ['3', '4', '5'], ['6']]
+
+    # Exactly filling a sheet does not start an empty one
+    archive = _workbook(xlsx.stream_xlsx(['n'], ([i] for i in range(6))))
+    assert _sheet_names(archive) == ['Sheet', 'Sheet2']
+
+
+def test_rows_are_streamed_in_chunks():
+    chunks = list(xlsx.stream_xlsx(['n'], ([i] for i in range(10)), chunk_rows=3))
+    # Fixed parts, three full row chunks, the last row with the sheet end, and the workbook
+    assert len(chunks) == 6
+    assert len(_rows(_workbook(chunks))) == 11
+
+
+def test_export_reports_as_xlsx(client, faculty, faculty_headers):
+    student = add_students(1)[0]
+    db.session.add_all([Attendance(student_id=student.id, subject='Maths', faculty_id=faculty.id,
+                                   date=date(2025, 11, 3) + timedelta(days=i), status='Present') for i in range(3)])
+    db.session.commit()
+    response = client.get('/faculty/export_reports?format=xlsx', headers=faculty_headers)
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == xlsx.MIME_TYPE
+    archive = _workbook([response.data])
+    assert _sheet_names(archive) == ['Attendance']
+    header, *rows = _rows(archive)
+    assert len(rows) == 3
+    day_column = [cell[2] for cell in header].index('Date')
+    assert {row[day_column][0] for row in rows} == {str(xlsx._STYLE_DATE)}